@@ -1,10 +1,27 @@
+import contextvars
 import json
-from spotify_client import SpotifyClient
-from spotify_helpers import SpotifyHelpers
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from client_registry import spotify_clients
+from tool_cache import ToolResultCache
+from tool_encoding import MORE_RESULTS_TOOL
 
 from logger_config import setup_logger
 logger = setup_logger(__name__)
 
+# Tools that only read from Spotify and may run concurrently, every other tool is a write
+READ_ONLY_TOOLS = frozenset({
+    "get_user_profile", "get_top_items", "get_followed_artists", "get_user_playlists",
+    "get_playlist_items", "get_saved_podcasts", "get_saved_audiobooks", "get_saved_tracks",
+    "get_recently_played_tracks", "get_taste_analytics", "search_item", MORE_RESULTS_TOOL
+})
+
+_tool_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('TOOL_CALL_WORKERS', '8')),
+    thread_name_prefix='tool-call'
+)
+
 
 SPOTIFY_TOOLS = [
     {
@@ -67,6 +84,23 @@ SPOTIFY_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_playlist_items",
+            "description": "Get the songs and episodes in a Spotify playlist, in playlist order, with when each was added. Also returns the playlist's snapshot_id, its total item count and how many items are still available (offset counts available items); use offset to page through long playlists",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "playlist_id": {"type": "string"},
+                    "limit": {"type": "integer", "description": "Maximum number of items to return, defaults to 100"},
+                    "offset": {"type": "integer", "description": "Index of the first item to return"}
+                },
+                "required": ["playlist_id"],
+                "strict": True
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -95,10 +129,14 @@ SPOTIFY_TOOLS = [
     "type": "function",
     "function": {
         "name": "get_saved_tracks",
-        "description": "Get the songs saved in the current Spotify user's 'Your Music' library.",
+        "description": "Get the songs saved in the current Spotify user's 'Your Music' library, newest first. The whole library is available: use query to search it and offset to page through it. While the library is first being loaded the result has partial set and only holds the tracks loaded so far.",
         "parameters": {
             "type": "object",
-            "properties": {},
+            "properties": {
+                "limit": {"type": "integer", "description": "Maximum number of tracks to return, defaults to 50"},
+                "offset": {"type": "integer", "description": "Index of the first track to return"},
+                "query": {"type": "string", "description": "Only return tracks whose name, artist or album contains this text"}
+            },
             "strict": True
             }
         }
@@ -110,7 +148,33 @@ SPOTIFY_TOOLS = [
             "description": "Get the chronological history of tracks the user has listened to, ordered by most recent play date first",
             "parameters": {
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "include_genres": {
+                        "type": "boolean",
+                        "description": "Also return the genres of each track's artists"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of plays to return, defaults to 50. The stored history can go back further than Spotify's last 50 plays"
+                    }
+                },
+                "strict": True
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_taste_analytics",
+            "description": "Analyze the user's listening taste across time ranges: top genres with how many top artists carry each, artists rising or falling between short_term and long_term rankings (and new or dropped ones), and genre diversity (entropy and Simpson index) per time range",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "top_n": {
+                        "type": "integer",
+                        "description": "Number of genres and artists to list in each section, defaults to 10"
+                    }
+                },
                 "strict": True
             }
         }
@@ -138,6 +202,23 @@ SPOTIFY_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": MORE_RESULTS_TOOL,
+            "description": "Get more rows of an earlier tool result that was cut short. Call it exactly as given in the 'more' field of the result's 'truncated' section",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "tool_name": {"type": "string", "description": "The tool whose result was cut short"},
+                    "arguments": {"type": "object", "additionalProperties": True, "description": "The arguments of that call"},
+                    "offset": {"type": "integer", "description": "Index of the first row to return"}
+                },
+                "required": ["tool_name", "offset"],
+                "strict": True
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -216,14 +297,73 @@ SPOTIFY_TOOLS = [
 
 
 class SpotifyFunctionHandler:
-    def __init__(self, access_token: str):
-        self.spotify_client = SpotifyClient(access_token)
-        self.spotify_helpers = SpotifyHelpers(self.spotify_client)
+    def __init__(self, access_token: str, spotify_data: Optional[Dict] = None,
+                 tool_cache: Optional[ToolResultCache] = None, user_id: Optional[str] = None):
+        # The user's long-lived client, the handler itself only carries per-query state
+        self.spotify_helpers = spotify_clients.helpers(access_token, user_id)
+        self.spotify_client = self.spotify_helpers.client
+        # The cached data bundle of the user, tools read precomputed results from it when possible
+        self.spotify_data = spotify_data
+        # Results of earlier read-only calls in the chat session
+        self.tool_cache = tool_cache
+
+    def submit(self, tool_call) -> Future:
+        """Start a tool call on the shared pool"""
+        # The call runs in a copy of the caller's context so its request priority carries over
+        return _tool_executor.submit(contextvars.copy_context().run, self.execute_function, tool_call)
+
+    def execute_functions(self, tool_calls: List, started: Optional[Dict[int, Future]] = None) -> List[Any]:
+        """
+        Execute tool calls, returning their results in the order of `tool_calls`.
+        Consecutive read-only calls run concurrently, a write waits for every earlier call
+        and runs alone, so writes keep their order relative to everything else.
+        `started` maps indexes of read-only calls already submitted (while the model was
+        still streaming) to their futures, those are awaited instead of run again.
+        """
+        started = started or {}
+        results: List[Any] = [None] * len(tool_calls)
+        in_flight = []
+
+        def wait_for_reads():
+            for index, future in in_flight:
+                results[index] = future.result()
+            in_flight.clear()
+
+        for index, tool_call in enumerate(tool_calls):
+            if index in started:
+                in_flight.append((index, started[index]))
+            elif tool_call.function.name in READ_ONLY_TOOLS:
+                in_flight.append((index, self.submit(tool_call)))
+            else:
+                wait_for_reads()
+                results[index] = self.execute_function(tool_call)
+        wait_for_reads()
+
+        logger.info(f"Executed {len(tool_calls)} tool calls, {len(started)} started while streaming")
+        return results
 
     def execute_function(self, tool_call) -> dict:
-        name = tool_call.function.name
-        args = json.loads(tool_call.function.arguments)
+        return self.execute(tool_call.function.name, json.loads(tool_call.function.arguments))
+
+    def execute(self, name: str, args: Dict) -> Any:
+        cache = self.tool_cache
 
+        if cache is None:
+            return self._dispatch(name, args)
+        if name in READ_ONLY_TOOLS:
+            result = cache.get(name, args) if cache.cacheable(name) else None
+            if result is None:
+                result = self._dispatch(name, args)
+                cache.set(name, args, result)
+            return result
+
+        try:
+            return self._dispatch(name, args)
+        finally:
+            # Even a failed write may have changed something
+            cache.invalidate_for_write(name, args)
+
+    def _dispatch(self, name: str, args: Dict) -> Any:
         if name == "get_top_items":
             return self.spotify_helpers.get_top_items(args["time_range"], args["item_type"])
         elif name == "get_user_profile": 
@@ -232,14 +372,35 @@ class SpotifyFunctionHandler:
             return self.spotify_helpers.get_followed_artists()
         elif name == "get_user_playlists":
             return self.spotify_helpers.get_user_playlists()
+        elif name == "get_playlist_items":
+            return self.spotify_helpers.get_playlist_items(
+                playlist_id=args["playlist_id"],
+                limit=args.get("limit", 100),
+                offset=args.get("offset", 0)
+            )
         elif name == "get_saved_podcasts":
             return self.spotify_helpers.get_saved_podcasts()
         elif name == "get_saved_audiobooks":
             return self.spotify_helpers.get_saved_audiobooks()
         elif name == "get_saved_tracks":
-            return self.spotify_helpers.get_saved_tracks()
+            return self.spotify_helpers.get_saved_tracks(
+                limit=args.get("limit", 50),
+                offset=args.get("offset", 0),
+                query=args.get("query")
+            )
         elif name == "get_recently_played_tracks":
-            return self.spotify_helpers.get_recently_played_tracks()
+            return self.spotify_helpers.get_recently_played_tracks(
+                include_genres=args.get("include_genres", False),
+                limit=args.get("limit", 50)
+            )
+        elif name == "get_taste_analytics":
+            return self.spotify_helpers.get_taste_analytics(self.spotify_data, top_n=args.get("top_n", 10))
+        elif name == MORE_RESULTS_TOOL:
+            # The full result is usually still in the session cache, the encoder picks the rows from offset
+            tool_name = args["tool_name"]
+            if tool_name not in READ_ONLY_TOOLS or tool_name == MORE_RESULTS_TOOL:
+                raise ValueError(f"Cannot page through results of {tool_name}")
+            return self.execute(tool_name, args.get("arguments") or {})
         elif name == "search_item":
             return self.spotify_helpers.search_item(
                 args["query"], 
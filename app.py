@@ -5,10 +5,21 @@ from urllib.parse import urlencode
 import os
 import base64
 from dotenv import load_dotenv
-from flask_caching import Cache
 from datetime import timedelta
-from spotify_client import SpotifyClient
-from spotify_helpers import SpotifyHelpers
+from spotify_client import get_pool_stats
+from spotify_rate_limiter import rate_limiter
+from etag_cache import etag_cache
+from single_flight import single_flight
+from id_batcher import id_batcher
+from bundle_cache import StaleWhileRevalidateCache
+from user_cache import user_cache
+from spotify_records import to_jsonable
+from show_classifier import show_classifier
+from playlist_cache import playlist_items_cache
+from catalog_cache import catalog_cache
+from tool_cache import session_tool_caches
+from client_registry import spotify_clients
+from taste_analytics import TasteAnalytics
 from llm_client import LLMClient
 import uuid
 import sys
@@ -29,8 +40,8 @@ def generate_session_id():
 app = Flask(__name__, static_folder='static')
 app.secret_key = os.getenv('FLASK_APP_SECRET_KEY')
 
-# Configure Flask-Caching
-cache = Cache(app, config={'CACHE_TYPE': 'simple', 'CACHE_DEFAULT_TIMEOUT': 3600})  # Cache timeout set to 1 hour
+# Serves each user's spotify_data bundle stale while it is refreshed in the background
+bundle_cache = StaleWhileRevalidateCache()
 
 # Configure session timeout
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
@@ -186,8 +197,15 @@ def get_spotify_client():
     access_token = ensure_valid_access_token()
     if not access_token:
         return None
-    spotify_client = SpotifyClient(access_token)
-    return SpotifyHelpers(spotify_client)  # Return SpotifyHelpers instance instead
+    user_profile = session.get('user_profile') or {}
+    return spotify_clients.helpers(access_token, user_id=user_profile.get('id'))
+
+def get_user_cache():
+    """Cache namespace of the logged in user, None before the profile is known"""
+    user_id = (session.get('user_profile') or {}).get('id')
+    if not user_id:
+        return None
+    return user_cache.namespace(user_id)
 
 @app.route('/get_refresh_token')
 def get_refresh_token():
@@ -409,8 +427,10 @@ def callback():
         
         # Gather and cache Spotify data
         spotify_helper = get_spotify_client()
-        spotify_data = spotify_helper.gather_spotify_data(cache)
-        logger.info("Spotify data successfully gathered and cached")
+        user_cache_namespace = get_user_cache()
+        if user_cache_namespace:
+            spotify_data = spotify_helper.gather_spotify_data(user_cache_namespace)
+            logger.info("Spotify data successfully gathered and cached")
 
         return redirect(url_for('chat'))
     
@@ -462,35 +482,41 @@ def top_items():
     spotify_helper = get_spotify_client()  
     if not spotify_helper:
         return redirect(url_for('login'))
-    
+
+    # Top items and their analytics come from the cached bundle, ranges missing from it are refetched
+    user_cache_namespace = get_user_cache()
+    spotify_data = (bundle_cache.get(user_cache_namespace, spotify_helper) if user_cache_namespace else None) or {}
     time_ranges = ['short_term', 'medium_term', 'long_term']
-    top_artists_data = {}
-    top_tracks_data = {}
+    top_artists = dict(spotify_data.get('top_artists') or {})
+    top_tracks_data = dict(spotify_data.get('top_tracks') or {})
+    analytics = spotify_data.get('taste_analytics')
 
     for time_range in time_ranges:
-        artists = spotify_helper.get_top_items(time_range, 'artists')
-        if artists is None:
-            return f"Error fetching top artists for {time_range}", 500
-        
-        genre_count = {}
-        for artist in artists:
-            for genre in artist['genres']:
-                genre_count[genre] = genre_count.get(genre, 0) + 1
-        
-        top_genres = sorted(genre_count, key=genre_count.get, reverse=True)
-        
-        top_artists_data[time_range] = {
-            'artists': artists,
-            'genres': top_genres
+        if top_artists.get(time_range) is None:
+            top_artists[time_range] = spotify_helper.get_top_items(time_range, 'artists')
+            if top_artists[time_range] is None:
+                return f"Error fetching top artists for {time_range}", 500
+            analytics = None
+
+        if top_tracks_data.get(time_range) is None:
+            top_tracks_data[time_range] = spotify_helper.get_top_items(time_range, 'tracks')
+            if top_tracks_data[time_range] is None:
+                return f"Error fetching top tracks for {time_range}", 500
+
+    if analytics is None:
+        analytics = TasteAnalytics.from_top_artists(top_artists)
+
+    top_artists_data = {
+        time_range: {
+            'artists': top_artists[time_range],
+            'genres': analytics.top_genres(time_range)
         }
-        
-        tracks = spotify_helper.get_top_items(time_range, 'tracks')
-        if tracks is None:
-            return f"Error fetching top tracks for {time_range}", 500
-
-        top_tracks_data[time_range] = tracks
+        for time_range in time_ranges
+    }
+    top_tracks_data = {time_range: top_tracks_data[time_range] for time_range in time_ranges}
 
-    return render_template('top_items.html', top_artists_data=top_artists_data, top_tracks_data=top_tracks_data)
+    return render_template('top_items.html', top_artists_data=top_artists_data, top_tracks_data=top_tracks_data,
+                           diversity=analytics.diversity(), rank_changes=analytics.rank_changes())
 
 @app.route('/followed-artists')
 def followed_artists():
@@ -579,21 +605,20 @@ def ask():
                 "needsAuth": True
             }), 401
 
-        # Retrieve Spotify data from cache or fetch from API
-        spotify_data = cache.get('spotify_data')
+        # Retrieve Spotify data from cache, refreshing it in the background once stale
+        user_cache_namespace = get_user_cache()
+        spotify_data = bundle_cache.get(user_cache_namespace, spotify_helpers) if user_cache_namespace else None
         if not spotify_data:
-            logger.info("Spotify data not found in cache. Fetching fresh data.")
-            spotify_data = spotify_helpers.gather_spotify_data(cache)
-            if not spotify_data:
-                logger.error("Failed to fetch Spotify data.")
-                return jsonify({
-                    "error": "Unable to fetch Spotify data. Please try logging in again",
-                    "redirect": url_for('login'),
-                    "needsAuth": True
-                }), 401
+            logger.error("Failed to fetch Spotify data.")
+            return jsonify({
+                "error": "Unable to fetch Spotify data. Please try logging in again",
+                "redirect": url_for('login'),
+                "needsAuth": True
+            }), 401
 
         # Validate the query
         access_token = session.get('access_token')
+        user_id = (session.get('user_profile') or {}).get('id')
         query = request.form.get('query')
         if not query:
             logger.warning("Received /ask request with no query provided.")
@@ -609,7 +634,7 @@ def ask():
                     return
 
                 logger.info(f"Processing query: {query} with session ID: {session_id}")
-                response_iterator = llm_client.process_query(query, spotify_data, access_token, session_id)
+                response_iterator = llm_client.process_query(query, spotify_data, access_token, session_id, user_id)
 
                 for chunk in response_iterator:
                     yield chunk
@@ -637,11 +662,29 @@ def ask():
     
 @app.route('/cached-data')
 def cached_data():
-    spotify_data = cache.get('spotify_data')
+    user_cache_namespace = get_user_cache()
+    spotify_data = user_cache_namespace.get('spotify_data') if user_cache_namespace else None
     if spotify_data:
-        return jsonify(spotify_data)
+        return jsonify(to_jsonable(spotify_data))
     else:
         return jsonify({"error": "No data cached"}), 500
 
+@app.route('/spotify-stats')
+def spotify_stats():
+    return jsonify({
+        'http_pool': get_pool_stats(),
+        'rate_limiter': rate_limiter.get_stats(),
+        'etag_cache': etag_cache.get_stats(),
+        'single_flight': single_flight.get_stats(),
+        'id_batcher': id_batcher.get_stats(),
+        'bundle_cache': bundle_cache.get_stats(),
+        'user_cache': user_cache.get_stats(),
+        'catalog_cache': catalog_cache.get_stats(),
+        'show_classifier': show_classifier.get_stats(),
+        'playlist_items_cache': playlist_items_cache.get_stats(),
+        'tool_cache': session_tool_caches.get_stats(),
+        'spotify_clients': spotify_clients.get_stats()
+    })
+
 if __name__ == '__main__':
         app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import weakref
+from typing import Optional, List, Dict, Any, Tuple
+
+import aiohttp
+
+from spotify_client import (
+    SpotifyClient, CONNECT_TIMEOUT, READ_TIMEOUT, PAGE_FANOUT, PLAYLIST_ITEM_FIELDS, PLAYLIST_SUMMARY_FIELDS
+)
+from etag_cache import etag_cache
+from catalog_cache import catalog_cache
+from single_flight import single_flight
+from id_batcher import BATCH_LIMITS
+from spotify_rate_limiter import (
+    rate_limiter, RateLimitScheduler, MAX_RETRIES, MAX_RETRY_AFTER, RETRYABLE_STATUS_CODES
+)
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Connection limits for the shared async pool
+ASYNC_POOL_LIMIT = int(os.getenv('SPOTIFY_ASYNC_POOL_LIMIT', '100'))
+ASYNC_POOL_LIMIT_PER_HOST = int(os.getenv('SPOTIFY_ASYNC_POOL_LIMIT_PER_HOST', '50'))
+KEEPALIVE_TIMEOUT = float(os.getenv('SPOTIFY_KEEPALIVE_TIMEOUT', '30'))
+
+# aiohttp sessions are bound to the event loop they were created on,
+# so the pool is shared per loop rather than per process
+_async_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = weakref.WeakKeyDictionary()
+
+
+def get_async_http_session() -> aiohttp.ClientSession:
+    """
+    Return the pooled aiohttp session shared by every AsyncSpotifyClient on the running loop
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=ASYNC_POOL_LIMIT,
+            limit_per_host=ASYNC_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _async_sessions[loop] = session
+        logger.info(f"Created shared async Spotify HTTP session (limit={ASYNC_POOL_LIMIT})")
+    return session
+
+
+async def close_async_http_session() -> None:
+    """Close the shared session of the running loop"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+class AsyncSpotifyClient:
+    """
+    asyncio counterpart of SpotifyClient, every *_raw method is a coroutine
+    """
+
+    def __init__(self, access_token: str, user_id: Optional[str] = None):
+        self.access_token = access_token
+        self.base_url = 'https://api.spotify.com/v1'
+        self.headers = {
+            'Authorization': f'Bearer {access_token}'
+        }
+        self.user_id = user_id
+        self.user_key = user_id or hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+    async def _send(self, method: str, url: str, extra_headers: Optional[Dict] = None, **kwargs) -> Tuple[int, Any, str]:
+        """
+        Send a request through the rate limit scheduler and the shared async pool.
+        Returns (status, headers, text), retrying 429s and 5xx on GET like SpotifyClient._send.
+        """
+        session = get_async_http_session()
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        for attempt in range(MAX_RETRIES + 1):
+            await rate_limiter.acquire_async()
+            async with session.request(method, url, headers=headers, **kwargs) as response:
+                status, response_headers, text = response.status, response.headers, await response.text()
+
+            if attempt == MAX_RETRIES:
+                break
+
+            if status == 429:
+                retry_after = RateLimitScheduler.parse_retry_after(response_headers.get('Retry-After'), attempt)
+                if retry_after > MAX_RETRY_AFTER:
+                    # Not waited out, so it must not pause every other caller either
+                    logger.error(f"Retry-After of {retry_after}s for {url} is too long, giving up")
+                    break
+                rate_limiter.note_retry_after(retry_after)
+            elif status in RETRYABLE_STATUS_CODES and method == 'GET':
+                await asyncio.sleep(RateLimitScheduler.backoff_delay(attempt))
+            else:
+                break
+
+            rate_limiter.note_retry()
+            logger.warning(f"Retrying {method} {url} after status {status} (attempt {attempt + 1})")
+
+        return status, response_headers, text
+
+    @staticmethod
+    def _decode(text: str) -> Optional[Dict]:
+        """Parse a JSON response body"""
+        return json.loads(text) if text else None
+
+    async def _get_json(self, url: str, params: Optional[Dict] = None) -> Tuple[int, str, Optional[Dict]]:
+        """
+        Conditional GET through the shared ETag cache, returns (status, text, parsed body or None).
+        Concurrent identical GETs for the same user share one upstream call.
+        """
+        key = etag_cache.make_key(self.user_key, url, params)
+        return await single_flight.do_async(key, lambda: self._conditional_get(key, url, params))
+
+    async def _conditional_get(self, key: Tuple[str, str], url: str, params: Optional[Dict] = None) -> Tuple[int, str, Optional[Dict]]:
+        cached = etag_cache.lookup(key)
+        extra_headers = {'If-None-Match': cached.etag} if cached else None
+
+        status, headers, text = await self._send('GET', url, params=params, extra_headers=extra_headers)
+
+        if status == 304 and cached:
+            etag_cache.note_not_modified(cached)
+            return status, text, cached.body
+        if status != 200:
+            return status, text, None
+
+        started = time.perf_counter()
+        data = self._decode(text)
+        etag = headers.get('ETag')
+        if etag:
+            etag_cache.store(key, etag, data, len(text.encode()), time.perf_counter() - started)
+        return status, text, data
+
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Make a GET request to the Spotify API
+        """
+        url = f'{self.base_url}/{endpoint}'
+        logger.debug(f"Making async request to {endpoint} with params: {params}")
+
+        status, text, data = await self._get_json(url, params)
+
+        if data is None:
+            logger.error(f"Error making request to {endpoint}:")
+            logger.error(f"Status Code: {status}")
+            logger.error(f"Response Text: {text}")
+            return None
+
+        logger.debug(f"Successful response from {endpoint}")
+        return data
+
+    async def _make_post_request(self, endpoint: str, json: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Make a POST request to the Spotify API
+        """
+        url = f'{self.base_url}/{endpoint}'
+        logger.debug(f"Making async POST request to {endpoint} with json: {json}")
+
+        status, _, text = await self._send('POST', url, json=json)
+
+        if status not in [200, 201]:
+            logger.error(f"Error making POST request to {endpoint}:")
+            logger.error(f"Status Code: {status}")
+            logger.error(f"Response Text: {text}")
+            return None
+
+        logger.debug(f"Successful response from {endpoint}")
+        return self._decode(text)
+
+    async def _paginate_request(self, endpoint: str, params: Optional[Dict] = None, limit: Optional[int] = None,
+                                concurrent: bool = False) -> List[Dict]:
+        """
+        Handle pagination for Spotify API requests
+        """
+        if concurrent:
+            return await self._paginate_offsets(endpoint, params, limit)
+
+        logger.debug(f"Starting async paginated request to {endpoint} with limit {limit}")
+        items = []
+        url = f'{self.base_url}/{endpoint}'
+
+        while url and (limit is None or len(items) < limit):
+            status, _, data = await self._get_json(url, params)
+
+            if data is None:
+                logger.error(f"Error in pagination for {endpoint}:")
+                logger.error(f"Status Code: {status}")
+                return items
+
+            page_items, url = SpotifyClient._parse_page(endpoint, data)
+            items.extend(page_items)
+            params = None  # Clear params for subsequent requests
+
+            if limit and len(items) >= limit:
+                items = items[:limit]
+                break
+
+        logger.info(f"Completed async paginated request to {endpoint}, collected {len(items)} items")
+        return items
+
+    async def _paginate_offsets(self, endpoint: str, params: Optional[Dict] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch the first page, then every remaining offset concurrently using the reported total
+        """
+        params = dict(params or {})
+        first_page = await self._make_request(endpoint, params)
+        if not first_page:
+            logger.error(f"Error in pagination for {endpoint}: first page failed")
+            return []
+
+        items, next_url = SpotifyClient._parse_page(endpoint, first_page)
+        items = list(items)
+        total = first_page.get('total')
+        page_size = params.get('limit') or first_page.get('limit') or len(items)
+        if not next_url or total is None or not page_size:
+            return items[:limit] if limit else items
+
+        start = params.get('offset', 0)
+        end = total if limit is None else min(total, start + limit)
+        offsets = list(range(start + page_size, end, page_size))
+        semaphore = asyncio.Semaphore(PAGE_FANOUT)
+
+        async def fetch_page(offset: int) -> Optional[List[Dict]]:
+            async with semaphore:
+                page = await self._make_request(endpoint, {**params, 'offset': offset})
+            return SpotifyClient._parse_page(endpoint, page)[0] if page else None
+
+        pages = await asyncio.gather(*(fetch_page(offset) for offset in offsets))
+        for offset, page_items in zip(offsets, pages):
+            if page_items is None:
+                logger.error(f"Error in pagination for {endpoint} at offset {offset}")
+                break
+            items.extend(page_items)
+
+        return items[:limit] if limit else items
+
+    async def get_user_profile_raw(self) -> Dict:
+        """Get raw API response for user's profile"""
+        try:
+            return await self._make_request('me') or {}
+        except Exception as e:
+            logger.error(f"Failed to get user profile: {str(e)}")
+            return {}
+
+    async def get_user_id(self) -> Optional[str]:
+        """Get the Spotify user ID, looking it up once if it was not given"""
+        if not self.user_id:
+            profile = await self.get_user_profile_raw()
+            self.user_id = profile.get('id') if profile else None
+        return self.user_id
+
+    async def get_top_items_raw(self, time_range: str, item_type: str) -> Optional[Dict]:
+        """Get raw API response for user's top artists or tracks"""
+        return await self._make_request(f'me/top/{item_type}', {'time_range': time_range})
+
+    async def get_followed_artists_raw(self) -> List[Dict]:
+        """Get raw API response for user's followed artists"""
+        return await self._paginate_request('me/following', {'type': 'artist', 'limit': 50})
+
+    async def get_user_playlists_raw(self, limit: int = 100) -> List[Dict]:
+        """Get raw API response for user's playlists"""
+        return await self._paginate_request('me/playlists', {'limit': 50}, limit, concurrent=True)
+
+    async def get_saved_podcasts_raw(self) -> List[Dict]:
+        """Get raw API response for user's saved shows"""
+        return await self._paginate_request('me/shows', {'limit': 50}, concurrent=True)
+
+    async def get_recently_played_tracks_raw(self, after: Optional[int] = None) -> List[Dict]:
+        """
+        Get raw API response for user's recently played tracks,
+        only plays after the unix timestamp in milliseconds `after` if given
+        """
+        params = {'limit': 50}
+        if after:
+            params['after'] = after
+        return await self._paginate_request('me/player/recently-played', params)
+
+    async def get_recently_played_page_raw(self, after: Optional[int] = None) -> Optional[Dict]:
+        """
+        Get one page of up to 50 plays (all Spotify keeps), only those after `after` if given.
+        None when the request failed.
+        """
+        params = {'limit': 50}
+        if after:
+            params['after'] = after
+        return await self._make_request('me/player/recently-played', params)
+
+    async def search_item_raw(self, query: str, search_type: str, filters: Optional[Dict] = None) -> Optional[Dict]:
+        """Get raw API response for search query"""
+        params = SpotifyClient._build_search_params(query, search_type, filters)
+        return await self._make_request('search', params)
+
+    async def create_playlist_raw(self, name: str, public: bool = True,
+                                  collaborative: bool = False, description: str = None) -> Optional[Dict]:
+        """Create a new playlist for the authenticated user"""
+        payload = SpotifyClient._build_playlist_payload(name, public, collaborative, description)
+        return await self._make_post_request('me/playlists', json=payload)
+
+    async def add_songs_to_playlist_raw(self, playlist_id: str, uris: List[str], position: Optional[int] = None) -> Optional[Dict]:
+        """Add items to a playlist"""
+        payload = {'uris': uris}
+        if position is not None:
+            payload['position'] = position
+        return await self._make_post_request(f'playlists/{playlist_id}/tracks', json=payload)
+
+    async def remove_playlist_items_raw(self, playlist_id: str, uris: List[str], snapshot_id: Optional[str] = None) -> Optional[Dict]:
+        """Remove items from a playlist."""
+        payload = {'tracks': [{'uri': uri} for uri in uris]}
+        if snapshot_id:
+            payload['snapshot_id'] = snapshot_id
+
+        status, _, text = await self._send('DELETE', f'{self.base_url}/playlists/{playlist_id}/tracks', json=payload)
+
+        if status != 200:
+            logger.error(f"Failed to remove items from playlist {playlist_id}. Status: {status}, Response: {text}")
+            return None
+
+        return self._decode(text)
+
+    async def get_playlist_summary_raw(self, playlist_id: str) -> Optional[Dict]:
+        """Get a playlist's name, snapshot_id and item count without any of its items"""
+        return await self._make_request(f'playlists/{playlist_id}', {'fields': PLAYLIST_SUMMARY_FIELDS})
+
+    async def get_playlist_items_raw(self, playlist_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Get the items of a playlist, trimmed to PLAYLIST_ITEM_FIELDS, fetching pages concurrently."""
+        params = {'limit': 100, 'fields': PLAYLIST_ITEM_FIELDS, 'additional_types': 'track,episode'}
+        return await self._paginate_request(f'playlists/{playlist_id}/tracks', params, limit, concurrent=True)
+
+    async def update_playlist_details_raw(self, playlist_id: str, payload: Dict) -> Optional[Dict]:
+        """Update playlist details with raw Spotify API call."""
+        status, _, text = await self._send('PUT', f'{self.base_url}/playlists/{playlist_id}', json=payload)
+
+        if status != 200:
+            logger.error(f"Failed to update playlist details. Status: {status}, Response: {text}")
+            return None
+
+        return {"status": "success"}
+
+    async def get_saved_audiobooks_raw(self, limit: int = 20, offset: int = 0) -> Optional[Dict]:
+        """Get raw API response for user's saved audiobooks."""
+        return await self._make_request('me/audiobooks', {'limit': limit, 'offset': offset})
+
+    async def get_saved_tracks_raw(self, limit: int = 50, offset: int = 0) -> Optional[Dict]:
+        """Get raw API response for user's saved tracks."""
+        return await self._make_request('me/tracks', {'limit': limit, 'offset': offset})
+
+    async def get_all_saved_tracks_raw(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Get every saved track in the user's library from `offset` on, fetching pages concurrently."""
+        return await self._paginate_request('me/tracks', {'limit': 50, 'offset': offset}, limit, concurrent=True)
+
+    async def _get_several_raw(self, entity: str, ids: List[str]) -> List[Optional[Dict]]:
+        """
+        Fetch unique ids missing from the catalog from a "several items" endpoint in concurrent chunks.
+        Returns objects in the order of `ids`, None for unknown ids and ids whose request failed.
+        """
+        found = catalog_cache.get_many_raw(entity, ids)
+        unique_ids = [id_ for id_ in dict.fromkeys(ids) if id_ and id_ not in found]
+        chunk_size = BATCH_LIMITS[entity]
+        chunks = [unique_ids[i:i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+        semaphore = asyncio.Semaphore(PAGE_FANOUT)
+
+        async def fetch_chunk(chunk: List[str]) -> Optional[List[Optional[Dict]]]:
+            async with semaphore:
+                response = await self._make_request(entity, {'ids': ','.join(chunk)})
+            return response.get(entity, []) if response else None
+
+        fetched = {}
+        for chunk, objects in zip(chunks, await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))):
+            # Ids of failed requests are left out, unknown ids map to None
+            if objects is not None:
+                fetched.update(zip(chunk, objects))
+        found.update(catalog_cache.put_many_raw(entity, fetched))
+        return [found.get(id_) for id_ in ids]
+
+    async def get_several_tracks_raw(self, ids: List[str]) -> List[Optional[Dict]]:
+        return await self._get_several_raw('tracks', ids)
+
+    async def get_several_artists_raw(self, ids: List[str]) -> List[Optional[Dict]]:
+        return await self._get_several_raw('artists', ids)
+
+    async def get_several_albums_raw(self, ids: List[str]) -> List[Optional[Dict]]:
+        return await self._get_several_raw('albums', ids)
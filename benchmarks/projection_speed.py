@@ -0,0 +1,161 @@
+"""
+Speed of the compiled projections vs the hand-written projections they replaced.
+
+Runs both over large synthetic search, top tracks and recently played payloads and
+reports the best of several rounds.
+
+    python benchmarks/projection_speed.py [--items 20000] [--rounds 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_helpers import SpotifyHelpers
+from spotify_records import Album, Artist, Playlist, Track, to_jsonable
+
+
+def make_track(i: int, rng: random.Random):
+    return {
+        'id': f'track{i}',
+        'name': f'Track {i}',
+        'uri': f'spotify:track:track{i}',
+        'popularity': rng.randint(0, 100),
+        'duration_ms': rng.randint(60000, 400000),
+        'explicit': rng.random() < 0.2,
+        'preview_url': None,
+        'artists': [
+            {'id': f'artist{j}', 'name': f'Artist {j}', 'uri': f'spotify:artist:artist{j}'}
+            for j in rng.sample(range(500), rng.randint(1, 3))
+        ],
+        'album': {'id': f'album{i % 900}', 'name': f'Album {i % 900}', 'uri': f'spotify:album:album{i % 900}'}
+    }
+
+
+def make_payloads(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    tracks = [make_track(i, rng) for i in range(count)]
+    search = {'tracks': {'items': tracks}}
+    plays = [{'played_at': '2024-05-01T12:00:00.000Z', 'track': track} for track in tracks]
+    playlists = {'playlists': {'items': [
+        {'id': f'pl{i}', 'name': f'Playlist {i}', 'uri': f'spotify:playlist:pl{i}',
+         'owner': {'display_name': f'owner{i % 50}'}, 'tracks': {'total': i}, 'description': ''}
+        for i in range(count)
+    ]}}
+    return search, {'items': tracks}, plays, playlists
+
+
+# The hand-written projections as they were before the projection registry
+
+def legacy_search(result, search_type):
+    items = result.get(f'{search_type}s', {}).get('items', [])
+    processed_items = []
+    for item in items:
+        if not item:
+            continue
+        if search_type == 'track':
+            processed_item = Track(
+                id=item['id'],
+                name=item['name'],
+                artists=[Artist(name=artist['name']) for artist in item['artists']],
+                album=item['album']['name'],
+                duration_ms=item.get('duration_ms'),
+                popularity=item.get('popularity'),
+                preview_url=item.get('preview_url'),
+                explicit=item.get('explicit', False),
+                uri=item['uri']
+            )
+        elif search_type == 'artist':
+            processed_item = Artist(id=item['id'], name=item['name'], uri=item['uri'])
+        elif search_type == 'album':
+            processed_item = Album(id=item['id'], name=item['name'], uri=item['uri'])
+        elif search_type == 'playlist':
+            processed_item = Playlist(
+                id=item['id'],
+                name=item['name'],
+                owner=item['owner'].get('display_name'),
+                total_tracks=item['tracks']['total'],
+                description=item.get('description'),
+                uri=item['uri']
+            )
+        else:
+            processed_item = {'id': item['id'], 'name': item['name'], 'uri': item['uri']}
+        processed_items.append(processed_item)
+    return processed_items
+
+
+def legacy_top_tracks(response):
+    return [
+        Track(
+            name=item['name'],
+            uri=item['uri'],
+            popularity=item.get('popularity'),
+            artists=[artist['name'] for artist in item['artists']],
+            album=item['album']['name']
+        )
+        for item in response['items']
+    ]
+
+
+def legacy_recent_tracks(tracks):
+    return [
+        Track(
+            name=track['track']['name'],
+            uri=track['track']['uri'],
+            played_at=track.get('played_at'),
+            artists=[
+                Artist(name=artist['name'], id=artist['id'], uri=artist['uri'])
+                for artist in track['track']['artists']
+            ],
+            album=Album(
+                name=track['track']['album']['name'],
+                id=track['track']['album']['id'],
+                uri=track['track']['album']['uri']
+            )
+        )
+        for track in tracks
+    ]
+
+
+def best_of(rounds: int, func, *args) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    search, top_tracks, plays, playlists = make_payloads(args.items)
+    cases = [
+        ('search tracks', lambda: legacy_search(search, 'track'),
+         lambda: SpotifyHelpers._process_search_results(search, 'track')),
+        ('search playlists', lambda: legacy_search(playlists, 'playlist'),
+         lambda: SpotifyHelpers._process_search_results(playlists, 'playlist')),
+        ('top tracks', lambda: legacy_top_tracks(top_tracks),
+         lambda: SpotifyHelpers._process_top_items(top_tracks, 'tracks')),
+        ('recently played', lambda: legacy_recent_tracks(plays),
+         lambda: SpotifyHelpers._process_recently_played_tracks(plays)),
+    ]
+
+    print(f'{args.items} items, best of {args.rounds}')
+    print(f"{'projection':<18}{'hand-written':>14}{'compiled':>12}{'speedup':>10}")
+    for name, legacy, compiled in cases:
+        assert to_jsonable(legacy()) == to_jsonable(compiled())
+        legacy_time = best_of(args.rounds, legacy)
+        compiled_time = best_of(args.rounds, compiled)
+        print(f'{name:<18}{legacy_time * 1000:>12.1f}ms{compiled_time * 1000:>10.1f}ms'
+              f'{legacy_time / compiled_time:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
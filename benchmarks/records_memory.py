@@ -0,0 +1,122 @@
+"""
+Memory held by processed tracks: plain dicts (the old helper output) vs slotted records.
+
+Builds a synthetic 10k track library shaped like the Spotify API response and measures
+the retained size of each projection with tracemalloc.
+
+    python benchmarks/records_memory.py [--tracks 10000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_helpers import SpotifyHelpers
+from spotify_records import json_default, to_jsonable
+
+
+def make_library(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    # A real library repeats artists and albums many times
+    artists = [(f'artist{i:05d}id', f'Artist Name {i}') for i in range(count // 10 or 1)]
+    albums = [(f'album{i:06d}id', f'Album Title {i}') for i in range(count // 4 or 1)]
+    items = []
+    for i in range(count):
+        track_artists = rng.sample(artists, rng.randint(1, 2))
+        album_id, album_name = rng.choice(albums)
+        items.append({
+            'played_at': '2024-05-01T12:00:00.000Z',
+            'added_at': '2024-05-01T12:00:00Z',
+            'track': {
+                'id': f'track{i:07d}id',
+                'name': f'Track Title Number {i}',
+                'uri': f'spotify:track:track{i:07d}id',
+                'artists': [
+                    # Fresh strings per item, as json.loads would produce
+                    {'id': ''.join(artist_id), 'name': ''.join(name), 'uri': 'spotify:artist:' + artist_id}
+                    for artist_id, name in track_artists
+                ],
+                'album': {'id': ''.join(album_id), 'name': ''.join(album_name), 'uri': 'spotify:album:' + album_id}
+            }
+        })
+    return items
+
+
+def dict_saved_track(item):
+    return {
+        'name': item['track']['name'],
+        'artists': [artist['name'] for artist in item['track']['artists']],
+        'album': item['track']['album']['name'],
+        'uri': item['track']['uri'],
+    }
+
+
+def dict_recent_track(track):
+    return {
+        'name': track['track']['name'],
+        'uri': track['track']['uri'],
+        'played_at': track.get('played_at'),
+        'artists': [
+            {'name': artist['name'], 'id': artist['id'], 'uri': artist['uri']}
+            for artist in track['track']['artists']
+        ],
+        'album': {
+            'name': track['track']['album']['name'],
+            'id': track['track']['album']['id'],
+            'uri': track['track']['album']['uri']
+        }
+    }
+
+
+def measure(project, items):
+    started = time.perf_counter()
+    [project(item) for item in items]
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    result = [project(item) for item in items]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=10000)
+    args = parser.parse_args()
+
+    items = make_library(args.tracks)
+    cases = [
+        ('saved tracks', dict_saved_track, SpotifyHelpers._project_saved_track),
+        ('recently played', dict_recent_track, SpotifyHelpers._project_recent_track),
+    ]
+
+    print(f'{args.tracks} tracks')
+    print(f"{'projection':<18}{'dicts':>12}{'records':>12}{'saved':>8}{'build':>18}{'to json':>18}")
+    for name, dict_project, record_project in cases:
+        dicts, dict_size, dict_time = measure(dict_project, items)
+        records, record_size, record_time = measure(record_project, items)
+        assert to_jsonable(records) == dicts
+
+        started = time.perf_counter()
+        json.dumps(dicts)
+        dict_json = time.perf_counter() - started
+        started = time.perf_counter()
+        json.dumps(records, default=json_default)
+        record_json = time.perf_counter() - started
+
+        print(f'{name:<18}{dict_size / 1e6:>10.2f}MB{record_size / 1e6:>10.2f}MB'
+              f'{1 - record_size / dict_size:>8.0%}'
+              f'{dict_time * 1000:>8.1f}/{record_time * 1000:.1f}ms'
+              f'{dict_json * 1000:>8.1f}/{record_json * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Prompt tokens of tool results: plain json.dumps (what the model used to get) vs the budgeted encoder.
+
+Builds synthetic helper output for the heaviest tools and counts tokens with the model's tiktoken
+encoding, or the encoder's estimate when it cannot be loaded. Savings are split into what the compact
+encoding saves on the whole result and what the token budget saves by cutting rows.
+With --live each encoding is also sent to the chat model as a tool result and the time to first token
+is measured (needs OPENAI_API_KEY).
+
+    python benchmarks/tool_result_tokens.py [--items 200] [--live] [--rounds 3]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotify_helpers import SpotifyHelpers
+from spotify_records import json_default
+from tool_encoding import ToolResultEncoder, encoder_for_model
+
+WORDS = 'the a story of music life history weekly talk interview news science stories deep dive with host and guests'.split()
+
+
+def make_track(i: int, rng: random.Random):
+    return {
+        'id': f'{i:022d}',
+        'name': f'Track {i}',
+        'uri': f'spotify:track:{i:022d}',
+        'popularity': rng.randint(0, 100),
+        'artists': [{'id': f'{j:022d}', 'name': f'Artist {j}', 'uri': f'spotify:artist:{j:022d}'}
+                    for j in rng.sample(range(300), rng.randint(1, 3))],
+        'album': {'id': f'{i % 90:022d}', 'name': f'Album {i % 90}', 'uri': f'spotify:album:{i % 90:022d}'}
+    }
+
+
+def make_results(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    tracks = [make_track(i, rng) for i in range(count)]
+    shows = [{'show': {
+        'name': f'Show {i}', 'publisher': f'Publisher {i % 20}', 'uri': f'spotify:show:{i:022d}',
+        'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 200)))
+    }} for i in range(count)]
+    playlists = [{'id': f'{i:022d}', 'name': f'Playlist {i}', 'uri': f'spotify:playlist:{i:022d}'} for i in range(count)]
+    playlist_items = [{'added_at': '2024-05-01T12:00:00Z', 'track': track} for track in tracks]
+    plays = [{'played_at': '2024-05-01T12:00:00.000Z', 'track': track} for track in tracks]
+    return [
+        ('get_user_playlists', {}, SpotifyHelpers._process_user_playlists(playlists)),
+        ('get_saved_podcasts', {}, SpotifyHelpers._process_saved_podcasts(shows)),
+        ('get_playlist_items', {'playlist_id': 'p'}, SpotifyHelpers._page_playlist_items(
+            {'id': 'p', 'name': 'Playlist', 'snapshot_id': 's'},
+            SpotifyHelpers._process_playlist_items(playlist_items, None)[0], 100, 0)),
+        ('get_recently_played_tracks', {}, SpotifyHelpers._process_recently_played_tracks(plays[:50])),
+        ('search_item', {'query': 'track', 'search_type': 'track'},
+         SpotifyHelpers._process_search_results({'tracks': {'items': tracks[:50]}}, 'track')),
+    ]
+
+
+def time_to_first_token(client, model: str, name: str, args: dict, content: str) -> float:
+    messages = [
+        {'role': 'user', 'content': 'Summarize this in one sentence.'},
+        {'role': 'assistant', 'tool_calls': [{'id': 'call_1', 'type': 'function',
+                                              'function': {'name': name, 'arguments': json.dumps(args)}}]},
+        {'role': 'tool', 'tool_call_id': 'call_1', 'content': content},
+    ]
+    started = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, max_tokens=20)
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            elapsed = time.perf_counter() - started
+            stream.close()
+            return elapsed
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--live', action='store_true', help='also measure time to first token')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--model', default='gpt-4o')
+    args = parser.parse_args()
+
+    client = None
+    if args.live:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+    encoder = encoder_for_model(args.model)
+    # Same encoding without a budget, nothing is cut
+    unbudgeted = ToolResultEncoder(budgets={}, default_budget=sys.maxsize, model=args.model)
+
+    print(f"{args.items} items, {args.model} tokens {'from tiktoken' if encoder.exact else 'estimated'}")
+    header = f"{'tool':<28}{'json':>8}{'compact':>9}{'budgeted':>10}{'encoding':>10}{'cut':>7}"
+    if client:
+        header += f"{'ttft json':>11}{'ttft enc':>10}"
+    print(header)
+
+    totals = [0, 0, 0]
+    for name, tool_args, result in make_results(args.items):
+        plain = json.dumps(result, default=json_default)
+        encoded = encoder.encode(name, tool_args, result)
+        counts = [encoder.count_tokens(text)
+                  for text in (plain, unbudgeted.encode(name, tool_args, result), encoded)]
+        totals = [total + count for total, count in zip(totals, counts)]
+        line = format_counts(name, *counts)
+        if client:
+            plain_ttft = statistics.median(time_to_first_token(client, args.model, name, tool_args, plain)
+                                           for _ in range(args.rounds))
+            encoded_ttft = statistics.median(time_to_first_token(client, args.model, name, tool_args, encoded)
+                                             for _ in range(args.rounds))
+            line += f'{plain_ttft * 1000:>9.0f}ms{encoded_ttft * 1000:>8.0f}ms'
+        print(line)
+    print(format_counts('total', *totals))
+    print('encoding: saved by tables, dropped empty fields and shortened text; cut: saved by leaving out rows over the budget')
+
+
+def format_counts(name: str, plain: int, compact: int, budgeted: int) -> str:
+    return (f'{name:<28}{plain:>8}{compact:>9}{budgeted:>10}'
+            f'{1 - compact / plain:>10.0%}{(compact - budgeted) / plain:>7.0%}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from spotify_rate_limiter import request_priority, PRIORITY_BACKGROUND
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# After the soft TTL the bundle is served stale while a background refresh runs,
+# after the hard TTL it is gone from the cache and the next request has to wait for a refetch
+BUNDLE_SOFT_TTL = int(os.getenv('SPOTIFY_BUNDLE_SOFT_TTL', '3600'))
+BUNDLE_HARD_TTL = int(os.getenv('SPOTIFY_BUNDLE_HARD_TTL', str(6 * 3600)))
+# A refresh holding the lock longer than this is assumed dead
+BUNDLE_LOCK_TIMEOUT = int(os.getenv('SPOTIFY_BUNDLE_LOCK_TIMEOUT', '30'))
+
+
+class StaleWhileRevalidateCache:
+    """
+    Serves the cached spotify_data bundle with soft and hard TTLs.
+    The cache is passed per call so each user's bundle lives in that user's namespace.
+    Only one refresh per namespace runs at a time: a process-local lock guards the threads of
+    this worker and cache.add() on a lock key guards the other workers sharing the cache.
+    """
+
+    def __init__(self, key: str = 'spotify_data', soft_ttl: int = BUNDLE_SOFT_TTL,
+                 lock_timeout: int = BUNDLE_LOCK_TIMEOUT):
+        self.key = key
+        self.soft_ttl = soft_ttl
+        self.lock_timeout = lock_timeout
+        self._lock_key = f'{key}:refresh_lock'
+        self._local_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'fresh': 0, 'stale': 0, 'miss': 0, 'background_refreshes': 0, 'waited': 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get(self, cache, spotify_helpers) -> Optional[Dict]:
+        """
+        Return the bundle from cache, refetching it with spotify_helpers.gather_spotify_data when needed
+        """
+        data = cache.get(self.key)
+        if data:
+            if time.time() - data.get('fetched_at', 0) < self.soft_ttl:
+                self._count('fresh')
+            else:
+                self._count('stale')
+                self._refresh_in_background(cache, spotify_helpers)
+            return data
+
+        self._count('miss')
+        return self._refresh_blocking(cache, spotify_helpers)
+
+    def _local_lock_for(self, cache) -> threading.Lock:
+        with self._locks_guard:
+            return self._local_locks.setdefault(getattr(cache, 'prefix', ''), threading.Lock())
+
+    def _acquire_refresh_lock(self, cache) -> bool:
+        local_lock = self._local_lock_for(cache)
+        if not local_lock.acquire(blocking=False):
+            return False
+        if not cache.add(self._lock_key, True, timeout=self.lock_timeout):
+            local_lock.release()
+            return False
+        return True
+
+    def _release_refresh_lock(self, cache) -> None:
+        cache.delete(self._lock_key)
+        self._local_lock_for(cache).release()
+
+    def _refresh_in_background(self, cache, spotify_helpers) -> None:
+        if not self._acquire_refresh_lock(cache):
+            return
+
+        def refresh():
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    spotify_helpers.gather_spotify_data(cache)
+                logger.info(f"Refreshed stale {self.key} in the background")
+            except Exception as e:
+                logger.error(f"Background refresh of {self.key} failed: {str(e)}", exc_info=True)
+            finally:
+                self._release_refresh_lock(cache)
+
+        self._count('background_refreshes')
+        threading.Thread(target=refresh, name='spotify-bundle-refresh', daemon=True).start()
+
+    def _refresh_blocking(self, cache, spotify_helpers) -> Optional[Dict]:
+        deadline = time.monotonic() + self.lock_timeout
+        locked = self._acquire_refresh_lock(cache)
+        if not locked:
+            self._count('waited')
+        while not locked:
+            time.sleep(0.1)
+            data = cache.get(self.key)
+            if data:
+                return data
+            if time.monotonic() > deadline:
+                logger.warning(f"Timed out waiting for another refresh of {self.key}, fetching directly")
+                return spotify_helpers.gather_spotify_data(cache)
+            locked = self._acquire_refresh_lock(cache)
+
+        try:
+            # Another thread or worker may have filled the cache while we waited
+            data = cache.get(self.key)
+            return data if data else spotify_helpers.gather_spotify_data(cache)
+        finally:
+            self._release_refresh_lock(cache)
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            return dict(self._stats)
@@ -0,0 +1,255 @@
+import builtins
+import io
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import spotify_records
+from spotify_records import Album, Artist, Record, Track
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', '100000'))
+# Persist the catalog to this SQLite file, memory only when empty. Entries are pickled: only
+# point this at a file this app alone can write, unpickling only resolves record classes
+CATALOG_DB_PATH = os.getenv('CATALOG_DB_PATH', '')
+# Seconds an entity stays valid after it was last seen, per "several items" endpoint name
+CATALOG_TTLS = {
+    'tracks': int(os.getenv('CATALOG_TRACKS_TTL', str(3 * 24 * 3600))),
+    'albums': int(os.getenv('CATALOG_ALBUMS_TTL', str(7 * 24 * 3600))),
+    'artists': int(os.getenv('CATALOG_ARTISTS_TTL', str(24 * 3600)))
+}
+
+_RECORD_ENTITIES = {Track: 'tracks', Album: 'albums', Artist: 'artists'}
+# Fields describing the user's relation to an item rather than the item itself
+_USER_FIELDS = ('played_at', 'added_at')
+# Only these URIs end in a catalog ID, local files (spotify:local:...) end in their duration
+_ENTITY_URI = re.compile(r'spotify:(track|album|artist):([0-9A-Za-z]+)')
+
+
+class RecordUnpickler(pickle.Unpickler):
+    """
+    Unpickler for values this app cached: plain containers and records. Any other global
+    in the data is refused, so a tampered store cannot run code when a value is loaded.
+    """
+    _BUILTINS = frozenset({'set', 'frozenset'})
+
+    def find_class(self, module: str, name: str) -> Any:
+        if module == 'builtins' and name in self._BUILTINS:
+            return getattr(builtins, name)
+        if module == 'spotify_records':
+            cls = getattr(spotify_records, name, None)
+            if isinstance(cls, type) and issubclass(cls, Record):
+                return cls
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed in cached values")
+
+
+def loads_records(data: bytes) -> Any:
+    return RecordUnpickler(io.BytesIO(data)).load()
+
+
+def _holds_records(value: Any) -> bool:
+    return isinstance(value, Record) or (isinstance(value, tuple) and any(isinstance(item, Record) for item in value))
+
+
+class CatalogCache:
+    """
+    Track, album and artist metadata shared by every user, keyed by Spotify ID.
+    Holds raw API objects from the "several items" endpoints and the records the projections
+    build from them, one copy per ID (per projection for records), with a TTL per entity type.
+    Cached values are shared between users and must not be mutated.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, max_entries: int = CATALOG_CACHE_SIZE,
+                 db_path: str = CATALOG_DB_PATH):
+        self.ttls = dict(CATALOG_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries: 'OrderedDict[str, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {
+            'hits': 0, 'misses': 0, 'db_hits': 0, 'stored': 0,
+            'deduplicated': 0, 'expired': 0, 'evicted': 0
+        }
+        if db_path:
+            conn = self._conn()
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB,
+                    expires_at REAL
+                )
+            ''')
+            with conn:
+                conn.execute('DELETE FROM catalog_entries WHERE expires_at <= ?', (time.time(),))
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=10)
+        return conn
+
+    @staticmethod
+    def _key(entity: str, spotify_id: str, variant: str = '') -> str:
+        return f'{entity}:{spotify_id}:{variant}' if variant else f'{entity}:{spotify_id}'
+
+    def _ttl(self, key: str) -> int:
+        return self.ttls[key.split(':', 1)[0]]
+
+    def _lookup(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._stats['expired'] += 1
+            if not self.db_path:
+                self._stats['misses'] += 1
+                return None
+
+        try:
+            row = self._conn().execute(
+                'SELECT value, expires_at FROM catalog_entries WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Catalog read failed for {key}: {str(e)}")
+            row = None
+        if row is not None:
+            try:
+                value = loads_records(row[0])
+            except pickle.UnpicklingError as e:
+                logger.error(f"Dropping catalog entry {key}: {str(e)}")
+                row = None
+        with self._lock:
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['db_hits'] += 1
+            self._insert(key, value, row[1])
+            return value
+
+    def _insert(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evicted'] += 1
+
+    def _store(self, items: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        Store values under their keys and return the canonical value of each.
+        A value equal to the stored one keeps the stored copy and only has its expiry extended,
+        at most once per half TTL so popular entities do not rewrite the database on every sighting.
+        """
+        now = time.time()
+        canonical = {}
+        writes = []
+        with self._lock:
+            for key, value in items:
+                ttl = self._ttl(key)
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now and entry[0] == value:
+                    self._stats['deduplicated'] += 1
+                    canonical[key] = value = entry[0]
+                    if entry[1] - now > ttl / 2:
+                        self._entries.move_to_end(key)
+                        continue
+                else:
+                    self._stats['stored'] += 1
+                    canonical[key] = value
+                self._insert(key, value, now + ttl)
+                writes.append((key, value, now + ttl))
+
+        if self.db_path and writes:
+            try:
+                with self._conn() as conn:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO catalog_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                        [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires_at)
+                         for key, value, expires_at in writes]
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Catalog write failed: {str(e)}")
+        return canonical
+
+    def get_many_raw(self, entity: str, ids: List[str]) -> Dict[str, Dict]:
+        """Raw API objects seen recently for `ids`, unknown and expired ids are left out"""
+        found = {}
+        for spotify_id in dict.fromkeys(ids):
+            if spotify_id:
+                value = self._lookup(self._key(entity, spotify_id))
+                if value is not None:
+                    found[spotify_id] = value
+        return found
+
+    def put_many_raw(self, entity: str, objects: Dict[str, Optional[Dict]]) -> Dict[str, Dict]:
+        """Store raw API objects by ID, returning the canonical object for each stored ID"""
+        keys = {spotify_id: self._key(entity, spotify_id) for spotify_id, obj in objects.items() if obj}
+        canonical = self._store((key, objects[spotify_id]) for spotify_id, key in keys.items())
+        return {spotify_id: canonical[key] for spotify_id, key in keys.items()}
+
+    @staticmethod
+    def record_key(record: Record) -> Optional[str]:
+        """
+        Catalog key of a track, album or artist record, None for records that carry
+        user-specific fields or no Spotify ID. Records of different projections get different keys.
+        """
+        entity = _RECORD_ENTITIES.get(type(record))
+        if entity is None:
+            return None
+        slots = type(record).__slots__
+        if any(name in slots and name in record for name in _USER_FIELDS):
+            return None
+        spotify_id = record.get('id')
+        if not spotify_id:
+            match = _ENTITY_URI.fullmatch(record.get('uri') or '')
+            if match is None or match.group(1) != entity[:-1]:
+                return None
+            spotify_id = match.group(2)
+        fields = sum(1 << index for index, name in enumerate(slots) if name in record)
+        projection = getattr(record, '_projection', None)
+        if projection is None:
+            # Built by hand, tell fields holding names from fields holding records apart
+            nested = sum(1 << index for index, name in enumerate(slots) if _holds_records(record.get(name)))
+            variant = f'{fields:x}.{nested:x}'
+        else:
+            variant = f'{projection}.{fields:x}'
+        return CatalogCache._key(entity, spotify_id, variant)
+
+    def reference(self, record: Record) -> Optional[str]:
+        """Store the record and return its key, or None when it is not catalog metadata"""
+        key = self.record_key(record)
+        if key is not None:
+            self._store([(key, record)])
+        return key
+
+    def resolve(self, key: str) -> Record:
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['db_hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'hit_rate': round((self._stats['hits'] + self._stats['db_hits']) / lookups, 3) if lookups else 0.0,
+                'persistent': bool(self.db_path)
+            }
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from spotify_client import SpotifyClient
+from spotify_helpers import SpotifyHelpers
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Clients unused for this many seconds are dropped
+SPOTIFY_CLIENT_IDLE_SECONDS = int(os.getenv('SPOTIFY_CLIENT_IDLE_SECONDS', '1800'))
+SPOTIFY_CLIENT_REGISTRY_SIZE = int(os.getenv('SPOTIFY_CLIENT_REGISTRY_SIZE', '1000'))
+# Minimum seconds between two sweeps for idle clients
+_SWEEP_INTERVAL = 60
+
+
+class SpotifyClientRegistry:
+    """
+    One long-lived SpotifyHelpers (and its SpotifyClient) per user, shared by page requests
+    and tool rounds. A refreshed access token is swapped into the existing client, users
+    idle for longer than idle_seconds are evicted, as are the least recently used ones beyond max_clients.
+    """
+
+    def __init__(self, idle_seconds: int = SPOTIFY_CLIENT_IDLE_SECONDS, max_clients: int = SPOTIFY_CLIENT_REGISTRY_SIZE):
+        self.idle_seconds = idle_seconds
+        self.max_clients = max_clients
+        self._entries: 'OrderedDict[str, Tuple[SpotifyHelpers, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._stats = {'created': 0, 'reused': 0, 'token_swaps': 0, 'evicted': 0}
+
+    def helpers(self, access_token: str, user_id: Optional[str] = None) -> SpotifyHelpers:
+        """The user's helpers, keyed by user ID or by token digest while the user is unknown"""
+        key = user_id or hashlib.sha256(access_token.encode()).hexdigest()[:16]
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                helpers = SpotifyHelpers(SpotifyClient(access_token, user_id))
+                self._stats['created'] += 1
+            else:
+                helpers = entry[0]
+                self._stats['reused'] += 1
+                if helpers.client.access_token != access_token:
+                    helpers.client.set_access_token(access_token)
+                    self._stats['token_swaps'] += 1
+            self._entries[key] = (helpers, now)
+            while len(self._entries) > self.max_clients:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+        return helpers
+
+    def client(self, access_token: str, user_id: Optional[str] = None) -> SpotifyClient:
+        return self.helpers(access_token, user_id).client
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep < _SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        # Entries are kept in order of last use, the idle ones are at the front
+        while self._entries:
+            key, (_, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.idle_seconds:
+                break
+            del self._entries[key]
+            self._stats['evicted'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'clients': len(self._entries)}
+
+
+spotify_clients = SpotifyClientRegistry()
@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlencode
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+ETAG_CACHE_SIZE = int(os.getenv('SPOTIFY_ETAG_CACHE_SIZE', '2048'))
+
+
+class ETagEntry:
+    __slots__ = ('etag', 'body', 'size', 'parse_seconds')
+
+    def __init__(self, etag: str, body: Any, size: int, parse_seconds: float):
+        self.etag = etag
+        self.body = body
+        self.size = size
+        self.parse_seconds = parse_seconds
+
+
+class ETagCache:
+    """
+    Conditional-GET cache for Spotify responses, keyed per user and per URL.
+    Stores the ETag with the parsed body so a 304 can be answered without downloading
+    or parsing anything. Cached bodies are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = ETAG_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, ETagEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'lookups': 0,
+            'not_modified': 0,
+            'stored': 0,
+            'evicted': 0,
+            'bytes_saved': 0,
+            'parse_seconds_saved': 0.0
+        }
+
+    @staticmethod
+    def make_key(user_key: str, url: str, params: Optional[Dict] = None) -> Tuple[str, str]:
+        query = urlencode(sorted(params.items())) if params else ''
+        return user_key, f'{url}?{query}' if query else url
+
+    def lookup(self, key: Hashable) -> Optional[ETagEntry]:
+        with self._lock:
+            self._stats['lookups'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key: Hashable, etag: str, body: Any, size: int, parse_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = ETagEntry(etag, body, size, parse_seconds)
+            self._entries.move_to_end(key)
+            self._stats['stored'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def note_not_modified(self, entry: ETagEntry) -> None:
+        """Record a 304 that was served from the cache"""
+        with self._lock:
+            self._stats['not_modified'] += 1
+            self._stats['bytes_saved'] += entry.size
+            self._stats['parse_seconds_saved'] += entry.parse_seconds
+
+    def invalidate_user(self, user_key: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_key]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['hit_rate'] = round(stats['not_modified'] / stats['lookups'], 3) if stats['lookups'] else 0.0
+        return stats
+
+
+etag_cache = ETagCache()
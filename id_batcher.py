@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# How long the first caller waits for other callers to add ids to its batch, only when others are active
+BATCH_WINDOW = float(os.getenv('SPOTIFY_BATCH_WINDOW_MS', '10')) / 1000
+
+# Maximum ids per request on Spotify's "several items" endpoints
+BATCH_LIMITS = {
+    'tracks': 50,
+    'artists': 50,
+    'albums': 20
+}
+
+
+class _Batch:
+    __slots__ = ('ids', 'done', 'results', 'error')
+
+    def __init__(self):
+        self.ids: Dict[str, None] = {}
+        self.done = threading.Event()
+        self.results: Dict[str, Optional[Dict]] = {}
+        self.error: Optional[BaseException] = None
+
+
+class IdBatcher:
+    """
+    Merge id lookups from concurrent callers into shared batches.
+    The first caller for an entity type opens a batch and, when other callers are active for
+    that type, waits BATCH_WINDOW for them to join. It then fetches every collected id at once.
+    Catalog objects are the same for every user, so batches are shared across users.
+    Ids the leader's fetch did not return are fetched again by the callers that asked for them.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _Batch] = {}
+        self._active: Dict[str, int] = {}
+        self._stats = {'requests': 0, 'ids_requested': 0, 'batches': 0, 'ids_fetched': 0, 'fallbacks': 0}
+
+    def get_many(self, entity: str, ids: Iterable[str],
+                 fetch: Callable[[List[str]], Dict[str, Optional[Dict]]]) -> Dict[str, Optional[Dict]]:
+        """
+        Return {id: object} for the requested ids. `fetch` leaves out ids it failed to get,
+        it is called by the batch leader and by followers for the ids the leader did not get.
+        """
+        unique_ids = list(dict.fromkeys(id_ for id_ in ids if id_))
+        if not unique_ids:
+            return {}
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['ids_requested'] += len(unique_ids)
+            self._active[entity] = self._active.get(entity, 0) + 1
+            batch = self._pending.get(entity)
+            leader = batch is None
+            if leader:
+                batch = self._pending[entity] = _Batch()
+                # A lone caller has no one to wait for
+                wait = self.window if self._active[entity] > 1 else 0
+            batch.ids.update(dict.fromkeys(unique_ids))
+
+        try:
+            if leader:
+                self._lead(entity, batch, wait, fetch)
+            else:
+                batch.done.wait()
+        finally:
+            with self._lock:
+                self._active[entity] -= 1
+
+        results = batch.results
+        if leader:
+            if batch.error is not None:
+                raise batch.error
+        else:
+            missing = [id_ for id_ in unique_ids if id_ not in results]
+            if missing:
+                # The leader's request failed, possibly only for its own token
+                logger.warning(f"Batched lookup of {len(missing)} {entity} failed, fetching them directly")
+                with self._lock:
+                    self._stats['fallbacks'] += 1
+                results = {**results, **fetch(missing)}
+        return {id_: results.get(id_) for id_ in unique_ids}
+
+    def _lead(self, entity: str, batch: _Batch, wait: float,
+              fetch: Callable[[List[str]], Dict[str, Optional[Dict]]]) -> None:
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            # Close the batch, later callers start a new one
+            del self._pending[entity]
+            self._stats['batches'] += 1
+            self._stats['ids_fetched'] += len(batch.ids)
+        try:
+            batch.results = fetch(list(batch.ids))
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+id_batcher = IdBatcher()
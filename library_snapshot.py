@@ -0,0 +1,459 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from library_sync import LIBRARY_DATA_DIR, library_sync
+from play_history import play_history, _to_iso
+from spotify_rate_limiter import request_priority, PRIORITY_BACKGROUND
+from spotify_records import Album, Artist, Playlist, Track
+from user_files import UserLocks, user_file_path
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+LIBRARY_SNAPSHOT_DIR = os.getenv('LIBRARY_SNAPSHOT_DIR', os.path.join(LIBRARY_DATA_DIR, 'snapshots'))
+# A snapshot older than this is checked against the library, play history and playlists again.
+# Partial snapshots, written while the first full library sync runs, are never considered fresh.
+LIBRARY_SNAPSHOT_REFRESH_SECONDS = float(os.getenv('LIBRARY_SNAPSHOT_REFRESH_SECONDS', '300'))
+SNAPSHOT_PLAYLIST_LIMIT = 1000
+
+MAGIC = b'SPLIBSN1'
+ALIGNMENT = 64
+_ADDED_AT_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _to_epoch(added_at: str) -> int:
+    return int(datetime.strptime(added_at, _ADDED_AT_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _from_epoch(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime(_ADDED_AT_FORMAT)
+
+
+class _SnapshotBuilder:
+    """Collects rows into columns: strings go to a shared dictionary, lists to offset/value pairs"""
+
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.artists: Dict[str, int] = {}
+        self.albums: Dict[str, int] = {}
+        self.artist_columns = ([], [])  # id, name
+        self.album_columns = ([], [])
+
+    def string(self, value: Optional[str]) -> int:
+        """Dictionary code of a string, -1 for None"""
+        if value is None:
+            return -1
+        return self.strings.setdefault(value, len(self.strings))
+
+    def artist(self, artist_id: Optional[str], name: Optional[str]) -> int:
+        key = artist_id or f'name:{name}'
+        if key not in self.artists:
+            self.artists[key] = len(self.artists)
+            self.artist_columns[0].append(self.string(artist_id))
+            self.artist_columns[1].append(self.string(name))
+        return self.artists[key]
+
+    def album(self, album_id: Optional[str], name: Optional[str]) -> int:
+        key = album_id or f'name:{name}'
+        if key not in self.albums:
+            self.albums[key] = len(self.albums)
+            self.album_columns[0].append(self.string(album_id))
+            self.album_columns[1].append(self.string(name))
+        return self.albums[key]
+
+    def artist_lists(self, rows: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = [0]
+        values = []
+        for row in rows:
+            values.extend(
+                self.artist(artist_id, name)
+                for name, artist_id in zip(row.get('artists') or (), row.get('artist_ids') or ())
+            )
+            offsets.append(len(values))
+        return np.array(offsets, dtype=np.int32), np.array(values, dtype=np.int32)
+
+    def build(self, tracks: List[Dict], plays: List[Dict], playlists: List[Dict]) -> Dict[str, np.ndarray]:
+        columns = {}
+        codes = lambda values: np.array(values, dtype=np.int32)
+
+        columns['tracks.artist_offsets'], columns['tracks.artists'] = self.artist_lists(tracks)
+        columns['tracks.id'] = codes([self.string(track.get('id')) for track in tracks])
+        columns['tracks.name'] = codes([self.string(track.get('name')) for track in tracks])
+        columns['tracks.uri'] = codes([self.string(track.get('uri')) for track in tracks])
+        columns['tracks.album'] = codes([self.album(track.get('album_id'), track.get('album')) for track in tracks])
+        columns['tracks.added_at'] = np.array([_to_epoch(track['added_at']) for track in tracks], dtype=np.int64)
+
+        columns['plays.artist_offsets'], columns['plays.artists'] = self.artist_lists(plays)
+        columns['plays.played_at'] = np.array([play['played_at'] for play in plays], dtype=np.int64)
+        columns['plays.id'] = codes([self.string(play.get('id')) for play in plays])
+        columns['plays.name'] = codes([self.string(play.get('name')) for play in plays])
+        columns['plays.album'] = codes([self.album(play.get('album_id'), play.get('album')) for play in plays])
+
+        columns['playlists.id'] = codes([self.string(playlist.get('id')) for playlist in playlists])
+        columns['playlists.name'] = codes([self.string(playlist.get('name')) for playlist in playlists])
+        columns['playlists.uri'] = codes([self.string(playlist.get('uri')) for playlist in playlists])
+
+        columns['artists.id'], columns['artists.name'] = map(codes, self.artist_columns)
+        columns['albums.id'], columns['albums.name'] = map(codes, self.album_columns)
+
+        encoded = [value.encode('utf-8') for value in self.strings]
+        columns['strings.offsets'] = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=columns['strings.offsets'][1:])
+        columns['strings.data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return columns
+
+
+class LibrarySnapshot:
+    """
+    Read-only view of a user's snapshot file. Columns are NumPy arrays over a shared mmap,
+    so opening costs a header parse and every worker reads the same page-cached bytes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a library snapshot')
+        header_length, = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length])
+        self.columns = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(spec['dtype']), count=spec['count'], offset=spec['offset'])
+            for name, spec in self.header['columns'].items()
+        }
+        self._string_offsets = self.columns['strings.offsets']
+        self._string_data = self.columns['strings.data']
+        self._decoded: Dict[int, Optional[str]] = {}
+        self._folded: Optional[Tuple[str, np.ndarray]] = None
+
+    @property
+    def built_at(self) -> float:
+        return self.header['built_at']
+
+    @property
+    def partial(self) -> bool:
+        """Whether the saved tracks are only the part of the library fetched so far"""
+        return self.header.get('partial', False)
+
+    @property
+    def source(self) -> Dict:
+        return self.header['source']
+
+    def string(self, code: int) -> Optional[str]:
+        if code < 0:
+            return None
+        start, end = self._string_offsets[code], self._string_offsets[code + 1]
+        return self._string_data[start:end].tobytes().decode('utf-8')
+
+    def _shared_string(self, code: int) -> Optional[str]:
+        # Artist and album names repeat, decode each once per snapshot
+        if code not in self._decoded:
+            self._decoded[code] = self.string(code)
+        return self._decoded[code]
+
+    def _artists_of(self, table: str, row: int) -> List[int]:
+        offsets = self.columns[f'{table}.artist_offsets']
+        return self.columns[f'{table}.artists'][offsets[row]:offsets[row + 1]].tolist()
+
+    def artist_name(self, index: int) -> Optional[str]:
+        return self._shared_string(int(self.columns['artists.name'][index]))
+
+    def album_name(self, index: int) -> Optional[str]:
+        return self._shared_string(int(self.columns['albums.name'][index]))
+
+    @property
+    def track_count(self) -> int:
+        return len(self.columns['tracks.id'])
+
+    @property
+    def play_count(self) -> int:
+        return len(self.columns['plays.id'])
+
+    def saved_tracks(self, offset: int = 0, limit: Optional[int] = None,
+                     query: Optional[str] = None) -> List[Track]:
+        """Saved tracks newest first, decoding only the rows returned"""
+        rows = self.saved_track_rows(query)
+        end = None if limit is None else offset + limit
+        return [self.saved_track(int(row)) for row in rows[offset:end]]
+
+    def saved_track_rows(self, query: Optional[str] = None) -> np.ndarray:
+        """
+        Rows of the saved tracks whose name, album or one of whose artists contains query
+        (case-insensitive), every row without a query. The query is matched once per distinct
+        string and the result spread to the rows through the code columns.
+        """
+        if not query:
+            return np.arange(self.track_count)
+        hits = self._string_hits(query.lower())
+        columns = self.columns
+        matches = hits[columns['tracks.name']] | hits[columns['albums.name']][columns['tracks.album']]
+        # Matching artists per track: differences of a running count at the list boundaries
+        artist_hits = np.concatenate(([0], np.cumsum(hits[columns['artists.name']][columns['tracks.artists']])))
+        offsets = columns['tracks.artist_offsets']
+        matches |= artist_hits[offsets[1:]] > artist_hits[offsets[:-1]]
+        return np.flatnonzero(matches)
+
+    def _folded_strings(self) -> Tuple[str, np.ndarray]:
+        """Every dictionary string lowercased and joined, with the start of each, decoded once per snapshot"""
+        if self._folded is None:
+            data = self._string_data.tobytes()
+            offsets = self._string_offsets.tolist()
+            folded = [data[start:end].decode('utf-8').lower() for start, end in zip(offsets, offsets[1:])]
+            starts = np.zeros(len(folded) + 1, dtype=np.int64)
+            np.cumsum([len(value) + 1 for value in folded], out=starts[1:])
+            self._folded = ('\0'.join(folded), starts)
+        return self._folded
+
+    def _string_hits(self, needle: str) -> np.ndarray:
+        """
+        hits[code] tells whether dictionary string `code` contains needle. One extra False entry
+        at the end is what code -1 (None) reads.
+        """
+        text, starts = self._folded_strings()
+        hits = np.zeros(len(starts), dtype=bool)
+        position = text.find(needle)
+        while position != -1:
+            code = int(np.searchsorted(starts, position, side='right')) - 1
+            hits[code] = True
+            # Continue in the next string, one hit per string is enough
+            position = text.find(needle, int(starts[code + 1]))
+        return hits
+
+    def saved_track(self, row: int) -> Track:
+        return Track(
+            name=self.string(int(self.columns['tracks.name'][row])),
+            artists=[self.artist_name(artist) for artist in self._artists_of('tracks', row)],
+            album=self.album_name(self.columns['tracks.album'][row]),
+            uri=self.string(int(self.columns['tracks.uri'][row])),
+            added_at=_from_epoch(int(self.columns['tracks.added_at'][row]))
+        )
+
+    def plays(self, limit: Optional[int] = None) -> List[Track]:
+        """Stored plays newest first"""
+        tracks = []
+        for row in range(min(self.play_count, limit) if limit is not None else self.play_count):
+            track_id = self.string(int(self.columns['plays.id'][row]))
+            album = int(self.columns['plays.album'][row])
+            album_id = self._shared_string(int(self.columns['albums.id'][album]))
+            tracks.append(Track(
+                name=self.string(int(self.columns['plays.name'][row])),
+                uri=f'spotify:track:{track_id}',
+                played_at=_to_iso(int(self.columns['plays.played_at'][row])),
+                artists=[
+                    Artist(name=self.artist_name(artist), id=self._shared_string(int(self.columns['artists.id'][artist])),
+                           uri=f"spotify:artist:{self._shared_string(int(self.columns['artists.id'][artist]))}")
+                    for artist in self._artists_of('plays', row)
+                ],
+                album=Album(name=self.album_name(album), id=album_id, uri=f'spotify:album:{album_id}')
+            ))
+        return tracks
+
+    def playlists(self) -> List[Playlist]:
+        return [
+            Playlist(id=self.string(int(playlist_id)), name=self.string(int(name)), uri=self.string(int(uri)))
+            for playlist_id, name, uri in zip(
+                self.columns['playlists.id'], self.columns['playlists.name'], self.columns['playlists.uri']
+            )
+        ]
+
+    def close(self) -> None:
+        self.columns = {}
+        self._string_offsets = self._string_data = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Arrays handed out earlier still point into the map, it is released with them
+            pass
+
+
+class LibrarySnapshotStore:
+    """
+    Writes one snapshot file per user and hands out mmap views of them. A rebuilt snapshot
+    replaces the file atomically, readers holding the old one keep a consistent view.
+    """
+
+    def __init__(self, data_dir: str = LIBRARY_SNAPSHOT_DIR):
+        self.data_dir = data_dir
+        self._open: Dict[str, Tuple[Tuple[int, int], LibrarySnapshot]] = {}
+        self._lock_for = UserLocks()
+        self._guard = threading.Lock()
+        self._refreshing: Set[str] = set()
+        library_sync.add_full_sync_listener(self._on_full_sync)
+
+    def _path(self, user_id: str) -> str:
+        return user_file_path(self.data_dir, user_id, '.snapshot')
+
+    def write(self, user_id: str, tracks: List[Dict], plays: List[Dict], playlists: List[Dict],
+              source: Optional[Dict] = None, partial: bool = False) -> str:
+        """
+        Write a snapshot from library_sync tracks, play_history raw plays and raw playlists,
+        partial when the tracks are not the whole library yet
+        """
+        columns = _SnapshotBuilder().build(tracks, plays, playlists)
+
+        specs = {}
+        offset = 0
+        for name, column in columns.items():
+            specs[name] = {'dtype': column.dtype.str, 'count': len(column), 'offset': offset}
+            offset += -(-column.nbytes // ALIGNMENT) * ALIGNMENT
+        header = {'version': 1, 'user_id': user_id, 'built_at': time.time(), 'source': source or {},
+                  'partial': partial, 'columns': specs}
+
+        # Column offsets are relative to the data start until the header size is known,
+        # leave room for the digits they gain when made absolute
+        encoded = json.dumps(header).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(encoded) + 16 * len(specs)) // ALIGNMENT) * ALIGNMENT
+        for spec in specs.values():
+            spec['offset'] += data_start
+        encoded = json.dumps(header).encode()
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        path = self._path(user_id)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(MAGIC + struct.pack('<Q', len(encoded)) + encoded)
+            for name, column in columns.items():
+                file.seek(specs[name]['offset'])
+                file.write(column.tobytes())
+            file.truncate(max(file.tell(), data_start))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote library snapshot for {user_id}: {len(tracks)} tracks, {len(plays)} plays, "
+                    f"{len(playlists)} playlists, {os.path.getsize(path)} bytes")
+        return path
+
+    def open(self, user_id: str) -> Optional[LibrarySnapshot]:
+        """mmap view of the user's snapshot, reused until the file is replaced"""
+        path = self._path(user_id)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        identity = (stat.st_dev, stat.st_ino)
+        cached = self._open.get(user_id)
+        if cached and cached[0] == identity:
+            return cached[1]
+
+        try:
+            snapshot = LibrarySnapshot(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to open library snapshot for {user_id}: {str(e)}")
+            return None
+        # The replaced snapshot is not closed, threads may still be reading it.
+        # Its mmap is released once the last reference goes away.
+        self._open[user_id] = (identity, snapshot)
+        return snapshot
+
+    def age(self, user_id: str) -> Optional[float]:
+        """Seconds since the snapshot was last built or confirmed current"""
+        try:
+            return time.time() - os.stat(self._path(user_id)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _fresh(self, user_id: str) -> bool:
+        age = self.age(user_id)
+        if age is None or age >= LIBRARY_SNAPSHOT_REFRESH_SECONDS:
+            return False
+        snapshot = self.open(user_id)
+        return snapshot is not None and not snapshot.partial
+
+    def refresh(self, client, user_id: str, force: bool = False) -> Optional[LibrarySnapshot]:
+        """
+        Return the user's snapshot. Once it is older than LIBRARY_SNAPSHOT_REFRESH_SECONDS, or
+        partial, the saved tracks are synced before returning. Play history and playlists are
+        refetched in the background and folded into the snapshot when they arrive.
+        """
+        if not force and self._fresh(user_id):
+            return self.open(user_id)
+
+        with self._lock_for(user_id):
+            # Another thread may have refreshed it while we waited
+            if not force and self._fresh(user_id):
+                return self.open(user_id)
+
+            tracks, complete = library_sync.sync_saved_tracks(client, user_id)
+            current = self.open(user_id)
+            snapshot = self._rebuild(user_id, tracks, not complete, play_history.read_raw(user_id),
+                                     self._stored_playlists(current), force)
+        self._refresh_in_background(client, user_id)
+        return snapshot
+
+    def _rebuild(self, user_id: str, tracks: List[Dict], partial: bool, plays: List[Dict],
+                 playlists: List[Dict], force: bool = False) -> Optional[LibrarySnapshot]:
+        """Rewrite the snapshot when a source changed, otherwise mark it checked. Caller holds the user's lock"""
+        source = {
+            'tracks': [len(tracks), tracks[0]['added_at'] if tracks else None],
+            'plays': [len(plays), plays[0]['played_at'] if plays else None],
+            'playlists': sorted((playlist.get('id'), playlist.get('snapshot_id')) for playlist in playlists)
+        }
+
+        current = self.open(user_id)
+        if (current is not None and not force and current.partial == partial
+                and json.loads(json.dumps(source)) == current.source):
+            # Nothing changed, mark the snapshot as checked for every worker
+            os.utime(self._path(user_id))
+            return current
+
+        self.write(user_id, tracks, plays, playlists, source, partial)
+        return self.open(user_id)
+
+    @staticmethod
+    def _stored_playlists(snapshot: Optional[LibrarySnapshot]) -> List[Dict]:
+        """The playlists a snapshot was built from, as the raw fields the snapshot keeps"""
+        if snapshot is None:
+            return []
+        snapshot_ids = {playlist_id: snapshot_id for playlist_id, snapshot_id in snapshot.source.get('playlists', [])}
+        return [
+            {'id': playlist['id'], 'name': playlist['name'], 'uri': playlist['uri'],
+             'snapshot_id': snapshot_ids.get(playlist['id'])}
+            for playlist in snapshot.playlists()
+        ]
+
+    def _refresh_in_background(self, client, user_id: str) -> None:
+        """Poll the play history and refetch the playlists, then rebuild the snapshot with them"""
+        with self._guard:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+
+        def refresh():
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    play_history.poll(client, user_id)
+                    playlists = client.get_user_playlists_raw(SNAPSHOT_PLAYLIST_LIMIT)
+                with self._lock_for(user_id):
+                    current = self.open(user_id)
+                    # Keep the stored playlists when the refetch failed
+                    playlists = [playlist for playlist in playlists if playlist] or self._stored_playlists(current)
+                    tracks, complete = library_sync.current_tracks(user_id)
+                    self._rebuild(user_id, tracks, not complete, play_history.read_raw(user_id), playlists)
+            except Exception as e:
+                logger.error(f"Background library snapshot refresh for {user_id} failed: {str(e)}", exc_info=True)
+            finally:
+                with self._guard:
+                    self._refreshing.discard(user_id)
+
+        threading.Thread(target=refresh, name='library-snapshot-refresh', daemon=True).start()
+
+    def _on_full_sync(self, user_id: str, library: Dict) -> None:
+        """Replace a partial snapshot as soon as the first full library sync is stored"""
+        with self._lock_for(user_id):
+            current = self.open(user_id)
+            if current is None or not current.partial:
+                return
+            self._rebuild(user_id, library['items'], False, play_history.read_raw(user_id),
+                          self._stored_playlists(current))
+
+
+library_snapshots = LibrarySnapshotStore()
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Tuple
+
+from spotify_rate_limiter import request_priority, PRIORITY_BACKGROUND
+from user_files import UserLocks, user_file_path
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+LIBRARY_DATA_DIR = os.getenv('LIBRARY_DATA_DIR', 'library_data')
+# Skip the incremental check entirely if the library was synced this recently
+LIBRARY_MIN_REFRESH_SECONDS = float(os.getenv('LIBRARY_MIN_REFRESH_SECONDS', '60'))
+# Seconds the caller that starts a first full sync waits for it before taking what it has
+LIBRARY_FULL_SYNC_WAIT = float(os.getenv('LIBRARY_FULL_SYNC_WAIT', '2'))
+PAGE_SIZE = 50
+
+
+class _FullSync:
+    """A full sync running in the background and the tracks it has fetched so far"""
+    __slots__ = ('items', 'done', 'complete')
+
+    def __init__(self):
+        self.items: List[Dict] = []
+        self.done = threading.Event()
+        # Set once items hold the whole library and it was stored
+        self.complete = False
+
+
+class LibrarySync:
+    """
+    Keeps a per-user copy of the saved tracks ("Liked Songs") library on disk.
+    The first sync pulls the whole library in the background, later syncs only read pages
+    until they reach an item older than the stored added_at watermark.
+    """
+
+    def __init__(self, data_dir: str = LIBRARY_DATA_DIR):
+        self.data_dir = data_dir
+        self._lock_for = UserLocks()
+        self._guard = threading.Lock()
+        self._full_syncs: Dict[str, _FullSync] = {}
+        self._listeners: List[Callable[[str, Dict], None]] = []
+
+    def _path(self, user_id: str) -> str:
+        return user_file_path(self.data_dir, user_id, '_saved_tracks.json')
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        """Read the stored library for a user, None if it has never been synced"""
+        try:
+            with open(self._path(user_id), 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read saved tracks library for {user_id}: {str(e)}")
+            return None
+
+    def _save(self, user_id: str, library: Dict) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        path = self._path(user_id)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(library, file, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _compact_item(item: Dict) -> Dict:
+        track = item['track']
+        return {
+            'id': track.get('id'),
+            'name': track['name'],
+            'artists': [artist['name'] for artist in track['artists']],
+            'artist_ids': [artist.get('id') for artist in track['artists']],
+            'album': track['album']['name'],
+            'album_id': track['album'].get('id'),
+            'uri': track['uri'],
+            'added_at': item['added_at']
+        }
+
+    def add_full_sync_listener(self, listener: Callable[[str, Dict], None]) -> None:
+        """Call listener(user_id, library) on the sync thread after each stored full sync"""
+        self._listeners.append(listener)
+
+    def sync_saved_tracks(self, client, user_id: str, force: bool = False) -> Tuple[List[Dict], bool]:
+        """
+        Bring the stored library up to date and return its tracks, newest first, and whether
+        they are the whole library. Full syncs run in the background: until one finishes the
+        stored library is returned, or the tracks fetched so far when there is none yet.
+        """
+        started = False
+        with self._lock_for(user_id):
+            library = self.load(user_id)
+            with self._guard:
+                running = self._full_syncs.get(user_id)
+            if running is None:
+                if library and not force and time.time() - library['synced_at'] < LIBRARY_MIN_REFRESH_SECONDS:
+                    return library['items'], True
+                if library and not force:
+                    synced = self._incremental_sync(client, user_id, library)
+                    if synced is not None:
+                        return synced['items'], True
+                running = self._start_full_sync(client, user_id)
+                started = True
+
+        if library:
+            return library['items'], True
+        if started:
+            running.done.wait(LIBRARY_FULL_SYNC_WAIT)
+        return list(running.items), running.complete
+
+    def current_tracks(self, user_id: str) -> Tuple[List[Dict], bool]:
+        """The tracks sync_saved_tracks would return, without contacting Spotify"""
+        with self._guard:
+            running = self._full_syncs.get(user_id)
+        library = self.load(user_id)
+        if library:
+            return library['items'], True
+        if running is not None:
+            return list(running.items), running.complete
+        return [], False
+
+    def _start_full_sync(self, client, user_id: str) -> _FullSync:
+        running = _FullSync()
+        with self._guard:
+            self._full_syncs[user_id] = running
+
+        def sync():
+            library = None
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    library = self._full_sync(client, user_id, running)
+            except Exception as e:
+                logger.error(f"Full saved tracks sync for {user_id} failed: {str(e)}", exc_info=True)
+            finally:
+                with self._guard:
+                    self._full_syncs.pop(user_id, None)
+                running.done.set()
+            # After done is set, listeners may wait on locks held by callers waiting for it
+            if library is not None:
+                for listener in self._listeners:
+                    try:
+                        listener(user_id, library)
+                    except Exception as e:
+                        logger.error(f"Full saved tracks sync listener failed for {user_id}: {str(e)}", exc_info=True)
+
+        threading.Thread(target=sync, name='library-full-sync', daemon=True).start()
+        return running
+
+    def _full_sync(self, client, user_id: str, running: _FullSync) -> Optional[Dict]:
+        """
+        Fetch the whole library into running.items and store it.
+        Returns None without storing anything when a page fails.
+        """
+        started = time.time()
+        first_page = client.get_saved_tracks_raw(PAGE_SIZE, 0)
+        if not first_page:
+            logger.error(f"Full saved tracks sync failed for {user_id}: first page failed")
+            return None
+
+        total = first_page.get('total') or 0
+        first_items = first_page.get('items', [])
+        rest = client.iter_saved_tracks(offset=len(first_items)) if first_page.get('next') else ()
+        fetched = 0
+        for item in chain(first_items, rest):
+            fetched += 1
+            if item.get('track'):
+                running.items.append(self._compact_item(item))
+
+        if fetched < total:
+            logger.error(f"Full saved tracks sync failed for {user_id}: got {fetched} of {total} items")
+            return None
+
+        items = running.items
+        library = {
+            'watermark': items[0]['added_at'] if items else '',
+            'total': fetched,
+            'synced_at': time.time(),
+            'items': items
+        }
+        self._save(user_id, library)
+        running.complete = True
+        logger.info(f"Full saved tracks sync for {user_id}: {len(items)} tracks in {time.time() - started:.2f}s")
+        return library
+
+    def _incremental_sync(self, client, user_id: str, library: Dict) -> Optional[Dict]:
+        """Add the tracks saved since the watermark, None when only a full sync can tell what changed"""
+        watermark = library['watermark']
+        known_uris = {item['uri'] for item in library['items'] if item['added_at'] == watermark}
+        new_items = []
+        new_count = 0  # includes entries without a playable track, which are not stored
+        offset = 0
+        total = None
+
+        while True:
+            page = client.get_saved_tracks_raw(PAGE_SIZE, offset)
+            if not page:
+                logger.error(f"Incremental saved tracks sync failed for {user_id}, serving stored library")
+                return library
+
+            total = page.get('total')
+            reached_watermark = False
+            for item in page.get('items', []):
+                track = item.get('track')
+                # added_at is ISO 8601 in UTC, so string order is time order
+                if item['added_at'] < watermark or (
+                        item['added_at'] == watermark and track and track['uri'] in known_uris):
+                    reached_watermark = True
+                    break
+                new_count += 1
+                if track:
+                    new_items.append(self._compact_item(item))
+
+            if reached_watermark or not page.get('next'):
+                break
+            offset += PAGE_SIZE
+
+        items = new_items + library['items']
+        expected_total = library['total'] + new_count
+        if total is not None and total != expected_total:
+            # Tracks were removed, the watermark cannot tell which ones
+            logger.info(f"Saved tracks count changed for {user_id} ({expected_total} vs {total}), running full sync")
+            return None
+
+        library = {
+            'watermark': items[0]['added_at'] if items else watermark,
+            'total': expected_total,
+            'synced_at': time.time(),
+            'items': items
+        }
+        self._save(user_id, library)
+        logger.info(f"Incremental saved tracks sync for {user_id}: {len(new_items)} new tracks")
+        return library
+
+
+library_sync = LibrarySync()
@@ -1,11 +1,14 @@
 from openai import OpenAI
-from typing import Dict, Iterator, List
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Optional
 import json
 from dotenv import load_dotenv
 import os
 from traceloop.sdk import Traceloop
 from traceloop.sdk.decorators import workflow, task
-from ai_tools import SPOTIFY_TOOLS, SpotifyFunctionHandler
+from ai_tools import READ_ONLY_TOOLS, SPOTIFY_TOOLS, SpotifyFunctionHandler
+from tool_encoding import encoder_for_model
+from tool_cache import session_tool_caches
 from logger_config import setup_logger
 from system_prompt import SYSTEM_PROMPT
 
@@ -32,7 +35,8 @@ class LLMClient:
         query: str,          # The user's input query
         spotify_data: Dict,  # Dictionary containing Spotify-related data
         access_token: str,   # Spotify API access token
-        session_id: str      # Unique identifier for the chat session
+        session_id: str,     # Unique identifier for the chat session
+        user_id: Optional[str] = None  # Spotify user ID, selects the user's long-lived client
     ) -> Iterator[str]:      # Returns a string iterator for streaming responses
         """
         Process a user query, handling both direct responses and tool calls with Spotify API.
@@ -43,6 +47,7 @@ class LLMClient:
             spotify_data: Dictionary containing relevant Spotify data
             access_token: Valid Spotify API access token
             session_id: Unique identifier for the chat session
+            user_id: Spotify user ID, selects the user's long-lived client
 
         Yields:
             Encoded string chunks of the assistant's response
@@ -65,11 +70,15 @@ class LLMClient:
         
         current_messages = messages.copy()  # Working copy of messages
         response = ""  # Accumulator for complete response
+        function_handler = SpotifyFunctionHandler(
+            access_token, spotify_data, session_tool_caches.for_session(session_id), user_id
+        )
         
         while True:
             # Get streaming response from OpenAI
             assistant_message = self._initial_openai_call(current_messages)
             tool_calls = []  # Accumulator for tool calls in this response
+            started: Dict[int, Future] = {}  # Read-only tool calls dispatched while the stream is still arriving
 
             # Process each chunk of the streaming response
             for chunk in assistant_message:
@@ -102,23 +111,17 @@ class LLMClient:
                         if tcchunk.function.arguments:
                             tc["function"]["arguments"] += tcchunk.function.arguments
 
+                    self._start_ready_tool_calls(tool_calls, started, function_handler)
+
             # Exit loop if no tool calls were made
             if not tool_calls:
                 break
                 
             # Convert accumulated tool calls to format needed by handler
-            formatted_tool_calls = [
-                type('ToolCall', (), {
-                    'id': tc['id'],
-                    'function': type('Function', (), {
-                        'name': tc['function']['name'],
-                        'arguments': tc['function']['arguments']
-                    })
-                }) for tc in tool_calls
-            ]
+            formatted_tool_calls = [self._format_tool_call(tc) for tc in tool_calls]
             
             # Process tool calls and update conversation context
-            current_messages = self._handle_tool_calls(formatted_tool_calls, access_token, current_messages)
+            current_messages = self._handle_tool_calls(formatted_tool_calls, function_handler, current_messages, started)
         
         # Update chat history with final response
         messages.append({"role": "assistant", "content": response})
@@ -155,16 +158,52 @@ class LLMClient:
         return response
     
 
+    @staticmethod
+    def _format_tool_call(tc: Dict):
+        return type('ToolCall', (), {
+            'id': tc['id'],
+            'function': type('Function', (), {
+                'name': tc['function']['name'],
+                'arguments': tc['function']['arguments']
+            })
+        })
+
+    @staticmethod
+    def _arguments_complete(arguments: str) -> bool:
+        # A JSON object that parses cannot be the prefix of a longer one
+        if not arguments.rstrip().endswith('}'):
+            return False
+        try:
+            return isinstance(json.loads(arguments), dict)
+        except ValueError:
+            return False
+
+    def _start_ready_tool_calls(self, tool_calls: List[Dict], started: Dict[int, Future],
+                                function_handler: SpotifyFunctionHandler) -> None:
+        """
+        Dispatch read-only tool calls whose arguments have fully arrived, in stream order.
+        Stops at the first write, so nothing runs ahead of a write that precedes it.
+        """
+        for index, tc in enumerate(tool_calls):
+            if index in started:
+                continue
+            if tc["function"]["name"] not in READ_ONLY_TOOLS or not self._arguments_complete(tc["function"]["arguments"]):
+                return
+            logger.debug(f"Starting tool call {tc['function']['name']} while streaming")
+            started[index] = function_handler.submit(self._format_tool_call(tc))
+
     @task(name="handle_tool_calls")
-    def _handle_tool_calls(self, tool_calls: List[Dict], access_token: str, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    def _handle_tool_calls(self, tool_calls: List, function_handler: SpotifyFunctionHandler,
+                           messages: List[Dict[str, str]],
+                           started: Optional[Dict[int, Future]] = None) -> List[Dict[str, str]]:
         logger.info("Handling tool calls")
-        function_handler = SpotifyFunctionHandler(access_token)
 
         # # Create a temporary list for the current conversation
         # current_messages = messages.copy()
         
-        for tool_call in tool_calls:
-            result = function_handler.execute_function(tool_call)
+        results = function_handler.execute_functions(tool_calls, started)
+        encoder = encoder_for_model(self.model)
+        for tool_call, result in zip(tool_calls, results):
             if result is None:
                 logger.warning("No data found for tool call")
                 result = {"error": "No data found"}
@@ -183,7 +222,9 @@ class LLMClient:
                 },
                 {
                     "role": "tool",
-                    "content": json.dumps(result),
+                    "content": encoder.encode(
+                        tool_call.function.name, json.loads(tool_call.function.arguments), result
+                    ),
                     "tool_call_id": tool_call.id
                 }
             ])
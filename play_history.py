@@ -0,0 +1,191 @@
+import fcntl
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from user_files import UserLocks, user_file_path
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+PLAY_HISTORY_DIR = os.getenv('PLAY_HISTORY_DIR', os.path.join(os.getenv('LIBRARY_DATA_DIR', 'library_data'), 'plays'))
+PLAY_HISTORY_MIN_POLL_SECONDS = float(os.getenv('PLAY_HISTORY_MIN_POLL_SECONDS', '30'))
+# Bytes read per step when reading the newest plays from the end of a log
+READ_BLOCK_SIZE = 64 * 1024
+
+# Column order of a stored play, one JSON array per line
+FIELDS = ('played_at', 'id', 'name', 'artists', 'artist_ids', 'album', 'album_id')
+
+
+def _to_millis(played_at: str) -> int:
+    """Convert Spotify's ISO 8601 played_at to unix milliseconds"""
+    fmt = '%Y-%m-%dT%H:%M:%S.%f%z' if '.' in played_at else '%Y-%m-%dT%H:%M:%S%z'
+    parsed = datetime.strptime(played_at.replace('Z', '+0000'), fmt)
+    return int(parsed.timestamp() * 1000)
+
+
+def _to_iso(millis: int) -> str:
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class PlayHistory:
+    """
+    Per-user, append-only log of plays. Each poll asks Spotify only for plays after the
+    newest stored one, so the 50 play window of the API accumulates into a full history.
+    """
+
+    def __init__(self, data_dir: str = PLAY_HISTORY_DIR):
+        self.data_dir = data_dir
+        self._last_poll: Dict[str, float] = {}
+        self._lock_for = UserLocks()
+
+    def _path(self, user_id: str) -> str:
+        return user_file_path(self.data_dir, user_id, '.jsonl')
+
+    @staticmethod
+    def _read_last_played(file) -> int:
+        """Read played_at of the newest stored play from the end of an open log"""
+        file.seek(0, os.SEEK_END)
+        file.seek(max(file.tell() - 4096, 0))
+        for line in reversed(file.read().splitlines()):
+            try:
+                return json.loads(line)[0]
+            except (ValueError, IndexError):
+                # A partially written line from a crashed worker
+                continue
+        return 0
+
+    @staticmethod
+    def _compact_play(item: Dict) -> List:
+        track = item['track']
+        return [
+            _to_millis(item['played_at']),
+            track.get('id'),
+            track['name'],
+            [artist['name'] for artist in track['artists']],
+            [artist.get('id') for artist in track['artists']],
+            track['album']['name'],
+            track['album'].get('id')
+        ]
+
+    def poll(self, client, user_id: str, force: bool = False) -> int:
+        """
+        Append plays newer than the stored ones, returns the number of new plays
+        """
+        with self._lock_for(user_id):
+            now = time.time()
+            if not self._due(user_id, now, force):
+                return 0
+
+            os.makedirs(self.data_dir, exist_ok=True)
+            with open(self._path(user_id), 'a+b') as file:
+                # Other workers append to the same log, hold the file lock across read and append
+                fcntl.flock(file, fcntl.LOCK_EX)
+                after = self._read_last_played(file)
+                page = client.get_recently_played_page_raw(after=after or None)
+                if page is None:
+                    # Not counted as a poll, the next call retries
+                    logger.error(f"Polling play history for {user_id} failed")
+                    return 0
+                self._last_poll[user_id] = now
+                added = self._append(file, page, after)
+        if added:
+            logger.info(f"Appended {added} plays to history for {user_id}")
+        return added
+
+    async def poll_async(self, client, user_id: str, force: bool = False) -> int:
+        """
+        poll() for an AsyncSpotifyClient. No lock is held while the request is awaited,
+        plays another poll stored in the meantime are skipped when appending.
+        """
+        now = time.time()
+        if not self._due(user_id, now, force):
+            return 0
+
+        after = self._last_played(user_id)
+        page = await client.get_recently_played_page_raw(after=after or None)
+        if page is None:
+            logger.error(f"Polling play history for {user_id} failed")
+            return 0
+
+        with self._lock_for(user_id):
+            self._last_poll[user_id] = now
+            os.makedirs(self.data_dir, exist_ok=True)
+            with open(self._path(user_id), 'a+b') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                added = self._append(file, page, self._read_last_played(file))
+        if added:
+            logger.info(f"Appended {added} plays to history for {user_id}")
+        return added
+
+    def _due(self, user_id: str, now: float, force: bool) -> bool:
+        return force or now - self._last_poll.get(user_id, 0) >= PLAY_HISTORY_MIN_POLL_SECONDS
+
+    def _last_played(self, user_id: str) -> int:
+        try:
+            with open(self._path(user_id), 'rb') as file:
+                return self._read_last_played(file)
+        except FileNotFoundError:
+            return 0
+
+    def _append(self, file, page: Dict, after: int) -> int:
+        """Append the plays of a page newer than `after` to the locked log, returns how many"""
+        # Local files and unavailable tracks have no ID to store
+        rows = sorted(
+            (self._compact_play(item) for item in page.get('items', [])
+             if item.get('track') and item['track'].get('id')),
+            key=lambda row: row[0]
+        )
+        rows = [row for row in rows if row[0] > after]
+        if rows:
+            file.write(''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in rows).encode())
+        return len(rows)
+
+    def read(self, user_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return stored plays newest first"""
+        plays = self.read_raw(user_id, limit)
+        for play in plays:
+            play['played_at'] = _to_iso(play['played_at'])
+        return plays
+
+    def read_raw(self, user_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return stored plays newest first, played_at in unix milliseconds"""
+        if limit is not None and limit <= 0:
+            return []
+        plays = []
+        try:
+            with open(self._path(user_id), 'rb') as file:
+                for line in self._iter_lines_reversed(file):
+                    try:
+                        plays.append(dict(zip(FIELDS, json.loads(line))))
+                    except ValueError:
+                        # A partially written last line from a crashed worker
+                        continue
+                    if len(plays) == limit:
+                        break
+        except FileNotFoundError:
+            return []
+        return plays
+
+    @staticmethod
+    def _iter_lines_reversed(file, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+        """Yield the lines of an open binary log from the end, reading it backwards a block at a time"""
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        tail = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            lines = (file.read(step) + tail).split(b'\n')
+            # The first piece may continue in the previous block
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if tail:
+            yield tail
+
+
+play_history = PlayHistory()
@@ -0,0 +1,87 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+PLAYLIST_CACHE_SIZE = int(os.getenv('PLAYLIST_CACHE_SIZE', '256'))
+# Upper bound on the number of items held across all cached playlists
+PLAYLIST_CACHE_MAX_ITEMS = int(os.getenv('PLAYLIST_CACHE_MAX_ITEMS', '200000'))
+
+
+class PlaylistItemsCache:
+    """
+    Projected playlist items keyed by playlist ID and validated by snapshot_id.
+    A playlist's snapshot_id changes with every edit, so items stored for a snapshot
+    never go stale and an unchanged playlist is downloaded once for every user who can see it.
+    Only the latest snapshot of each playlist is kept. Items are shared and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = PLAYLIST_CACHE_SIZE, max_items: int = PLAYLIST_CACHE_MAX_ITEMS):
+        self.max_entries = max_entries
+        self.max_items = max_items
+        self._entries: 'OrderedDict[str, Tuple[str, List]]' = OrderedDict()
+        self._items = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stored': 0, 'replaced': 0, 'evicted': 0, 'incomplete': 0}
+
+    def get(self, playlist_id: str, snapshot_id: Optional[str]) -> Optional[List]:
+        with self._lock:
+            entry = self._entries.get(playlist_id)
+            if entry is None or not snapshot_id or entry[0] != snapshot_id:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(playlist_id)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def store(self, playlist_id: str, snapshot_id: Optional[str], items: List, complete: bool = True) -> None:
+        """Store the items of a snapshot, incomplete results (a page failed) are not stored"""
+        if not complete:
+            logger.warning(f"Playlist {playlist_id} snapshot {snapshot_id} was fetched incompletely, not caching")
+            with self._lock:
+                self._stats['incomplete'] += 1
+            return
+        if not snapshot_id or len(items) > self.max_items:
+            return
+        with self._lock:
+            previous = self._entries.pop(playlist_id, None)
+            if previous is not None:
+                self._items -= len(previous[1])
+                self._stats['replaced'] += 1
+            self._entries[playlist_id] = (snapshot_id, items)
+            self._items += len(items)
+            self._stats['stored'] += 1
+            while len(self._entries) > self.max_entries or self._items > self.max_items:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._items -= len(evicted)
+                self._stats['evicted'] += 1
+
+    def load(self, playlist_id: str, snapshot_id: Optional[str], fetch: Callable[[], Tuple[List, bool]]) -> List:
+        """Return the cached items for the snapshot, or fetch (items, complete) and store them"""
+        items = self.get(playlist_id, snapshot_id)
+        if items is None:
+            items, complete = fetch()
+            self.store(playlist_id, snapshot_id, items, complete)
+        return items
+
+    def invalidate(self, playlist_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(playlist_id, None)
+            if entry is not None:
+                self._items -= len(entry[1])
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'playlists': len(self._entries),
+                'items': self._items,
+                'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0
+            }
+
+
+playlist_items_cache = PlaylistItemsCache()
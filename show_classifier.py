@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Keyword -> weight, a show scoring at least AUDIOBOOK_THRESHOLD is treated as an audiobook
+DEFAULT_AUDIOBOOK_KEYWORDS = {
+    'audiobook': 1.0,
+    'narrator': 1.0,
+    'narrated by': 1.0,
+    'read by': 1.0,
+    'author': 1.0,
+}
+AUDIOBOOK_THRESHOLD = float(os.getenv('AUDIOBOOK_THRESHOLD', '1.0'))
+# Extra keywords as "keyword:weight,keyword:weight"
+EXTRA_AUDIOBOOK_KEYWORDS = os.getenv('AUDIOBOOK_KEYWORDS', '')
+SHOW_CLASSIFIER_CACHE_SIZE = int(os.getenv('SHOW_CLASSIFIER_CACHE_SIZE', '10000'))
+
+# Joins descriptions for the batch pass, never part of a keyword
+_SEPARATOR = '\x00'
+
+
+def _parse_keywords(spec: str) -> Dict[str, float]:
+    keywords = {}
+    for entry in spec.split(','):
+        keyword, _, weight = entry.strip().rpartition(':')
+        if not keyword:
+            continue
+        try:
+            keywords[keyword] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring audiobook keyword with invalid weight: {entry}")
+    return keywords
+
+
+class ShowClassifier:
+    """
+    Tells podcasts from audiobooks by weighted keywords in the show description.
+    The keywords are compiled into one regex, new shows are scored in a single pass over
+    their joined descriptions and every score is memoized by show URI.
+    """
+
+    def __init__(self, keywords: Optional[Dict[str, float]] = None, threshold: float = AUDIOBOOK_THRESHOLD,
+                 cache_size: int = SHOW_CLASSIFIER_CACHE_SIZE):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._keywords: Dict[str, float] = {}
+        self._scores: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+        self._pattern = None
+        self.add_keywords(keywords if keywords is not None else DEFAULT_AUDIOBOOK_KEYWORDS)
+
+    def add_keywords(self, keywords: Dict[str, float]) -> None:
+        """Add or reweight keywords, scores memoized so far are dropped"""
+        with self._lock:
+            self._keywords.update({keyword.lower(): weight for keyword, weight in keywords.items()})
+            # Longest first, so "narrated by" wins over a shorter keyword at the same position
+            alternatives = sorted(self._keywords, key=len, reverse=True)
+            self._pattern = re.compile('|'.join(map(re.escape, alternatives)), re.IGNORECASE) if alternatives else None
+            self._scores.clear()
+
+    def score_many(self, descriptions: List[str]) -> List[float]:
+        """Score descriptions in one regex pass, each keyword counts once per description"""
+        if self._pattern is None or not descriptions:
+            return [0.0] * len(descriptions)
+
+        text = _SEPARATOR.join(descriptions)
+        starts = []
+        position = 0
+        for description in descriptions:
+            starts.append(position)
+            position += len(description) + 1
+
+        found: List[set] = [set() for _ in descriptions]
+        for match in self._pattern.finditer(text):
+            found[bisect_right(starts, match.start()) - 1].add(match.group().lower())
+        return [sum(self._keywords[keyword] for keyword in keywords) for keywords in found]
+
+    def classify_many(self, shows: List[Dict]) -> List[bool]:
+        """
+        Return whether each show is an audiobook. Shows are Spotify show objects
+        (or anything with 'uri' and 'description'), already classified URIs cost a dict lookup.
+        """
+        results: List[Optional[bool]] = [None] * len(shows)
+        pending = []
+        with self._lock:
+            for index, show in enumerate(shows):
+                uri = show.get('uri')
+                score = self._scores.get(uri) if uri else None
+                if score is None:
+                    pending.append(index)
+                else:
+                    self._scores.move_to_end(uri)
+                    results[index] = score >= self.threshold
+            self._stats['hits'] += len(shows) - len(pending)
+            self._stats['misses'] += len(pending)
+
+        if not pending:
+            return results
+
+        scores = self.score_many([shows[index].get('description') or '' for index in pending])
+        with self._lock:
+            for index, score in zip(pending, scores):
+                results[index] = score >= self.threshold
+                uri = shows[index].get('uri')
+                if uri:
+                    self._scores[uri] = score
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+        return results
+
+    def is_audiobook(self, show: Dict) -> bool:
+        return self.classify_many([show])[0]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'memoized': len(self._scores), 'keywords': len(self._keywords)}
+
+
+show_classifier = ShowClassifier({**DEFAULT_AUDIOBOOK_KEYWORDS, **_parse_keywords(EXTRA_AUDIOBOOK_KEYWORDS)})
@@ -1,28 +1,166 @@
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import requests
-from typing import Optional, List, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 
+from etag_cache import etag_cache
+from catalog_cache import catalog_cache
+from single_flight import single_flight
+from id_batcher import id_batcher, BATCH_LIMITS
+from spotify_rate_limiter import (
+    rate_limiter, RateLimitScheduler, MAX_RETRIES, MAX_RETRY_AFTER, RETRYABLE_STATUS_CODES
+)
 from logger_config import setup_logger
 logger = setup_logger(__name__)
 
+# Connection pool settings shared by every SpotifyClient in the process
+POOL_CONNECTIONS = int(os.getenv('SPOTIFY_POOL_CONNECTIONS', '4'))
+POOL_MAXSIZE = int(os.getenv('SPOTIFY_POOL_MAXSIZE', '32'))
+CONNECT_TIMEOUT = float(os.getenv('SPOTIFY_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('SPOTIFY_READ_TIMEOUT', '15'))
 
-class SpotifyClient:
-    def __init__(self, access_token: str):
-        # Add debug prints inside __init__ where we know they'll be executed
-        print("=== SPOTIFY LOGGER DEBUG ===")
-        print(f"Logger name: {logger.name}")
-        print(f"Logger level: {logger.level}")
-        print("Handlers:")
-        for h in logger.handlers:
-            print(f"- Handler: {type(h).__name__}")
-            print(f"  Level: {h.level}")
-            print(f"  Formatter: {h.formatter._fmt if h.formatter else 'None'}")
+# Maximum number of pages fetched at once by offset-based pagination
+PAGE_FANOUT = int(os.getenv('SPOTIFY_PAGE_FANOUT', '6'))
+
+# Only the parts of a playlist item the app reads, plus what pagination needs
+PLAYLIST_ITEM_FIELDS = 'total,limit,next,items(added_at,track(uri,name,artists(name),album(name)))'
+PLAYLIST_SUMMARY_FIELDS = 'id,name,snapshot_id,tracks.total'
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Return the process-wide pooled session used for all Spotify API calls.
+    Connections to api.spotify.com are kept alive and reused across requests and users.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE
+                )
+                session.mount('https://', adapter)
+                session.headers.update({'Connection': 'keep-alive'})
+                _http_session = session
+                logger.info(f"Created shared Spotify HTTP session (pool_maxsize={POOL_MAXSIZE})")
+    return _http_session
 
+
+def get_pool_stats() -> Dict[str, int]:
+    """
+    Get connection pool counters for the shared session.
+    A hit is a request served on an already open connection, a miss opened a new one.
+    """
+    adapter = get_http_session().get_adapter('https://api.spotify.com')
+    pools = adapter.poolmanager.pools
+    total_requests = 0
+    total_connections = 0
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        total_requests += pool.num_requests
+        total_connections += pool.num_connections
+
+    return {
+        'pools': len(pools),
+        'requests': total_requests,
+        'pool_hits': max(total_requests - total_connections, 0),
+        'pool_misses': total_connections
+    }
+
+
+class SpotifyClient:
+    def __init__(self, access_token: str, user_id: Optional[str] = None):
         self.access_token = access_token
         self.base_url = 'https://api.spotify.com/v1'
         self.headers = {
             'Authorization': f'Bearer {access_token}'
         }
-        logger.warning("LOGGER WARNING TEST")
+        self.user_id = user_id
+        # Namespace for per-user caches, falls back to a token digest when the user id is unknown
+        self.user_key = user_id or hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+    def set_access_token(self, access_token: str) -> None:
+        """Swap in a refreshed access token, requests already in flight keep the old one"""
+        self.access_token = access_token
+        self.headers = {'Authorization': f'Bearer {access_token}'}
+
+    def _send(self, method: str, url: str, extra_headers: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the rate limit scheduler and the shared pooled session.
+        429s are retried after Retry-After, 5xx on GET requests are retried with backoff.
+        """
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        for attempt in range(MAX_RETRIES + 1):
+            rate_limiter.acquire()
+            response = get_http_session().request(
+                method,
+                url,
+                headers=headers,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                **kwargs
+            )
+
+            if attempt == MAX_RETRIES:
+                break
+
+            if response.status_code == 429:
+                retry_after = RateLimitScheduler.parse_retry_after(response.headers.get('Retry-After'), attempt)
+                if retry_after > MAX_RETRY_AFTER:
+                    # Not waited out, so it must not pause every other caller either
+                    logger.error(f"Retry-After of {retry_after}s for {url} is too long, giving up")
+                    break
+                rate_limiter.note_retry_after(retry_after)
+            elif response.status_code in RETRYABLE_STATUS_CODES and method == 'GET':
+                time.sleep(RateLimitScheduler.backoff_delay(attempt))
+            else:
+                break
+
+            rate_limiter.note_retry()
+            logger.warning(f"Retrying {method} {url} after status {response.status_code} (attempt {attempt + 1})")
+
+        return response
+
+    def _get_json(self, url: str, params: Optional[Dict] = None) -> Tuple[requests.Response, Optional[Dict]]:
+        """
+        Conditional GET: revalidate a cached body with If-None-Match and reuse it on 304.
+        Concurrent identical GETs for the same user share one upstream call.
+        Returns the response and the parsed body, or None as body when the request failed.
+        """
+        key = etag_cache.make_key(self.user_key, url, params)
+        return single_flight.do(key, lambda: self._conditional_get(key, url, params))
+
+    def _conditional_get(self, key: Tuple[str, str], url: str, params: Optional[Dict] = None) -> Tuple[requests.Response, Optional[Dict]]:
+        cached = etag_cache.lookup(key)
+        extra_headers = {'If-None-Match': cached.etag} if cached else None
+
+        response = self._send('GET', url, params=params, extra_headers=extra_headers)
+
+        if response.status_code == 304 and cached:
+            etag_cache.note_not_modified(cached)
+            return response, cached.body
+        if response.status_code != 200:
+            return response, None
+
+        started = time.perf_counter()
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            etag_cache.store(key, etag, data, len(response.content), time.perf_counter() - started)
+        return response, data
 
     def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
             """
@@ -31,16 +169,16 @@ class SpotifyClient:
             url = f'{self.base_url}/{endpoint}'
             logger.debug(f"Making request to {endpoint} with params: {params}")
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response, data = self._get_json(url, params)
             
-            if response.status_code != 200:
+            if data is None:
                 logger.error(f"Error making request to {endpoint}:")
                 logger.error(f"Status Code: {response.status_code}")
                 logger.error(f"Response Text: {response.text}")
                 return None
             
             logger.debug(f"Successful response from {endpoint}")
-            return response.json()
+            return data
     
     def _make_post_request(self, endpoint: str, json: Optional[Dict] = None) -> Optional[Dict]:
         """
@@ -49,7 +187,7 @@ class SpotifyClient:
         url = f'{self.base_url}/{endpoint}'
         logger.debug(f"Making POST request to {endpoint} with json: {json}")
         
-        response = requests.post(url, headers=self.headers, json=json)
+        response = self._send('POST', url, json=json)
         
         if response.status_code not in [200, 201]:
             logger.error(f"Error making POST request to {endpoint}:")
@@ -60,44 +198,158 @@ class SpotifyClient:
         logger.debug(f"Successful response from {endpoint}")
         return response.json()
     
-    def _paginate_request(self, endpoint: str, params: Optional[Dict] = None, limit: Optional[int] = None) -> List[Dict]:
+    def _paginate_request(self, endpoint: str, params: Optional[Dict] = None, limit: Optional[int] = None,
+                          concurrent: bool = False) -> List[Dict]:
         """
-        Handle pagination for Spotify API requests
+        Handle pagination for Spotify API requests.
+        With concurrent=True the remaining pages of an offset-based endpoint are fetched in parallel,
+        cursor-only endpoints (me/following, me/player/recently-played) must use the default mode.
+        """
+        items = list(self._iter_paginated(endpoint, params, limit, concurrent))
+        logger.info(f"Completed paginated request to {endpoint}, collected {len(items)} items")
+        return items
+
+    def _iter_paginated(self, endpoint: str, params: Optional[Dict] = None, limit: Optional[int] = None,
+                        concurrent: bool = False) -> Iterator[Dict]:
+        """
+        Yield items from a paginated endpoint as each page arrives
+        """
+        pages = self._iter_offset_pages(endpoint, params, limit) if concurrent \
+            else self._iter_cursor_pages(endpoint, params, limit)
+
+        count = 0
+        for page_items in pages:
+            for item in page_items:
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield item
+
+    def _iter_cursor_pages(self, endpoint: str, params: Optional[Dict] = None,
+                           limit: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Yield pages one at a time by following the next links
         """
         logger.debug(f"Starting paginated request to {endpoint} with limit {limit}")
-        items = []
         url = f'{self.base_url}/{endpoint}'
-        
-        while url and (limit is None or len(items) < limit):
+        count = 0
+
+        while url and (limit is None or count < limit):
             logger.debug(f"Fetching page from {url}")
-            response = requests.get(url, headers=self.headers, params=params)
+            response, data = self._get_json(url, params)
             
-            if response.status_code != 200:
+            if data is None:
                 logger.error(f"Error in pagination for {endpoint}:")
                 logger.error(f"Status Code: {response.status_code}")
-                return items
+                return
                 
-            data = response.json()
-            
-            # Handle different response structures
-            if 'items' in data:
-                items.extend(data['items'])
-            elif endpoint.startswith('me/following') and 'artists' in data:
-                items.extend(data['artists']['items'])
-            
-            # Update URL for next page
-            url = data.get('next') if 'next' in data else data.get('artists', {}).get('next')
+            page_items, url = self._parse_page(endpoint, data)
             params = None  # Clear params for subsequent requests
-            
-            logger.debug(f"Collected {len(items)} items so far")
-            
-            if limit and len(items) >= limit:
-                items = items[:limit]
-                break
-        
-        logger.info(f"Completed paginated request to {endpoint}, collected {len(items)} items")
-        return items
-    
+            count += len(page_items)
+            logger.debug(f"Collected {count} items so far")
+            yield page_items
+
+    def _iter_offset_pages(self, endpoint: str, params: Optional[Dict] = None,
+                           limit: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Fetch the first page, then every remaining offset concurrently using the reported total.
+        Pages are yielded in offset order with at most PAGE_FANOUT requests in flight.
+        """
+        params = dict(params or {})
+        logger.debug(f"Starting concurrent paginated request to {endpoint} with limit {limit}")
+
+        first_page = self._make_request(endpoint, params)
+        if not first_page:
+            logger.error(f"Error in pagination for {endpoint}: first page failed")
+            return
+
+        first_items, next_url = self._parse_page(endpoint, first_page)
+        yield first_items
+
+        total = first_page.get('total')
+        page_size = params.get('limit') or first_page.get('limit') or len(first_items)
+        if not next_url or total is None or not page_size:
+            return
+
+        start = params.get('offset', 0)
+        end = total if limit is None else min(total, start + limit)
+        offsets = iter(range(start + page_size, end, page_size))
+
+        def fetch_page(offset: int) -> Optional[List[Dict]]:
+            page = self._make_request(endpoint, {**params, 'offset': offset})
+            return self._parse_page(endpoint, page)[0] if page else None
+
+        executor = ThreadPoolExecutor(max_workers=PAGE_FANOUT, thread_name_prefix='spotify-page')
+        try:
+            in_flight = deque()
+            # Each page runs in a copy of the caller's context so its request priority carries over
+            for offset in islice(offsets, PAGE_FANOUT):
+                in_flight.append((offset, executor.submit(contextvars.copy_context().run, fetch_page, offset)))
+
+            while in_flight:
+                offset, future = in_flight.popleft()
+                page_items = future.result()
+                if page_items is None:
+                    logger.error(f"Error in pagination for {endpoint} at offset {offset}")
+                    return
+                # Keep the window full before handing the page to the consumer
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    in_flight.append((next_offset, executor.submit(contextvars.copy_context().run, fetch_page, next_offset)))
+                yield page_items
+        finally:
+            # Consumers may stop early, drop whatever has not started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _parse_page(endpoint: str, data: Dict) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Extract the items and the next page URL from a paginated response
+        """
+        items = []
+        # Handle different response structures
+        if 'items' in data:
+            items = data['items']
+        elif endpoint.startswith('me/following') and 'artists' in data:
+            items = data['artists']['items']
+
+        next_url = data.get('next') if 'next' in data else data.get('artists', {}).get('next')
+        return items, next_url
+
+    @staticmethod
+    def _build_search_params(query: str, search_type: str, filters: Optional[Dict] = None) -> Dict:
+        """
+        Build the query parameters for a search request
+        """
+        query_parts = [query]
+        if filters:
+            query_parts.extend(
+                f'{key}:"{value}"' if isinstance(value, str) else f'{key}:{value}'
+                for key, value in filters.items()
+                if value
+            )
+
+        return {
+            'q': ' '.join(query_parts),
+            'type': search_type,
+            'limit': 10
+        }
+
+    @staticmethod
+    def _build_playlist_payload(name: str, public: bool = True,
+                                collaborative: bool = False, description: str = None) -> Dict:
+        """
+        Build the payload for a create playlist request
+        """
+        payload = {
+            'name': name,
+            'public': public,
+            'collaborative': collaborative
+        }
+        if description:
+            payload['description'] = description
+        return payload
+
     def get_user_profile_raw(self) -> Dict:
             """Get raw API response for user's profile"""
             logger.info("Getting user profile")
@@ -109,6 +361,13 @@ class SpotifyClient:
                 logger.error(f"Failed to get user profile: {str(e)}")
                 return {}
 
+    def get_user_id(self) -> Optional[str]:
+        """Get the Spotify user ID, looking it up once if it was not given"""
+        if not self.user_id:
+            profile = self.get_user_profile_raw()
+            self.user_id = profile.get('id') if profile else None
+        return self.user_id
+
     def get_top_items_raw(self, time_range: str, item_type: str) -> Optional[Dict]:
         """Get raw API response for user's top artists or tracks"""
         logger.info(f"Getting top {item_type} for time range {time_range}")
@@ -121,46 +380,66 @@ class SpotifyClient:
         logger.info(f"Retrieved {len(artists)} followed artists")
         return artists
 
+    def iter_followed_artists(self) -> Iterator[Dict]:
+        """Yield the user's followed artists as each page arrives"""
+        return self._iter_paginated('me/following', {'type': 'artist', 'limit': 50})
+
     def get_user_playlists_raw(self, limit: int = 100) -> List[Dict]:
         """Get raw API response for user's playlists"""
         logger.info(f"Getting user's playlists (limit: {limit})")
-        playlists = self._paginate_request('me/playlists', {'limit': 50}, limit)
+        playlists = self._paginate_request('me/playlists', {'limit': 50}, limit, concurrent=True)
         logger.info(f"Retrieved {len(playlists)} playlists")
         return playlists
 
+    def iter_user_playlists(self, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Yield the user's playlists as each page arrives"""
+        return self._iter_paginated('me/playlists', {'limit': 50}, limit, concurrent=True)
+
     def get_saved_podcasts_raw(self) -> List[Dict]:
         """Get raw API response for user's saved shows"""
         logger.info("Getting user's saved podcasts")
-        podcasts = self._paginate_request('me/shows', {'limit': 50})
+        podcasts = self._paginate_request('me/shows', {'limit': 50}, concurrent=True)
         logger.info(f"Retrieved {len(podcasts)} saved podcasts")
         return podcasts
 
-    def get_recently_played_tracks_raw(self) -> List[Dict]:
-        """Get raw API response for user's recently played tracks"""
+    def iter_saved_podcasts(self) -> Iterator[Dict]:
+        """Yield the user's saved shows as each page arrives"""
+        return self._iter_paginated('me/shows', {'limit': 50}, concurrent=True)
+
+    def get_recently_played_tracks_raw(self, after: Optional[int] = None) -> List[Dict]:
+        """
+        Get raw API response for user's recently played tracks,
+        only plays after the unix timestamp in milliseconds `after` if given
+        """
         logger.info("Getting user's recently played tracks")
-        tracks = self._paginate_request('me/player/recently-played', {'limit': 50})
+        params = {'limit': 50}
+        if after:
+            params['after'] = after
+        tracks = self._paginate_request('me/player/recently-played', params)
         logger.info(f"Retrieved {len(tracks)} recently played tracks")
         return tracks
 
+    def get_recently_played_page_raw(self, after: Optional[int] = None) -> Optional[Dict]:
+        """
+        Get one page of up to 50 plays (all Spotify keeps), only those after `after` if given.
+        None when the request failed.
+        """
+        params = {'limit': 50}
+        if after:
+            params['after'] = after
+        return self._make_request('me/player/recently-played', params)
+
+    def iter_recently_played_tracks(self) -> Iterator[Dict]:
+        """Yield the user's recently played tracks as each page arrives"""
+        return self._iter_paginated('me/player/recently-played', {'limit': 50})
+
     def search_item_raw(self, query: str, search_type: str, filters: Optional[Dict] = None) -> Optional[Dict]:
         """Get raw API response for search query"""
         logger.info(f"Searching for {search_type} with query: {query}")
         if filters:
             logger.debug(f"Applied filters: {filters}")
         
-        query_parts = [query]
-        if filters:
-            query_parts.extend(
-                f'{key}:"{value}"' if isinstance(value, str) else f'{key}:{value}'
-                for key, value in filters.items()
-                if value
-            )
-        
-        params = {
-            'q': ' '.join(query_parts),
-            'type': search_type,
-            'limit': 10
-        }
+        params = self._build_search_params(query, search_type, filters)
         
         result = self._make_request('search', params)
         if result:
@@ -170,14 +449,7 @@ class SpotifyClient:
     def create_playlist_raw(self, name: str, public: bool = True, 
                         collaborative: bool = False, description: str = None) -> Optional[Dict]:
         """Create a new playlist for the authenticated user"""
-        payload = {
-            'name': name,
-            'public': public,
-            'collaborative': collaborative
-        }
-        if description:
-            payload['description'] = description
-
+        payload = self._build_playlist_payload(name, public, collaborative, description)
         return self._make_post_request('me/playlists', json=payload)
 
     def add_songs_to_playlist_raw(self, playlist_id: str, uris: List[str], position: Optional[int] = None) -> Optional[Dict]:
@@ -201,7 +473,7 @@ class SpotifyClient:
             payload['snapshot_id'] = snapshot_id
 
         logger.info(f"Removing {len(uris)} items from playlist {playlist_id}")
-        response = requests.delete(f'{self.base_url}/{url}', headers=self.headers, json=payload)
+        response = self._send('DELETE', f'{self.base_url}/{url}', json=payload)
 
         if response.status_code != 200:
             logger.error(f"Failed to remove items from playlist {playlist_id}. Status: {response.status_code}, Response: {response.text}")
@@ -209,6 +481,20 @@ class SpotifyClient:
 
         return response.json()
     
+    def get_playlist_summary_raw(self, playlist_id: str) -> Optional[Dict]:
+        """Get a playlist's name, snapshot_id and item count without any of its items"""
+        return self._make_request(f'playlists/{playlist_id}', {'fields': PLAYLIST_SUMMARY_FIELDS})
+
+    def get_playlist_items_raw(self, playlist_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Get the items of a playlist, trimmed to PLAYLIST_ITEM_FIELDS, fetching pages concurrently.
+        """
+        logger.info(f"Getting items of playlist {playlist_id} (limit: {limit})")
+        params = {'limit': 100, 'fields': PLAYLIST_ITEM_FIELDS, 'additional_types': 'track,episode'}
+        items = self._paginate_request(f'playlists/{playlist_id}/tracks', params, limit, concurrent=True)
+        logger.info(f"Retrieved {len(items)} items of playlist {playlist_id}")
+        return items
+
     def update_playlist_details_raw(self, playlist_id: str, payload: Dict) -> Optional[Dict]:
         """
         Update playlist details with raw Spotify API call.
@@ -221,7 +507,7 @@ class SpotifyClient:
             Optional[Dict]: API response.
         """
         url = f'{self.base_url}/playlists/{playlist_id}'
-        response = requests.put(url, headers=self.headers, json=payload)
+        response = self._send('PUT', url, json=payload)
 
         if response.status_code != 200:
             logger.error(f"Failed to update playlist details. Status: {response.status_code}, Response: {response.text}")
@@ -242,5 +528,66 @@ class SpotifyClient:
         """
         params = {'limit': limit, 'offset': offset}
         return self._make_request('me/tracks', params)
-    
 
+    def get_all_saved_tracks_raw(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Get every saved track in the user's library, fetching pages concurrently.
+        """
+        logger.info(f"Getting all of user's saved tracks (limit: {limit})")
+        tracks = self._paginate_request('me/tracks', {'limit': 50}, limit, concurrent=True)
+        logger.info(f"Retrieved {len(tracks)} saved tracks")
+        return tracks
+
+    def iter_saved_tracks(self, limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict]:
+        """
+        Yield the user's saved tracks from `offset` on as each page arrives.
+        """
+        return self._iter_paginated('me/tracks', {'limit': 50, 'offset': offset}, limit, concurrent=True)
+
+    def _fetch_several(self, entity: str, ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Fetch ids from a "several items" endpoint in chunks, running the chunks concurrently
+        """
+        chunk_size = BATCH_LIMITS[entity]
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+        def fetch_chunk(chunk: List[str]) -> Optional[List[Optional[Dict]]]:
+            response = self._make_request(entity, {'ids': ','.join(chunk)})
+            return response.get(entity, []) if response else None
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(PAGE_FANOUT, len(chunks)) or 1,
+                                thread_name_prefix='spotify-batch') as executor:
+            futures = [executor.submit(contextvars.copy_context().run, fetch_chunk, chunk) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                objects = future.result()
+                # Ids of failed requests are left out, unknown ids map to None
+                if objects is not None:
+                    results.update(zip(chunk, objects))
+
+        logger.info(f"Fetched {len(ids)} {entity} in {len(chunks)} requests")
+        return results
+
+    def _get_several_raw(self, entity: str, ids: List[str]) -> List[Optional[Dict]]:
+        """
+        Look up ids in the catalog, then the rest through the shared batcher, duplicates are fetched once.
+        Returns objects in the order of `ids`, None for ids Spotify does not know.
+        """
+        found = catalog_cache.get_many_raw(entity, ids)
+        missing = [id_ for id_ in ids if id_ not in found]
+        if missing:
+            fetched = id_batcher.get_many(entity, missing, lambda batch_ids: self._fetch_several(entity, batch_ids))
+            found.update(catalog_cache.put_many_raw(entity, fetched))
+        return [found.get(id_) for id_ in ids]
+
+    def get_several_tracks_raw(self, ids: List[str]) -> List[Optional[Dict]]:
+        """Get raw track objects for a list of track IDs"""
+        return self._get_several_raw('tracks', ids)
+
+    def get_several_artists_raw(self, ids: List[str]) -> List[Optional[Dict]]:
+        """Get raw artist objects for a list of artist IDs"""
+        return self._get_several_raw('artists', ids)
+
+    def get_several_albums_raw(self, ids: List[str]) -> List[Optional[Dict]]:
+        """Get raw album objects for a list of album IDs"""
+        return self._get_several_raw('albums', ids)
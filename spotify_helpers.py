@@ -1,9 +1,40 @@
-from typing import Dict, List, Optional
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from spotify_client import SpotifyClient
+from play_history import play_history
+from show_classifier import show_classifier
+from taste_analytics import TasteAnalytics, library_summary
+from library_snapshot import LibrarySnapshot, library_snapshots
+from playlist_cache import playlist_items_cache
+from single_flight import single_flight
+from bundle_cache import BUNDLE_HARD_TTL
+from spotify_records import Artist, Audiobook, Playlist, Record, Show, Track
+from spotify_projections import (
+    CREATED_PLAYLIST, FOLLOWED_ARTIST, PLAYLIST, PLAYLIST_ITEM, RECENT_TRACK, SAVED_AUDIOBOOK, SAVED_SHOW,
+    SAVED_TRACK, SEARCH_DEFAULT, SEARCH_PROJECTIONS, SIMPLE_DEFAULT, SIMPLE_PROJECTIONS, STORED_PLAY,
+    TOP_ARTIST, TOP_TRACK, USER_PROFILE
+)
 
 from logger_config import setup_logger
 logger = setup_logger(__name__)
 
+TIME_RANGES = ['short_term', 'medium_term', 'long_term']
+
+# Every slice of the cached bundle must finish within this many seconds
+GATHER_TIMEOUT = float(os.getenv('SPOTIFY_GATHER_TIMEOUT', '8'))
+# Partial bundles are cached briefly so the missing slices are retried soon
+PARTIAL_BUNDLE_TIMEOUT = int(os.getenv('SPOTIFY_PARTIAL_BUNDLE_TIMEOUT', '60'))
+
+_gather_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('SPOTIFY_GATHER_WORKERS', '16')),
+    thread_name_prefix='spotify-gather'
+)
+
 
 class SpotifyHelpers:
     def __init__(self, spotify_client: SpotifyClient):
@@ -11,274 +42,369 @@ class SpotifyHelpers:
 
     def get_user_profile(self) -> Optional[Dict]:
         """Get processed user profile information"""
-        profile = self.client.get_user_profile_raw()
+        return self._process_user_profile(self.client.get_user_profile_raw())
+
+    @staticmethod
+    def _process_user_profile(profile: Optional[Dict]) -> Optional[Dict]:
         if not profile:
             return None
-            
-        return {
-            'id': profile['id'],
-            'display_name': profile.get('display_name'),
-            'uri': profile['uri'],
-            'followers': profile.get('followers', {}).get('total', 0),
-            'images': [
-                {
-                    'url': image['url'],
-                }
-                for image in profile.get('images', [])
-            ] if profile.get('images') else []
-        }
-    def get_top_items(self, time_range: str, item_type: str) -> Optional[List[Dict]]:
+
+        return USER_PROFILE.extract(profile)
+
+    def get_top_items(self, time_range: str, item_type: str) -> Optional[List[Record]]:
         """Get user's top artists or tracks"""
-        response = self.client.get_top_items_raw(time_range, item_type)
+        return self._process_top_items(self.client.get_top_items_raw(time_range, item_type), item_type)
+
+    @staticmethod
+    def _process_top_items(response: Optional[Dict], item_type: str) -> Optional[List[Record]]:
         if not response:
             return None
 
-        return [
-            {
-                'name': item['name'],
-                'uri': item['uri'],
-                'popularity': item.get('popularity'),
-                **(
-                    {'genres': item['genres']} if item_type == 'artists' 
-                    else {
-                        'artists': [artist['name'] for artist in item['artists']],
-                        'album': item['album']['name']
-                    } if item_type == 'tracks'
-                    else {}
-                )
-            }
-            for item in response['items']
-        ]
-    def get_followed_artists(self) -> Optional[List[Dict]]:
+        projection = TOP_ARTIST if item_type == 'artists' else TOP_TRACK
+        return projection.extract_many(response.get('items'))
+
+    def get_taste_analytics(self, spotify_data: Optional[Dict] = None, top_n: int = 10) -> Dict:
+        """
+        Top genres, artist rank changes and genre diversity across time ranges,
+        read from the cached data bundle when one is given
+        """
+        analytics = (spotify_data or {}).get('taste_analytics')
+        if analytics is None:
+            analytics = TasteAnalytics.from_top_artists({
+                time_range: self.get_top_items(time_range, 'artists') for time_range in TIME_RANGES
+            })
+        result = analytics.to_dict(top_n)
+
+        # Library statistics come from the snapshot when one was already built, never forcing a sync here
+        user_id = self.client.get_user_id()
+        snapshot = library_snapshots.open(user_id) if user_id else None
+        if snapshot is not None:
+            result['library'] = {**library_summary(snapshot, top_n), 'partial': snapshot.partial}
+        return result
+
+    def get_followed_artists(self) -> Optional[List[Artist]]:
         """Get processed user's followed artists"""
-        artists = self.client.get_followed_artists_raw()
-        return [{'name': artist['name']} for artist in artists]
+        return self._process_followed_artists(self.client.get_followed_artists_raw())
+
+    def iter_followed_artists(self) -> Iterator[Artist]:
+        """Lazily yield processed followed artists as pages arrive"""
+        for artist in self.client.iter_followed_artists():
+            yield self._project_followed_artist(artist)
+
+    @staticmethod
+    def _project_followed_artist(artist: Dict) -> Artist:
+        return FOLLOWED_ARTIST.extract(artist)
+
+    @staticmethod
+    def _process_followed_artists(artists: List[Dict]) -> List[Artist]:
+        return FOLLOWED_ARTIST.extract_many(artists)
     
-    def get_saved_tracks(self) -> Optional[List[Dict]]:
-        """Get processed user's saved tracks."""
-        tracks_raw = self.client.get_saved_tracks_raw()
+    def get_saved_tracks(self, limit: int = 50, offset: int = 0, query: Optional[str] = None) -> Optional[Dict]:
+        """
+        Get processed user's saved tracks from the synced library.
+
+        Args:
+            limit (int): Maximum number of tracks to return.
+            offset (int): Index of the first track to return, newest first.
+            query (Optional[str]): Only return tracks whose name, artist or album contains this text.
+
+        Returns:
+            Dict: The number of matching tracks, the offset, the requested tracks and whether
+            the library is still being loaded (partial).
+        """
+        snapshot = self.get_library_snapshot()
+        if snapshot is None:
+            # Without a snapshot page through the live library, matching tracks as they arrive
+            if query:
+                matching = self._matching_saved_tracks(self.iter_saved_tracks(), query)
+                tracks = islice(matching, offset, offset + limit)
+            else:
+                tracks = self.iter_saved_tracks(limit, offset)
+            return self._page_saved_tracks(list(tracks), None, offset, False)
+        rows = snapshot.saved_track_rows(query)
+        tracks = [snapshot.saved_track(int(row)) for row in rows[offset:offset + limit]]
+        return self._page_saved_tracks(tracks, len(rows), offset, snapshot.partial)
+
+    @staticmethod
+    def _page_saved_tracks(tracks: List[Track], total: Optional[int], offset: int, partial: bool) -> Dict:
+        return {'total': total, 'offset': offset, 'partial': partial, 'tracks': tracks}
+
+    def get_library_snapshot(self) -> Optional[LibrarySnapshot]:
+        """
+        The user's columnar library snapshot (saved tracks, plays, playlists), refreshed when stale
+        """
+        user_id = self.client.get_user_id()
+        if not user_id:
+            return None
+        return library_snapshots.refresh(self.client, user_id)
+
+    def iter_saved_tracks(self, limit: Optional[int] = None, offset: int = 0) -> Iterator[Track]:
+        """Lazily yield processed saved tracks across the whole library as pages arrive"""
+        for item in self.client.iter_saved_tracks(limit, offset):
+            if 'track' in item and item['track']:
+                yield self._project_saved_track(item)
+
+    @staticmethod
+    def _matching_saved_tracks(tracks: Iterator[Track], query: str) -> Iterator[Track]:
+        """Tracks whose name, album or one of the artists contains query, ignoring case like the snapshot"""
+        needle = query.lower()
+        for track in tracks:
+            fields = [track.get('name'), track.get('album'), *(track.get('artists') or ())]
+            if any(needle in field.lower() for field in fields if field):
+                yield track
+
+    @staticmethod
+    def _project_saved_track(item: Dict) -> Track:
+        return SAVED_TRACK.extract(item)
+
+    @staticmethod
+    def _process_saved_tracks(tracks_raw: Optional[Dict]) -> List[Track]:
         if not tracks_raw or 'items' not in tracks_raw:
             return []
 
-        return [
-            {
-                'name': item['track']['name'],
-                'artists': [artist['name'] for artist in item['track']['artists']],
-                'album': item['track']['album']['name'],
-                'uri': item['track']['uri'],
-            }
-            for item in tracks_raw['items'] if 'track' in item and item['track']
-        ]
-
-    def get_user_playlists(self, limit: int = 100) -> Optional[List[Dict]]:
+        return SAVED_TRACK.extract_many([item for item in tracks_raw['items'] if item and item.get('track')])
+
+    def get_user_playlists(self, limit: int = 100) -> Optional[List[Playlist]]:
         """Get processed user's playlists"""
-        playlists = self.client.get_user_playlists_raw(limit)
-        return [{
-            'id': playlist['id'],
-            'name': playlist['name'],
-            'uri': playlist['uri']
-        } for playlist in playlists if playlist is not None]
-
-    def get_saved_podcasts(self) -> Optional[List[Dict]]:
+        return self._process_user_playlists(self.client.get_user_playlists_raw(limit))
+
+    def iter_user_playlists(self, limit: Optional[int] = None) -> Iterator[Playlist]:
+        """Lazily yield processed playlists as pages arrive"""
+        for playlist in self.client.iter_user_playlists(limit):
+            if playlist is not None:
+                yield self._project_playlist(playlist)
+
+    @staticmethod
+    def _project_playlist(playlist: Dict) -> Playlist:
+        return PLAYLIST.extract(playlist)
+
+    @staticmethod
+    def _process_user_playlists(playlists: List[Dict]) -> List[Playlist]:
+        return PLAYLIST.extract_many(playlists)
+
+    def get_playlist_items(self, playlist_id: str, limit: int = 100, offset: int = 0) -> Optional[Dict]:
+        """
+        Get the tracks and episodes of a playlist.
+
+        Args:
+            playlist_id (str): Spotify playlist ID.
+            limit (int): Maximum number of items to return.
+            offset (int): Index of the first item to return, in playlist order.
+
+        Returns:
+            Optional[Dict]: The playlist's name, snapshot_id, total and the requested items.
+        """
+        summary = self.client.get_playlist_summary_raw(playlist_id)
+        if not summary:
+            return None
+
+        snapshot_id = summary.get('snapshot_id')
+        total = (summary.get('tracks') or {}).get('total')
+        # Concurrent misses on the same snapshot share one download
+        items = single_flight.do(('playlist_items', playlist_id, snapshot_id), lambda: playlist_items_cache.load(
+            playlist_id, snapshot_id,
+            lambda: self._process_playlist_items(self.client.get_playlist_items_raw(playlist_id), total)
+        ))
+        return self._page_playlist_items(summary, items, limit, offset)
+
+    @staticmethod
+    def _process_playlist_items(items: List[Dict], total: Optional[int]) -> Tuple[List[Track], bool]:
+        """Project the items, reporting whether every item of the playlist arrived"""
+        complete = total is None or len(items) >= total
+        # Unavailable items come back without a track
+        return PLAYLIST_ITEM.extract_many([item for item in items if item and item.get('track')]), complete
+
+    @staticmethod
+    def _page_playlist_items(summary: Dict, items: List[Track], limit: int, offset: int) -> Dict:
+        """
+        total counts every item of the playlist, available the ones with a playable track,
+        which offset and items index into
+        """
+        return {
+            'playlist_id': summary.get('id'),
+            'name': summary.get('name'),
+            'snapshot_id': summary.get('snapshot_id'),
+            'total': (summary.get('tracks') or {}).get('total', len(items)),
+            'available': len(items),
+            'offset': offset,
+            'items': items[offset:offset + limit]
+        }
+
+    def get_saved_podcasts(self) -> Optional[List[Show]]:
         """Get processed user's saved shows, filtering for podcasts only"""
-        shows = self.client.get_saved_podcasts_raw()
-        processed_shows = []
-        
-        for show in shows:
-            show_data = {
-                'name': show['show'].get('name', 'Unknown Show'),
-                'description': show['show'].get('description', ''),
-                'publisher': show['show'].get('publisher', ''),
-                'uri':show['show'].get('uri', '')
-            }
-            
-            # Check if it's not an audiobook
-            description = show_data['description'].lower()
-            audiobook_keywords = ["audiobook", "narrator", "narrated by", "read by", "author"]
-            is_audiobook = any(keyword in description for keyword in audiobook_keywords)
-            
-            if not is_audiobook:
-                processed_shows.append(show_data)
-        
-        return processed_shows
-    
-    def get_saved_audiobooks(self) -> Optional[List[Dict]]:
+        return self._process_saved_podcasts(self.client.get_saved_podcasts_raw())
+
+    def iter_saved_podcasts(self) -> Iterator[Show]:
+        """Lazily yield processed saved podcasts as pages arrive, skipping audiobooks"""
+        for show in self.client.iter_saved_podcasts():
+            show_data = self._project_podcast(show)
+            if show_data is not None:
+                yield show_data
+
+    @staticmethod
+    def _project_podcast(show: Dict) -> Optional[Show]:
+        if show_classifier.is_audiobook(show.get('show') or {}):
+            return None
+        return SAVED_SHOW.extract(show)
+
+    @staticmethod
+    def _process_saved_podcasts(shows: List[Dict]) -> List[Show]:
+        shows = [show for show in shows if show]
+        # Classify the whole batch at once, shows seen before are memoized by URI
+        is_audiobook = show_classifier.classify_many([show.get('show') or {} for show in shows])
+        return [SAVED_SHOW.extract(show) for show, audiobook in zip(shows, is_audiobook) if not audiobook]
+
+    def get_saved_audiobooks(self) -> Optional[List[Audiobook]]:
         """
         Get user's saved audiobooks.
         """
-        audiobooks_raw = self.client.get_saved_audiobooks_raw()
+        return self._process_saved_audiobooks(self.client.get_saved_audiobooks_raw())
 
+    @staticmethod
+    def _process_saved_audiobooks(audiobooks_raw: Optional[Dict]) -> List[Audiobook]:
         if not audiobooks_raw or 'items' not in audiobooks_raw:
             return []
 
-        return [
-            {
-                'id': item.get('id'),
-                'name': item.get('name'),
-                'authors': [author['name'] for author in item.get('authors', [])],
-                'publisher': item.get('publisher'),
-                'uri': item.get('uri'),
-            }
-            for item in audiobooks_raw['items'] if item
-        ]
-
-    def get_recently_played_tracks(self) -> Optional[List[Dict]]:
-        """Get processed user's recently played tracks"""
-        tracks = self.client.get_recently_played_tracks_raw()
-        return [{
-            'name': track['track']['name'],
-            'uri': track['track']['uri'],
-            'artists': [
-                {
-                    'name': artist['name'], 
-                    'id': artist['id'],
-                    'uri': artist['uri']
-                } 
-                for artist in track['track']['artists']
-            ],
-            'album': {
-                'name': track['track']['album']['name'],
-                'id': track['track']['album']['id'],
-                'uri': track['track']['album']['uri']
-            }
-        } for track in tracks]
-    def search_item(self, query: str, search_type: str, filters: Optional[Dict] = None) -> Optional[List[Dict]]:
+        return SAVED_AUDIOBOOK.extract_many(audiobooks_raw['items'])
+
+    def get_recently_played_tracks(self, include_genres: bool = False, limit: int = 50) -> Optional[List[Track]]:
+        """
+        Get processed user's recently played tracks from the stored play history, newest first,
+        optionally with each artist's genres
+        """
+        user_id = self.client.get_user_id()
+        if user_id:
+            play_history.poll(self.client, user_id)
+            tracks = [self._project_stored_play(play) for play in play_history.read(user_id, limit)]
+        else:
+            tracks = self._process_recently_played_tracks(self.client.get_recently_played_tracks_raw())[:limit]
+
+        if include_genres:
+            self._add_artist_genres([artist for track in tracks for artist in track['artists']])
+        return tracks
+
+    def get_artist_genres(self, artist_ids: List[str]) -> Dict[str, List[str]]:
+        """Get genres for many artists using batched lookups"""
+        artists = self.client.get_several_artists_raw(artist_ids)
+        return {
+            artist['id']: artist.get('genres', [])
+            for artist in artists if artist
+        }
+
+    def _add_artist_genres(self, artists: List[Artist]) -> None:
+        genres = self.get_artist_genres([artist['id'] for artist in artists if artist.get('id')])
+        for artist in artists:
+            artist['genres'] = genres.get(artist.get('id'), [])
+
+    def iter_recently_played_tracks(self) -> Iterator[Track]:
+        """Lazily yield processed recently played tracks as pages arrive"""
+        for track in self.client.iter_recently_played_tracks():
+            yield self._project_recent_track(track)
+
+    @staticmethod
+    def _project_stored_play(play: Dict) -> Track:
+        return STORED_PLAY.extract(play)
+
+    @staticmethod
+    def _process_recently_played_tracks(tracks: List[Dict]) -> List[Track]:
+        return RECENT_TRACK.extract_many(tracks)
+
+    @staticmethod
+    def _project_recent_track(track: Dict) -> Track:
+        return RECENT_TRACK.extract(track)
+
+    def search_item(self, query: str, search_type: str, filters: Optional[Dict] = None) -> Optional[List[Record]]:
         """
         Search for items on Spotify and return detailed information for all results based on type
         """
-        result = self.client.search_item_raw(query, search_type, filters)
+        return self._process_search_results(self.client.search_item_raw(query, search_type, filters), search_type)
+
+    @staticmethod
+    def _process_search_results(result: Optional[Dict], search_type: str) -> Optional[List[Record]]:
         if not result:
             return None
         
         type_key = f"{search_type}s"
-        items = result.get(type_key, {}).get('items', [])
+        items = (result.get(type_key) or {}).get('items')
         if not items:
             return None
 
-        processed_items = []
-        
-        for item in items:
-            if not item:  # Skip if item is None or empty
-                continue
-                
-            processed_item = None
-            
-            if search_type == 'track':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'artists': [{'name': artist['name']} for artist in item['artists']],
-                    'album': item['album']['name'],
-                    'duration_ms': item.get('duration_ms'),
-                    'popularity': item.get('popularity'),
-                    'preview_url': item.get('preview_url'),
-                    'explicit': item.get('explicit', False),
-                    'uri': item['uri']
-                }
-            
-            elif search_type == 'artist':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'genres': item.get('genres', []),
-                    'followers': item.get('followers', {}).get('total'),
-                    'popularity': item.get('popularity'),
-                    'uri': item['uri']
-                }
-            
-            elif search_type == 'album':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'artists': [{'name': artist['name']} for artist in item['artists']],
-                    'release_date': item.get('release_date'),
-                    'total_tracks': item.get('total_tracks'),
-                    'uri': item['uri']
-                }
-            
-            elif search_type == 'playlist':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'owner': item['owner'].get('display_name'),
-                    'total_tracks': item['tracks']['total'],
-                    'description': item.get('description'),
-                    'uri': item['uri']
-                }
-            
-            elif search_type == 'show':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'publisher': item.get('publisher'),
-                    'description': item.get('description'),
-                    'total_episodes': item.get('total_episodes'),
-                    'uri': item['uri']
-                }
-            
-            elif search_type == 'episode':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'show_name': item.get('show', {}).get('name'),
-                    'description': item.get('description'),
-                    'duration_ms': item.get('duration_ms'),
-                    'release_date': item.get('release_date'),
-                    'uri': item['uri']
-                }
-            
-            elif search_type == 'audiobook':
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'authors': [author.get('name') for author in item.get('authors', [])],
-                    'narrators': [narrator.get('name') for narrator in item.get('narrators', [])],
-                    'description': item.get('description'),
-                    'duration_ms': item.get('duration_ms'),
-                    'uri': item['uri']
-                }
-            
-            else:
-                # Fallback for unknown types
-                processed_item = {
-                    'id': item['id'],
-                    'name': item['name'],
-                    'uri': item['uri']
-                }
-
-            processed_items.append(processed_item)
-
-        return processed_items
-
-    def gather_spotify_data(self, cache) -> Dict[str, Dict]:
-        """Gather all relevant Spotify data"""
-        time_ranges = ['short_term', 'medium_term', 'long_term']
-        spotify_data = {
-            'top_artists': {
-                range_: self.get_top_items(range_, 'artists')
-                for range_ in time_ranges
-            },
-            'top_tracks': {
-                range_: self.get_top_items(range_, 'tracks')
-                for range_ in time_ranges
-            }
-        }
-        
-        cache.set('spotify_data', spotify_data)
+        projection = SEARCH_PROJECTIONS.get(search_type, SEARCH_DEFAULT)
+        return [projection.extract(item) for item in items if item]
+
+    def _bundle_slices(self) -> Dict[Tuple[str, str], Callable]:
+        """
+        The parts of the cached data bundle, keyed by (section, key).
+        New parts of the bundle only need to be added here.
+        """
+        slices = {}
+        for item_type in ('artists', 'tracks'):
+            for range_ in TIME_RANGES:
+                slices[(f'top_{item_type}', range_)] = (
+                    lambda range_=range_, item_type=item_type: self.get_top_items(range_, item_type)
+                )
+        return slices
+
+    @staticmethod
+    def _assemble_bundle(results: Dict[Tuple[str, str], Optional[object]], errors: Dict[str, str], cache) -> Dict[str, Dict]:
+        spotify_data = {}
+        for (section, key), result in results.items():
+            spotify_data.setdefault(section, {})[key] = result
+        spotify_data['taste_analytics'] = TasteAnalytics.from_top_artists(spotify_data.get('top_artists', {}))
+        spotify_data['fetched_at'] = time.time()
+
+        if errors:
+            spotify_data['errors'] = errors
+            logger.warning(f"Spotify data gathered without {', '.join(errors)}")
+            cache.set('spotify_data', spotify_data, timeout=PARTIAL_BUNDLE_TIMEOUT)
+        else:
+            cache.set('spotify_data', spotify_data, timeout=BUNDLE_HARD_TTL)
         return spotify_data
+
+    def gather_spotify_data(self, cache, timeout: float = GATHER_TIMEOUT) -> Dict[str, Dict]:
+        """
+        Gather all relevant Spotify data, running every slice concurrently.
+        Slices that fail or take longer than `timeout` are left as None and named under 'errors'.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        futures = {
+            name: _gather_executor.submit(contextvars.copy_context().run, fetch)
+            for name, fetch in self._bundle_slices().items()
+        }
+
+        results = {}
+        errors = {}
+        for (section, key), future in futures.items():
+            slice_name = f'{section}.{key}'
+            try:
+                results[(section, key)] = future.result(timeout=max(deadline - time.monotonic(), 0))
+                if results[(section, key)] is None:
+                    errors[slice_name] = 'request failed'
+            except FutureTimeoutError:
+                results[(section, key)] = None
+                errors[slice_name] = f'timed out after {timeout}s'
+            except Exception as e:
+                logger.error(f"Failed to gather {slice_name}: {str(e)}")
+                results[(section, key)] = None
+                errors[slice_name] = str(e)
+
+        logger.info(f"Gathered {len(futures)} Spotify data slices in {time.monotonic() - started:.2f}s")
+        return self._assemble_bundle(results, errors, cache)
     
     def create_playlist(self, name: str, public: bool = True, 
                    collaborative: bool = False, description: str = None) -> Optional[Dict]:
         """Create a new playlist for the authenticated user"""
-        playlist = self.client.create_playlist_raw(name, public, collaborative, description)
+        return self._process_created_playlist(
+            self.client.create_playlist_raw(name, public, collaborative, description)
+        )
+
+    @staticmethod
+    def _process_created_playlist(playlist: Optional[Dict]) -> Optional[Dict]:
         if not playlist:
             return None
             
-        return {
-            'id': playlist['id'],
-            'name': playlist['name'],
-            'uri': playlist['uri']
-        }
+        return CREATED_PLAYLIST.extract(playlist)
 
     def add_songs_to_playlist(self, playlist_id: str, uris: List[str], position: Optional[int] = None) -> Optional[Dict]:
         """
@@ -292,11 +418,19 @@ class SpotifyHelpers:
         Returns:
             Optional[Dict]: Response containing snapshot_id if successful, None if failed
         """
+        uris = self._cap_uris(uris, 'add')
+        result = self.client.add_songs_to_playlist_raw(playlist_id, uris, position)
+        return self._process_added_items(result, uris)
+
+    @staticmethod
+    def _cap_uris(uris: List[str], action: str) -> List[str]:
         if len(uris) > 100:
-            logger.warning(f"Cannot add more than 100 items at once. Truncating to first 100 items.")
+            logger.warning(f"Cannot {action} more than 100 items at once. Truncating to first 100 items.")
             uris = uris[:100]
-            
-        result = self.client.add_songs_to_playlist_raw(playlist_id, uris, position)
+        return uris
+
+    @staticmethod
+    def _process_added_items(result: Optional[Dict], uris: List[str]) -> Optional[Dict]:
         if not result:
             return None
             
@@ -318,11 +452,12 @@ class SpotifyHelpers:
         Returns:
             Optional[Dict]: API response containing the snapshot_id of the playlist.
         """
-        if len(uris) > 100:
-            logger.warning(f"Cannot remove more than 100 items at once. Truncating to first 100 items.")
-            uris = uris[:100]
-
+        uris = self._cap_uris(uris, 'remove')
         result = self.client.remove_playlist_items_raw(playlist_id, uris, snapshot_id)
+        return self._process_removed_items(result, uris)
+
+    @staticmethod
+    def _process_removed_items(result: Optional[Dict], uris: List[str]) -> Optional[Dict]:
         if not result:
             return None
 
@@ -348,6 +483,14 @@ class SpotifyHelpers:
         Returns:
             Optional[Dict]: API response or None if failed.
         """
+        payload = self._build_playlist_details_payload(name, public, collaborative, description)
+        result = self.client.update_playlist_details_raw(playlist_id, payload)
+        return self._process_updated_playlist(result, playlist_id)
+
+    @staticmethod
+    def _build_playlist_details_payload(name: Optional[str] = None, public: Optional[bool] = None,
+                                        collaborative: Optional[bool] = None,
+                                        description: Optional[str] = None) -> Dict:
         payload = {}
         if name is not None:
             payload['name'] = name
@@ -357,8 +500,10 @@ class SpotifyHelpers:
             payload['collaborative'] = collaborative
         if description is not None:
             payload['description'] = description
+        return payload
 
-        result = self.client.update_playlist_details_raw(playlist_id, payload)
+    @staticmethod
+    def _process_updated_playlist(result: Optional[Dict], playlist_id: str) -> Optional[Dict]:
         if not result:
             return None
 
@@ -371,15 +516,165 @@ class SpotifyHelpers:
     @staticmethod
     def _simplify_item(item: Dict, item_type: str) -> Dict:
         """Simplify item data structure"""
-        simplified = {
-            'name': item['name'],
-            'popularity': item.get('popularity')
+        return SIMPLE_PROJECTIONS.get(item_type, SIMPLE_DEFAULT).extract(item)
+
+
+class AsyncSpotifyHelpers(SpotifyHelpers):
+    """
+    SpotifyHelpers running on top of an AsyncSpotifyClient.
+    Same methods and output as SpotifyHelpers, but every public method is a coroutine.
+    The lazy iter_* methods and the library snapshot need a blocking client and raise NotImplementedError.
+    """
+
+    @staticmethod
+    def _sync_only(name: str) -> NotImplementedError:
+        return NotImplementedError(f"{name} needs a blocking SpotifyClient, use SpotifyHelpers or the get_* coroutines")
+
+    async def get_user_profile(self) -> Optional[Dict]:
+        return self._process_user_profile(await self.client.get_user_profile_raw())
+
+    async def get_top_items(self, time_range: str, item_type: str) -> Optional[List[Dict]]:
+        return self._process_top_items(await self.client.get_top_items_raw(time_range, item_type), item_type)
+
+    async def get_taste_analytics(self, spotify_data: Optional[Dict] = None, top_n: int = 10) -> Dict:
+        analytics = (spotify_data or {}).get('taste_analytics')
+        if analytics is None:
+            top_artists = await asyncio.gather(
+                *(self.get_top_items(time_range, 'artists') for time_range in TIME_RANGES)
+            )
+            analytics = TasteAnalytics.from_top_artists(dict(zip(TIME_RANGES, top_artists)))
+        result = analytics.to_dict(top_n)
+
+        user_id = await self.client.get_user_id()
+        snapshot = library_snapshots.open(user_id) if user_id else None
+        if snapshot is not None:
+            result['library'] = {**library_summary(snapshot, top_n), 'partial': snapshot.partial}
+        return result
+
+    async def get_followed_artists(self) -> Optional[List[Dict]]:
+        return self._process_followed_artists(await self.client.get_followed_artists_raw())
+
+    def iter_followed_artists(self):
+        raise self._sync_only('iter_followed_artists')
+
+    async def get_saved_tracks(self, limit: int = 50, offset: int = 0, query: Optional[str] = None) -> Optional[Dict]:
+        # The library snapshot is built with a blocking client, so pages come from the live library
+        if query:
+            tracks = self._process_saved_tracks({'items': await self.client.get_all_saved_tracks_raw()})
+            tracks = list(self._matching_saved_tracks(tracks, query))[offset:offset + limit]
+        else:
+            tracks = self._process_saved_tracks({'items': await self.client.get_all_saved_tracks_raw(limit, offset)})
+        return self._page_saved_tracks(tracks, None, offset, False)
+
+    def get_library_snapshot(self):
+        raise self._sync_only('get_library_snapshot')
+
+    def iter_saved_tracks(self, limit: Optional[int] = None, offset: int = 0):
+        raise self._sync_only('iter_saved_tracks')
+
+    async def get_user_playlists(self, limit: int = 100) -> Optional[List[Dict]]:
+        return self._process_user_playlists(await self.client.get_user_playlists_raw(limit))
+
+    def iter_user_playlists(self, limit: Optional[int] = None):
+        raise self._sync_only('iter_user_playlists')
+
+    async def get_playlist_items(self, playlist_id: str, limit: int = 100, offset: int = 0) -> Optional[Dict]:
+        summary = await self.client.get_playlist_summary_raw(playlist_id)
+        if not summary:
+            return None
+
+        snapshot_id = summary.get('snapshot_id')
+        items = playlist_items_cache.get(playlist_id, snapshot_id)
+        if items is None:
+            total = (summary.get('tracks') or {}).get('total')
+
+            async def fetch():
+                return self._process_playlist_items(await self.client.get_playlist_items_raw(playlist_id), total)
+
+            items, complete = await single_flight.do_async(('playlist_items', playlist_id, snapshot_id), fetch)
+            playlist_items_cache.store(playlist_id, snapshot_id, items, complete)
+        return self._page_playlist_items(summary, items, limit, offset)
+
+    async def get_saved_podcasts(self) -> Optional[List[Dict]]:
+        return self._process_saved_podcasts(await self.client.get_saved_podcasts_raw())
+
+    def iter_saved_podcasts(self):
+        raise self._sync_only('iter_saved_podcasts')
+
+    async def get_saved_audiobooks(self) -> Optional[List[Dict]]:
+        return self._process_saved_audiobooks(await self.client.get_saved_audiobooks_raw())
+
+    async def get_recently_played_tracks(self, include_genres: bool = False, limit: int = 50) -> Optional[List[Dict]]:
+        user_id = await self.client.get_user_id()
+        if user_id:
+            await play_history.poll_async(self.client, user_id)
+            tracks = [self._project_stored_play(play) for play in play_history.read(user_id, limit)]
+        else:
+            tracks = self._process_recently_played_tracks(await self.client.get_recently_played_tracks_raw())[:limit]
+
+        if include_genres:
+            await self._add_artist_genres([artist for track in tracks for artist in track['artists']])
+        return tracks
+
+    async def get_artist_genres(self, artist_ids: List[str]) -> Dict[str, List[str]]:
+        artists = await self.client.get_several_artists_raw(artist_ids)
+        return {
+            artist['id']: artist.get('genres', [])
+            for artist in artists if artist
         }
-        
-        if item_type == 'artists':
-            simplified['genres'] = item['genres']
-        elif item_type == 'tracks':
-            simplified['artists'] = [artist['name'] for artist in item['artists']]
-            simplified['album'] = item['album']['name']
-            
-        return simplified
+
+    async def _add_artist_genres(self, artists: List[Artist]) -> None:
+        genres = await self.get_artist_genres([artist['id'] for artist in artists if artist.get('id')])
+        for artist in artists:
+            artist['genres'] = genres.get(artist.get('id'), [])
+
+    def iter_recently_played_tracks(self):
+        raise self._sync_only('iter_recently_played_tracks')
+
+    async def search_item(self, query: str, search_type: str, filters: Optional[Dict] = None) -> Optional[List[Dict]]:
+        return self._process_search_results(await self.client.search_item_raw(query, search_type, filters), search_type)
+
+    async def gather_spotify_data(self, cache, timeout: float = GATHER_TIMEOUT) -> Dict[str, Dict]:
+        """Gather all relevant Spotify data, fetching every slice concurrently"""
+        slices = self._bundle_slices()
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(fetch(), timeout) for fetch in slices.values()),
+            return_exceptions=True
+        )
+
+        results = {}
+        errors = {}
+        for (section, key), outcome in zip(slices, outcomes):
+            slice_name = f'{section}.{key}'
+            if isinstance(outcome, asyncio.TimeoutError):
+                outcome, errors[slice_name] = None, f'timed out after {timeout}s'
+            elif isinstance(outcome, Exception):
+                outcome, errors[slice_name] = None, str(outcome)
+            elif outcome is None:
+                errors[slice_name] = 'request failed'
+            results[(section, key)] = outcome
+
+        return self._assemble_bundle(results, errors, cache)
+
+    async def create_playlist(self, name: str, public: bool = True,
+                              collaborative: bool = False, description: str = None) -> Optional[Dict]:
+        return self._process_created_playlist(
+            await self.client.create_playlist_raw(name, public, collaborative, description)
+        )
+
+    async def add_songs_to_playlist(self, playlist_id: str, uris: List[str], position: Optional[int] = None) -> Optional[Dict]:
+        uris = self._cap_uris(uris, 'add')
+        result = await self.client.add_songs_to_playlist_raw(playlist_id, uris, position)
+        return self._process_added_items(result, uris)
+
+    async def remove_playlist_items(self, playlist_id: str, uris: List[str], snapshot_id: Optional[str] = None) -> Optional[Dict]:
+        uris = self._cap_uris(uris, 'remove')
+        result = await self.client.remove_playlist_items_raw(playlist_id, uris, snapshot_id)
+        return self._process_removed_items(result, uris)
+
+    async def update_playlist_details(self, playlist_id: str, name: Optional[str] = None,
+                                      public: Optional[bool] = None, collaborative: Optional[bool] = None,
+                                      description: Optional[str] = None) -> Optional[Dict]:
+        payload = self._build_playlist_details_payload(name, public, collaborative, description)
+        result = await self.client.update_playlist_details_raw(playlist_id, payload)
+        return self._process_updated_playlist(result, playlist_id)
@@ -0,0 +1,358 @@
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from spotify_records import Album, Artist, Audiobook, Playlist, Show, Track, _compact
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Fields to leave out of the helper output to save tokens, as "projection.field,projection.field"
+PROJECTION_TRIM = {
+    tuple(entry.strip().split('.', 1))
+    for entry in os.getenv('SPOTIFY_PROJECTION_TRIM', '').split(',') if '.' in entry
+}
+
+
+class Field:
+    """A value at a dotted path, None as soon as any step along the path is missing or None"""
+
+    def __init__(self, path: str, default: Any = None, transform: Optional[Callable] = None):
+        self.path = path
+        self.default = default
+        self.transform = transform
+
+
+class Each:
+    """A list built from every entry of the list at path, by dotted path or by projection"""
+
+    def __init__(self, path: str, item: Union[str, 'Projection']):
+        self.path = path
+        self.item = item
+
+
+class Nested:
+    """A single object at path, extracted with its own projection"""
+
+    def __init__(self, path: str, projection: 'Projection'):
+        self.path = path
+        self.projection = projection
+
+
+class Computed:
+    """A value computed from the whole item, for fields that are not a plain lookup"""
+
+    def __init__(self, func: Callable):
+        self.func = func
+
+
+class _Compiler:
+    """Generates the source of one extractor function from a field spec"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {}
+        # Dotted path prefix -> local variable already holding it, so shared prefixes are read once
+        self.bound: Dict[tuple, str] = {(): 'item'}
+        self.counter = 0
+
+    def _name(self, prefix: str) -> str:
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def ref(self, obj: Any) -> str:
+        name = self._name('_c')
+        self.namespace[name] = obj
+        return name
+
+    def path_var(self, path: str) -> str:
+        parts = tuple(path.split('.')) if path else ()
+        for i in range(1, len(parts) + 1):
+            if parts[:i] not in self.bound:
+                parent = self.bound[parts[:i - 1]]
+                var = self._name('v')
+                if parent == 'item':
+                    # extract() already returned for a None item
+                    self.lines.append(f'{var} = item.get({parts[i - 1]!r})')
+                else:
+                    self.lines.append(f'{var} = {parent}.get({parts[i - 1]!r}) if {parent} is not None else None')
+                self.bound[parts[:i]] = var
+        return self.bound[parts]
+
+    def inline_path(self, base: str, path: str) -> str:
+        """None-safe expression for a dotted path below base, usable inside a comprehension"""
+        parts = path.split('.')
+        expr = f'{base}.get({parts[0]!r})'
+        for part in parts[1:]:
+            tmp = self._name('t')
+            expr = f'(None if ({tmp} := {expr}) is None else {tmp}.get({part!r}))'
+        return expr
+
+    def field(self, spec: Any, compact: bool = False, intern: bool = False) -> str:
+        """
+        Emit the lines computing one field and return the variable holding it.
+        With compact, lists become tuples and intern interns strings, as Record.__init__ would.
+        """
+        if isinstance(spec, str):
+            spec = Field(spec)
+        out = self._name('o')
+
+        if isinstance(spec, Each):
+            seq = self.path_var(spec.path)
+            if isinstance(spec.item, Projection):
+                element = f'{self.ref(spec.item.extract)}(x)'
+            else:
+                element = self.inline_path('x', spec.item)
+                if intern:
+                    tmp = self._name('t')
+                    element = f"({self.ref(sys.intern)}({tmp}) if ({tmp} := {element}).__class__ is str else {tmp})"
+            empty = '()' if compact else '[]'
+            wrap = 'tuple' if compact else ''
+            self.lines.append(f'{out} = {wrap}([{element} for x in {seq} if x is not None]) if {seq} is not None else {empty}')
+            return out
+
+        if isinstance(spec, Field):
+            var = self.path_var(spec.path)
+            self.lines.append(f'{out} = {var}')
+            if spec.default is not None:
+                self.lines.append(f'if {out} is None: {out} = {self.ref(spec.default)}')
+            if spec.transform is not None:
+                self.lines.append(f'if {out} is not None: {out} = {self.ref(spec.transform)}({out})')
+        elif isinstance(spec, Nested):
+            self.lines.append(f'{out} = {self.ref(spec.projection.extract)}({self.path_var(spec.path)})')
+        elif isinstance(spec, Computed):
+            self.lines.append(f'{out} = {self.ref(spec.func)}(item)')
+        else:
+            raise TypeError(f'Unsupported field spec: {spec!r}')
+
+        if compact:
+            self.lines.append(f'if {out}.__class__ is list: {out} = {self.ref(_compact)}({out}, {intern})')
+        if intern:
+            self.lines.append(f'if {out}.__class__ is str: {out} = {self.ref(sys.intern)}({out})')
+        return out
+
+
+class Projection:
+    """
+    Declarative mapping from a Spotify payload to a record (or a plain dict when
+    record_cls is None), compiled once into a single extractor function.
+    extract(None) returns None, missing keys anywhere become None instead of raising.
+    """
+
+    def __init__(self, name: str, record_cls: Optional[type], fields: Dict[str, Any]):
+        self.name = name
+        self.record_cls = record_cls
+        self.fields = fields
+        self.source = ''
+        self.extract: Callable[[Optional[Dict]], Any] = self._compile()
+
+    def _compile(self) -> Callable[[Optional[Dict]], Any]:
+        compiler = _Compiler()
+
+        if self.record_cls is None:
+            outputs = {name: compiler.field(spec) for name, spec in self.fields.items()}
+            result = '{' + ', '.join(f'{name!r}: {var}' for name, var in outputs.items()) + '}'
+        else:
+            # Fill the slots directly, skipping the generic keyword handling of Record.__init__
+            unknown = set(self.fields) - set(self.record_cls.__slots__)
+            if unknown:
+                raise ValueError(f'{self.record_cls.__name__} has no fields {sorted(unknown)}')
+            outputs = {
+                name: compiler.field(spec, compact=True, intern=name in self.record_cls._interned)
+                for name, spec in self.fields.items()
+            }
+            cls = compiler.ref(self.record_cls)
+            compiler.lines.append(f'record = {compiler.ref(object.__new__)}({cls})')
+            compiler.lines.extend(f'record.{name} = {var}' for name, var in outputs.items())
+            compiler.lines.append(f'record._projection = {self.name!r}')
+            result = 'record'
+
+        body = ['if item is None:', '    return None', *compiler.lines, f'return {result}']
+        self.source = 'def extract(item):\n' + '\n'.join(f'    {line}' for line in body)
+        exec(compile(self.source, f'<projection {self.name}>', 'exec'), compiler.namespace)
+        return compiler.namespace['extract']
+
+    def extract_many(self, items: Optional[List[Dict]]) -> List[Any]:
+        """Extract every item, skipping None entries"""
+        extract = self.extract
+        return [extract(item) for item in items if item is not None] if items else []
+
+
+PROJECTIONS: Dict[str, Projection] = {}
+
+
+def register(name: str, record_cls: Optional[type], fields: Dict[str, Any]) -> Projection:
+    """Add a projection to the registry, dropping fields listed in SPOTIFY_PROJECTION_TRIM"""
+    trimmed = {field: spec for field, spec in fields.items() if (name, field) not in PROJECTION_TRIM}
+    if len(trimmed) != len(fields):
+        logger.info(f"Trimmed {sorted(set(fields) - set(trimmed))} from the {name} projection")
+    projection = PROJECTIONS[name] = Projection(name, record_cls, trimmed)
+    return projection
+
+
+# References to related entities, as embedded in tracks and albums
+ARTIST_NAME = register('artist_name', Artist, {'name': 'name'})
+ARTIST_REF = register('artist_ref', Artist, {'name': 'name', 'id': 'id', 'uri': 'uri'})
+ALBUM_REF = register('album_ref', Album, {'name': 'name', 'id': 'id', 'uri': 'uri'})
+
+USER_PROFILE = register('user_profile', None, {
+    'id': 'id',
+    'display_name': 'display_name',
+    'uri': 'uri',
+    'followers': Field('followers.total', default=0),
+    'images': Each('images', register('image', None, {'url': 'url'}))
+})
+
+TOP_ARTIST = register('top_artist', Artist, {
+    'name': 'name',
+    'uri': 'uri',
+    'popularity': 'popularity',
+    'genres': Field('genres', default=[])
+})
+
+TOP_TRACK = register('top_track', Track, {
+    'name': 'name',
+    'uri': 'uri',
+    'popularity': 'popularity',
+    'artists': Each('artists', 'name'),
+    'album': 'album.name'
+})
+
+FOLLOWED_ARTIST = register('followed_artist', Artist, {'name': 'name'})
+
+SAVED_TRACK = register('saved_track', Track, {
+    'name': 'track.name',
+    'artists': Each('track.artists', 'name'),
+    'album': 'track.album.name',
+    'uri': 'track.uri'
+})
+
+PLAYLIST = register('playlist', Playlist, {'id': 'id', 'name': 'name', 'uri': 'uri'})
+
+# Items of a playlist, as trimmed by PLAYLIST_ITEM_FIELDS
+PLAYLIST_ITEM = register('playlist_item', Track, {
+    'name': 'track.name',
+    'uri': 'track.uri',
+    'artists': Each('track.artists', 'name'),
+    'album': 'track.album.name',
+    'added_at': 'added_at'
+})
+
+SAVED_SHOW = register('saved_show', Show, {
+    'name': Field('show.name', default='Unknown Show'),
+    'description': Field('show.description', default=''),
+    'publisher': Field('show.publisher', default=''),
+    'uri': Field('show.uri', default='')
+})
+
+SAVED_AUDIOBOOK = register('saved_audiobook', Audiobook, {
+    'id': 'id',
+    'name': 'name',
+    'authors': Each('authors', 'name'),
+    'publisher': 'publisher',
+    'uri': 'uri'
+})
+
+RECENT_TRACK = register('recent_track', Track, {
+    'name': 'track.name',
+    'uri': 'track.uri',
+    'played_at': 'played_at',
+    'artists': Each('track.artists', ARTIST_REF),
+    'album': Nested('track.album', ALBUM_REF)
+})
+
+# Plays as stored by play_history
+STORED_PLAY = register('stored_play', Track, {
+    'name': 'name',
+    'uri': Field('id', transform='spotify:track:{}'.format),
+    'played_at': 'played_at',
+    'artists': Computed(lambda play: [
+        Artist(name=name, id=artist_id, uri=f'spotify:artist:{artist_id}')
+        for name, artist_id in zip(play.get('artists') or (), play.get('artist_ids') or ())
+    ]),
+    'album': Computed(lambda play: Album(
+        name=play.get('album'), id=play.get('album_id'), uri=f"spotify:album:{play.get('album_id')}"
+    ))
+})
+
+CREATED_PLAYLIST = register('created_playlist', None, {'id': 'id', 'name': 'name', 'uri': 'uri'})
+
+# Search results, keyed by search type
+SEARCH_PROJECTIONS: Dict[str, Projection] = {
+    'track': register('search_track', Track, {
+        'id': 'id',
+        'name': 'name',
+        'artists': Each('artists', ARTIST_NAME),
+        'album': 'album.name',
+        'duration_ms': 'duration_ms',
+        'popularity': 'popularity',
+        'preview_url': 'preview_url',
+        'explicit': Field('explicit', default=False),
+        'uri': 'uri'
+    }),
+    'artist': register('search_artist', Artist, {
+        'id': 'id',
+        'name': 'name',
+        'genres': Field('genres', default=[]),
+        'followers': 'followers.total',
+        'popularity': 'popularity',
+        'uri': 'uri'
+    }),
+    'album': register('search_album', Album, {
+        'id': 'id',
+        'name': 'name',
+        'artists': Each('artists', ARTIST_NAME),
+        'release_date': 'release_date',
+        'total_tracks': 'total_tracks',
+        'uri': 'uri'
+    }),
+    'playlist': register('search_playlist', Playlist, {
+        'id': 'id',
+        'name': 'name',
+        'owner': 'owner.display_name',
+        'total_tracks': 'tracks.total',
+        'description': 'description',
+        'uri': 'uri'
+    }),
+    'show': register('search_show', Show, {
+        'id': 'id',
+        'name': 'name',
+        'publisher': 'publisher',
+        'description': 'description',
+        'total_episodes': 'total_episodes',
+        'uri': 'uri'
+    }),
+    'episode': register('search_episode', None, {
+        'id': 'id',
+        'name': 'name',
+        'show_name': 'show.name',
+        'description': 'description',
+        'duration_ms': 'duration_ms',
+        'release_date': 'release_date',
+        'uri': 'uri'
+    }),
+    'audiobook': register('search_audiobook', Audiobook, {
+        'id': 'id',
+        'name': 'name',
+        'authors': Each('authors', 'name'),
+        'narrators': Each('narrators', 'name'),
+        'description': 'description',
+        'duration_ms': 'duration_ms',
+        'uri': 'uri'
+    })
+}
+
+# Fallback for search types without a projection of their own
+SEARCH_DEFAULT = register('search_default', None, {'id': 'id', 'name': 'name', 'uri': 'uri'})
+
+# Minimal top item summaries, keyed by item type
+SIMPLE_PROJECTIONS: Dict[str, Projection] = {
+    'artists': register('simple_artist', None, {'name': 'name', 'popularity': 'popularity', 'genres': 'genres'}),
+    'tracks': register('simple_track', None, {
+        'name': 'name',
+        'popularity': 'popularity',
+        'artists': Each('artists', 'name'),
+        'album': 'album.name'
+    })
+}
+
+SIMPLE_DEFAULT = register('simple_default', None, {'name': 'name', 'popularity': 'popularity'})
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Token bucket sized to the app's Spotify quota (Spotify enforces a rolling 30 second window)
+RATE_LIMIT_PER_SECOND = float(os.getenv('SPOTIFY_RATE_LIMIT_PER_SECOND', '10'))
+RATE_LIMIT_BURST = float(os.getenv('SPOTIFY_RATE_LIMIT_BURST', '20'))
+MAX_RETRIES = int(os.getenv('SPOTIFY_MAX_RETRIES', '3'))
+BACKOFF_BASE = float(os.getenv('SPOTIFY_BACKOFF_BASE', '0.5'))
+MAX_BACKOFF = float(os.getenv('SPOTIFY_MAX_BACKOFF', '8'))
+# A longer Retry-After is not waited out inside a request, the call fails instead
+MAX_RETRY_AFTER = float(os.getenv('SPOTIFY_MAX_RETRY_AFTER', '30'))
+# Longest a caller waits for a token, after that the request is sent anyway
+MAX_ACQUIRE_WAIT = float(os.getenv('SPOTIFY_MAX_ACQUIRE_WAIT', str(MAX_RETRY_AFTER + 5)))
+
+RETRYABLE_STATUS_CODES = (500, 502, 503, 504)
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar(
+    'spotify_request_priority', default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """
+    Run every Spotify call made inside the block at the given priority, e.g.
+
+        with request_priority(PRIORITY_BACKGROUND):
+            helpers.gather_spotify_data(cache)
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class RateLimitScheduler:
+    """
+    Process-wide gate for outgoing Spotify requests.
+    Tokens refill at `rate` per second up to `burst`. A 429 blocks every caller until its
+    Retry-After has passed, and background callers only get a token when no interactive
+    caller is waiting.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_wait: float = MAX_ACQUIRE_WAIT):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self._cond = threading.Condition()
+        self._stats = {
+            'acquired': 0,
+            'waited': 0,
+            'wait_seconds': 0.0,
+            'throttled': 0,
+            'retries': 0,
+            'wait_timeouts': 0
+        }
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def _try_acquire(self, priority: int) -> float:
+        """
+        Take a token if allowed, caller must hold the lock.
+        Returns 0 on success, otherwise the number of seconds to wait before retrying.
+        """
+        now = time.monotonic()
+        self._refill(now)
+
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        if any(count for level, count in self._waiting.items() if level < priority):
+            # Let higher priority callers go first, they notify when done
+            return 1.0 / self.rate
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._stats['acquired'] += 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _note_wait_timeout(self, waited: float) -> None:
+        """Caller must hold the lock"""
+        self._stats['wait_timeouts'] += 1
+        logger.warning(f"Waited {waited:.1f}s for a Spotify request slot, sending anyway")
+
+    def acquire(self, priority: Optional[int] = None) -> None:
+        """Block until the calling thread may send a request, at most max_wait seconds"""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    wait = self._try_acquire(priority)
+                    if wait <= 0:
+                        break
+                    remaining = started + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        self._note_wait_timeout(self.max_wait - remaining)
+                        break
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._waiting[priority] -= 1
+                self._record_wait(time.monotonic() - started)
+                self._cond.notify_all()
+
+    async def acquire_async(self, priority: Optional[int] = None) -> None:
+        """Wait without blocking the event loop until a request may be sent, at most max_wait seconds"""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(priority)
+                    remaining = started + self.max_wait - time.monotonic()
+                    if wait > 0 and remaining <= 0:
+                        self._note_wait_timeout(self.max_wait - remaining)
+                        break
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+                self._record_wait(time.monotonic() - started)
+                self._cond.notify_all()
+
+    def _record_wait(self, waited: float) -> None:
+        if waited > 0.001:
+            self._stats['waited'] += 1
+            self._stats['wait_seconds'] += waited
+
+    def note_retry_after(self, seconds: float) -> None:
+        """Pause every caller after Spotify answered 429"""
+        with self._cond:
+            self._stats['throttled'] += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0
+            self._cond.notify_all()
+        logger.warning(f"Spotify rate limit hit, pausing requests for {seconds:.1f}s")
+
+    def note_retry(self) -> None:
+        with self._cond:
+            self._stats['retries'] += 1
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """Exponential backoff with jitter for the given retry attempt"""
+        delay = min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str], attempt: int) -> float:
+        """Read the Retry-After header, falling back to backoff if it is missing"""
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            return RateLimitScheduler.backoff_delay(attempt)
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['tokens'] = round(self._tokens, 2)
+            stats['blocked_for'] = round(max(self._blocked_until - time.monotonic(), 0.0), 2)
+            stats['waiting'] = dict(self._waiting)
+        return stats
+
+
+rate_limiter = RateLimitScheduler()
@@ -0,0 +1,132 @@
+import json
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+_UNSET = object()
+
+
+def _compact(value: Any, intern: bool) -> Any:
+    """Store lists as tuples, interning strings that repeat across records"""
+    if isinstance(value, list):
+        return tuple(_compact(item, intern) for item in value)
+    if intern and type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, (tuple, list)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class Record:
+    """
+    Compact, slotted stand-in for the dicts the helpers used to return.
+    Fields that were never set are left out of to_dict(), so each record type can
+    serve every projection of its entity. Supports record['field'] access like a dict.
+    Records built by a projection carry its name in _projection, it is not a field.
+    """
+    __slots__ = ('_projection',)
+    # Fields holding strings shared by many records (artist names, genres, ...)
+    _interned: Tuple[str, ...] = ()
+
+    def __init__(self, **fields):
+        interned = self._interned
+        for name, value in fields.items():
+            if type(value) is list or (type(value) is str and name in interned):
+                value = _compact(value, name in interned)
+            setattr(self, name, value)
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        setattr(self, name, _compact(value, name in self._interned))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__slots__ and hasattr(self, name)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name, default) if name in self.__slots__ else default
+
+    def keys(self) -> Iterator[str]:
+        return (name for name in self.__slots__ if hasattr(self, name))
+
+    def to_dict(self) -> Dict:
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                data[name] = _plain(value) if isinstance(value, (Record, tuple)) else value
+        return data
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.keys())
+        return f'{type(self).__name__}({fields})'
+
+
+class Artist(Record):
+    __slots__ = ('id', 'name', 'uri', 'genres', 'popularity', 'followers')
+    _interned = ('name', 'genres')
+
+
+class Album(Record):
+    __slots__ = ('id', 'name', 'uri', 'artists', 'release_date', 'total_tracks')
+    _interned = ('name',)
+
+
+class Track(Record):
+    # artists holds names or Artist records, album a name or an Album record, depending on the projection
+    __slots__ = ('id', 'name', 'uri', 'artists', 'album', 'popularity', 'duration_ms',
+                 'explicit', 'preview_url', 'added_at', 'played_at')
+    _interned = ('artists', 'album')
+
+
+class Playlist(Record):
+    __slots__ = ('id', 'name', 'uri', 'owner', 'total_tracks', 'description')
+    _interned = ('owner',)
+
+
+class Show(Record):
+    __slots__ = ('id', 'name', 'uri', 'publisher', 'description', 'total_episodes')
+    _interned = ('publisher',)
+
+
+class Audiobook(Record):
+    __slots__ = ('id', 'name', 'uri', 'authors', 'narrators', 'publisher', 'description', 'duration_ms')
+    _interned = ('authors', 'narrators', 'publisher')
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert records (and other objects with to_dict) nested anywhere in dicts and lists to plain dicts"""
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [to_jsonable(item) for item in value]
+    if not isinstance(value, Record) and hasattr(value, 'to_dict'):
+        return to_jsonable(value.to_dict())
+    return _plain(value)
+
+
+def json_default(value: Any) -> Any:
+    """default= hook for json.dumps"""
+    if isinstance(value, Record) or hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(value: Any, **kwargs) -> str:
+    return json.dumps(value, default=json_default, **kwargs)
@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+TIME_RANGES = ('short_term', 'medium_term', 'long_term')
+
+
+class TasteAnalytics:
+    """
+    Genre and artist statistics over the user's top artists in every time range.
+    Built once from an artist x genre incidence matrix and an artist x time range rank
+    matrix, every statistic is then computed for all time ranges in the same vectorized pass.
+    """
+
+    def __init__(self, time_ranges: Sequence[str], artists: List[Dict], genres: List[str],
+                 incidence: np.ndarray, genre_positions: np.ndarray, ranks: np.ndarray):
+        self.time_ranges = list(time_ranges)
+        self.artists = artists
+        self.genres = genres
+        self.ranks = ranks  # artist x range, 1-based rank, NaN when absent from that range
+        present = ~np.isnan(ranks)
+
+        # genre x range: number of top artists carrying the genre
+        self.genre_counts = incidence.T.astype(np.int32) @ present.astype(np.int32)
+
+        # Order genres by count, ties by first appearance in the range (artist rank, then genre position)
+        first_seen = np.where(
+            incidence[:, :, None] & present[:, None, :],
+            ranks[:, None, :] + genre_positions[:, :, None] / (genre_positions.max(initial=0) + 1),
+            np.inf
+        ).min(axis=0, initial=np.inf)
+        self.genre_order = np.lexsort((first_seen, -self.genre_counts), axis=0)
+
+        totals = self.genre_counts.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.where(totals > 0, self.genre_counts / totals, 0.0)
+            self.entropy = 0.0 - np.where(shares > 0, shares * np.log2(shares), 0.0).sum(axis=0)
+            self.distinct_genres = (self.genre_counts > 0).sum(axis=0)
+            self.normalized_entropy = np.where(
+                self.distinct_genres > 1, self.entropy / np.log2(np.maximum(self.distinct_genres, 2)), 0.0
+            )
+        self.simpson_diversity = np.where(totals > 0, 1.0 - (shares ** 2).sum(axis=0), 0.0)
+
+    @classmethod
+    def from_top_artists(cls, top_artists: Dict[str, Optional[List]]) -> 'TasteAnalytics':
+        """Build from {time_range: top artists}, ranges without data count as empty"""
+        time_ranges = [time_range for time_range in TIME_RANGES if time_range in top_artists]
+        time_ranges += [time_range for time_range in top_artists if time_range not in TIME_RANGES]
+
+        artist_index: Dict[str, int] = {}
+        artists: List[Dict] = []
+        genre_index: Dict[str, int] = {}
+        memberships = []  # (artist, range, rank)
+        artist_genres: Dict[int, List[int]] = {}
+
+        for column, time_range in enumerate(time_ranges):
+            for rank, artist in enumerate(top_artists.get(time_range) or [], start=1):
+                key = artist.get('uri') or artist.get('name')
+                if key not in artist_index:
+                    artist_index[key] = len(artists)
+                    artists.append({'name': artist.get('name'), 'uri': artist.get('uri')})
+                    artist_genres[artist_index[key]] = [
+                        genre_index.setdefault(genre, len(genre_index)) for genre in artist.get('genres') or ()
+                    ]
+                memberships.append((artist_index[key], column, rank))
+
+        incidence = np.zeros((len(artists), len(genre_index)), dtype=bool)
+        genre_positions = np.zeros((len(artists), len(genre_index)), dtype=np.float64)
+        for row, genre_columns in artist_genres.items():
+            incidence[row, genre_columns] = True
+            genre_positions[row, genre_columns] = np.arange(len(genre_columns))
+
+        ranks = np.full((len(artists), len(time_ranges)), np.nan)
+        if memberships:
+            rows, columns, values = np.array(memberships).T
+            ranks[rows, columns] = values
+
+        return cls(time_ranges, artists, list(genre_index), incidence, genre_positions, ranks)
+
+    def _column(self, time_range: str) -> Optional[int]:
+        return self.time_ranges.index(time_range) if time_range in self.time_ranges else None
+
+    def _ranked_genres(self, column: int, limit: Optional[int]) -> np.ndarray:
+        order = self.genre_order[:, column]
+        return order[self.genre_counts[order, column] > 0][:limit]
+
+    def top_genres(self, time_range: str, limit: Optional[int] = None) -> List[str]:
+        """Genres of the range's top artists, most common first"""
+        column = self._column(time_range)
+        if column is None:
+            return []
+        return [self.genres[index] for index in self._ranked_genres(column, limit)]
+
+    def genre_count_table(self, time_range: str, limit: Optional[int] = None) -> List[Dict]:
+        """Top genres with the number of the range's top artists carrying each"""
+        column = self._column(time_range)
+        if column is None:
+            return []
+        return [
+            {'genre': self.genres[index], 'artists': int(self.genre_counts[index, column])}
+            for index in self._ranked_genres(column, limit)
+        ]
+
+    def rank_changes(self, limit: int = 10, recent: str = 'short_term', past: str = 'long_term') -> Dict[str, List[Dict]]:
+        """
+        Artists climbing or falling between two ranges (positive delta means a better recent rank),
+        plus artists present in only one of them
+        """
+        recent_column, past_column = self._column(recent), self._column(past)
+        if recent_column is None or past_column is None:
+            return {'rising': [], 'falling': [], 'new': [], 'dropped': []}
+
+        recent_ranks = self.ranks[:, recent_column]
+        past_ranks = self.ranks[:, past_column]
+        delta = past_ranks - recent_ranks
+        both = ~np.isnan(delta)
+
+        def entries(indices, with_delta=True):
+            return [
+                {
+                    **self.artists[index],
+                    **({'delta': int(delta[index])} if with_delta else {}),
+                    f'{recent}_rank': None if np.isnan(recent_ranks[index]) else int(recent_ranks[index]),
+                    f'{past}_rank': None if np.isnan(past_ranks[index]) else int(past_ranks[index])
+                }
+                for index in indices[:limit]
+            ]
+
+        moved = np.flatnonzero(both)
+        by_delta = moved[np.argsort(-delta[moved], kind='stable')]
+        by_delta_reversed = by_delta[::-1]
+        new = np.flatnonzero(~np.isnan(recent_ranks) & np.isnan(past_ranks))
+        dropped = np.flatnonzero(np.isnan(recent_ranks) & ~np.isnan(past_ranks))
+        return {
+            'rising': entries(by_delta[delta[by_delta] > 0]),
+            'falling': entries(by_delta_reversed[delta[by_delta_reversed] < 0]),
+            'new': entries(new[np.argsort(recent_ranks[new], kind='stable')], with_delta=False),
+            'dropped': entries(dropped[np.argsort(past_ranks[dropped], kind='stable')], with_delta=False)
+        }
+
+    def diversity(self) -> Dict[str, Dict]:
+        """Shannon entropy (bits), entropy normalized to [0, 1] and Gini-Simpson index of the genre mix per range"""
+        return {
+            time_range: {
+                'distinct_genres': int(self.distinct_genres[column]),
+                'entropy': round(float(self.entropy[column]), 3),
+                'normalized_entropy': round(float(self.normalized_entropy[column]), 3),
+                'simpson_diversity': round(float(self.simpson_diversity[column]), 3)
+            }
+            for column, time_range in enumerate(self.time_ranges)
+        }
+
+    def to_dict(self, top_n: int = 10) -> Dict:
+        return {
+            'top_genres': {time_range: self.genre_count_table(time_range, top_n) for time_range in self.time_ranges},
+            'rank_changes': self.rank_changes(top_n),
+            'diversity': self.diversity()
+        }
+
+
+def library_summary(snapshot, top_n: int = 10) -> Dict:
+    """
+    Saved and played artist counts and plays per hour of day (UTC), computed straight
+    from the columns of a LibrarySnapshot
+    """
+    columns = snapshot.columns
+    artist_count = len(columns['artists.id'])
+
+    def top_artists(counts: np.ndarray) -> List[Dict]:
+        order = np.argsort(-counts, kind='stable')[:top_n]
+        return [{'name': snapshot.artist_name(index), 'count': int(counts[index])} for index in order if counts[index] > 0]
+
+    saved_counts = np.bincount(columns['tracks.artists'], minlength=artist_count)
+    played_counts = np.bincount(columns['plays.artists'], minlength=artist_count)
+    hours = np.bincount((columns['plays.played_at'] // 3_600_000) % 24, minlength=24)
+    return {
+        'saved_tracks': snapshot.track_count,
+        'stored_plays': snapshot.play_count,
+        'most_saved_artists': top_artists(saved_counts),
+        'most_played_artists': top_artists(played_counts),
+        'plays_by_hour_utc': hours.tolist()
+    }
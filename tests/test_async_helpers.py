@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from async_spotify_client import AsyncSpotifyClient
+from play_history import play_history
+from spotify_helpers import AsyncSpotifyHelpers
+
+
+def track(i: int) -> dict:
+    return {
+        'id': f't{i}', 'name': f'Track {i}', 'uri': f'spotify:track:t{i}',
+        'artists': [{'name': f'Artist {i}', 'id': f'a{i}'}],
+        'album': {'name': 'Album', 'id': 'al1'}
+    }
+
+
+class FakeAsyncClient:
+    """Coroutine versions of the client methods the helpers call"""
+
+    def __init__(self, plays=(), saved=()):
+        self.plays = list(plays)
+        self.saved = list(saved)
+        self.play_requests = []
+
+    async def get_user_id(self):
+        return 'user'
+
+    async def get_recently_played_page_raw(self, after=None):
+        self.play_requests.append(after)
+        return {'items': self.plays}
+
+    async def get_several_artists_raw(self, ids):
+        return [{'id': id_, 'genres': [f'genre of {id_}']} for id_ in ids]
+
+    async def get_all_saved_tracks_raw(self, limit=None, offset=0):
+        end = None if limit is None else offset + limit
+        return self.saved[offset:end]
+
+
+@pytest.fixture(autouse=True)
+def plays_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(play_history, 'data_dir', str(tmp_path))
+    monkeypatch.setattr(play_history, '_last_poll', {})
+
+
+def test_recently_played_tracks_are_stored_with_genres():
+    plays = [{'played_at': f'2024-01-01T00:00:0{i}.000Z', 'track': track(i)} for i in range(3)]
+    client = FakeAsyncClient(plays=plays)
+    helpers = AsyncSpotifyHelpers(client)
+
+    tracks = asyncio.run(helpers.get_recently_played_tracks(include_genres=True, limit=2))
+
+    assert [t['name'] for t in tracks] == ['Track 2', 'Track 1']
+    assert tracks[0]['artists'][0]['genres'] == ('genre of a2',)
+    assert [play['id'] for play in play_history.read('user')] == ['t2', 't1', 't0']
+    # The next poll only asks for plays after the newest stored one
+    asyncio.run(play_history.poll_async(client, 'user', force=True))
+    assert client.play_requests[-1] == play_history.read_raw('user', 1)[0]['played_at']
+
+
+def test_saved_tracks_apply_limit_offset_and_query():
+    client = FakeAsyncClient(saved=[{'added_at': '2024-01-01T00:00:00Z', 'track': track(i)} for i in range(12)])
+    helpers = AsyncSpotifyHelpers(client)
+
+    page = asyncio.run(helpers.get_saved_tracks(limit=2, offset=3))
+    assert [t['name'] for t in page['tracks']] == ['Track 3', 'Track 4']
+    page = asyncio.run(helpers.get_saved_tracks(limit=5, query='track 1'))
+    assert [t['name'] for t in page['tracks']] == ['Track 1', 'Track 10', 'Track 11']
+
+
+def test_sync_only_methods_raise():
+    helpers = AsyncSpotifyHelpers(FakeAsyncClient())
+    with pytest.raises(NotImplementedError, match='iter_saved_tracks'):
+        helpers.iter_saved_tracks()
+    with pytest.raises(NotImplementedError, match='get_library_snapshot'):
+        helpers.get_library_snapshot()
+
+
+def test_several_items_leave_out_failed_chunks(monkeypatch):
+    client = AsyncSpotifyClient('token')
+    requests = []
+
+    async def make_request(endpoint, params=None):
+        ids = params['ids'].split(',')
+        requests.append(ids)
+        if 'async-bad-0' in ids:
+            return None
+        return {endpoint: [{'id': id_, 'genres': []} for id_ in ids]}
+
+    monkeypatch.setattr(client, '_make_request', make_request)
+    ids = [f'async-ok-{i}' for i in range(50)] + [f'async-bad-{i}' for i in range(10)]
+
+    artists = asyncio.run(client.get_several_artists_raw(ids))
+
+    assert [artist['id'] for artist in artists[:50]] == ids[:50]
+    assert artists[50:] == [None] * 10
+    # The failed ids were not stored as unknown, asking again fetches only them
+    asyncio.run(client.get_several_artists_raw(ids))
+    assert requests[-1] == ids[50:]
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+import library_sync
+from library_snapshot import library_snapshots
+from library_sync import library_sync as sync
+from play_history import play_history
+from spotify_helpers import SpotifyHelpers
+
+
+def saved_track(i: int, name: str = None, artists=('Artist',), album: str = 'Album') -> dict:
+    return {
+        'added_at': f'2024-01-01T00:{59 - i // 60 % 60:02d}:{59 - i % 60:02d}Z',
+        'track': {
+            'id': f't{i}', 'name': name or f'Track {i}', 'uri': f'spotify:track:t{i}',
+            'artists': [{'name': artist, 'id': f'a-{artist}'} for artist in artists],
+            'album': {'name': album, 'id': f'al-{album}'}
+        }
+    }
+
+
+class FakeClient:
+    """Serves a saved tracks library page by page, slowly when asked to"""
+
+    def __init__(self, items, page_delay: float = 0):
+        self.items = items
+        self.page_delay = page_delay
+        self.playlist_fetches = 0
+
+    def get_saved_tracks_raw(self, limit=50, offset=0):
+        return {
+            'total': len(self.items),
+            'items': self.items[offset:offset + limit],
+            'next': 'next' if offset + limit < len(self.items) else None
+        }
+
+    def iter_saved_tracks(self, limit=None, offset=0):
+        end = len(self.items) if limit is None else min(len(self.items), offset + limit)
+        for index in range(offset, end):
+            if index % 50 == 0:
+                time.sleep(self.page_delay)
+            yield self.items[index]
+
+    def get_recently_played_page_raw(self, after=None):
+        return {'items': []}
+
+    def get_user_playlists_raw(self, limit=100):
+        self.playlist_fetches += 1
+        return [{'id': 'p1', 'name': 'Playlist', 'uri': 'spotify:playlist:p1', 'snapshot_id': 's1'}]
+
+
+@pytest.fixture(autouse=True)
+def data_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync, 'data_dir', str(tmp_path / 'library'))
+    monkeypatch.setattr(play_history, 'data_dir', str(tmp_path / 'plays'))
+    monkeypatch.setattr(library_snapshots, 'data_dir', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(library_sync, 'LIBRARY_FULL_SYNC_WAIT', 0.2)
+    yield
+    # Background syncs and refreshes must finish before the data directories are restored
+    wait_for(lambda: not sync._full_syncs and not library_snapshots._refreshing)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_snapshot_is_partial_until_first_full_sync_finishes():
+    client = FakeClient([saved_track(i) for i in range(300)], page_delay=0.1)
+
+    snapshot = library_snapshots.refresh(client, 'user')
+    assert snapshot.partial
+    assert snapshot.track_count < 300
+    # A partial snapshot is never fresh, the next call checks again
+    assert not library_snapshots._fresh('user')
+
+    wait_for(lambda: not library_snapshots.open('user').partial)
+    snapshot = library_snapshots.refresh(client, 'user')
+    assert snapshot.track_count == 300
+    assert not snapshot.partial
+
+
+def test_playlists_are_refreshed_in_the_background():
+    client = FakeClient([saved_track(i) for i in range(10)])
+    sync.sync_saved_tracks(client, 'user')
+    wait_for(lambda: sync.load('user') is not None)
+
+    snapshot = library_snapshots.refresh(client, 'user')
+    assert snapshot.track_count == 10
+    wait_for(lambda: len(library_snapshots.open('user').playlists()) == 1)
+    assert client.playlist_fetches == 1
+
+
+def test_query_matches_name_album_and_artists_case_insensitively():
+    items = [
+        saved_track(0, name='Blue Monday'),
+        saved_track(1, album='Kind of Blue'),
+        saved_track(2, artists=('Someone', 'Blues Brothers')),
+        saved_track(3, name='Red'),
+        saved_track(4, name='Überblau', artists=()),
+    ]
+    tracks = [sync._compact_item(item) for item in items]
+    library_snapshots.write('user', tracks, [], [])
+    snapshot = library_snapshots.open('user')
+
+    assert snapshot.saved_track_rows('BLUE').tolist() == [0, 1, 2]
+    assert snapshot.saved_track_rows('überb').tolist() == [4]
+    # Names of neighbouring strings are not joined into one match
+    assert snapshot.saved_track_rows('mondayred').tolist() == []
+    assert [track['name'] for track in snapshot.saved_tracks(1, 1, 'blue')] == ['Track 1']
+    assert snapshot.saved_track_rows(None).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_saved_tracks_without_snapshot_apply_limit_offset_and_query():
+    client = FakeClient([saved_track(i, name='Blue' if i % 2 else None) for i in range(120)])
+    client.get_user_id = lambda: None
+    helpers = SpotifyHelpers(client)
+
+    page = helpers.get_saved_tracks(limit=3, offset=60)
+    assert [track['name'] for track in page['tracks']] == ['Track 60', 'Blue', 'Track 62']
+    page = helpers.get_saved_tracks(limit=2, offset=1, query='BLUE')
+    assert [track['uri'] for track in page['tracks']] == ['spotify:track:t3', 'spotify:track:t5']
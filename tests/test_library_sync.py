@@ -0,0 +1,102 @@
+import pytest
+
+import library_sync
+from library_sync import LibrarySync
+
+
+def saved_track(i: int, added_at: str = None) -> dict:
+    return {
+        'added_at': added_at or f'2024-01-01T00:{59 - i // 60 % 60:02d}:{59 - i % 60:02d}Z',
+        'track': {
+            'id': f't{i}', 'name': f'Track {i}', 'uri': f'spotify:track:t{i}',
+            'artists': [{'name': 'Artist', 'id': 'a1'}],
+            'album': {'name': 'Album', 'id': 'al1'}
+        }
+    }
+
+
+class FakeClient:
+    """Serves a saved tracks library, recording the pages asked for"""
+
+    def __init__(self, items, fail_after: int = None):
+        self.items = items
+        # The lazy iterator stops early after this many items, like a failed page
+        self.fail_after = fail_after
+        self.page_offsets = []
+        self.iterated_from = []
+
+    def get_saved_tracks_raw(self, limit=50, offset=0):
+        self.page_offsets.append(offset)
+        return {
+            'total': len(self.items),
+            'items': self.items[offset:offset + limit],
+            'next': 'next' if offset + limit < len(self.items) else None
+        }
+
+    def iter_saved_tracks(self, limit=None, offset=0):
+        self.iterated_from.append(offset)
+        end = len(self.items) if self.fail_after is None else self.fail_after
+        yield from self.items[offset:end]
+
+
+@pytest.fixture
+def sync(tmp_path, monkeypatch):
+    monkeypatch.setattr(library_sync, 'LIBRARY_MIN_REFRESH_SECONDS', 0)
+    monkeypatch.setattr(library_sync, 'LIBRARY_FULL_SYNC_WAIT', 5)
+    return LibrarySync(str(tmp_path))
+
+
+def full_sync(sync, client, user_id='user', force=False):
+    sync.sync_saved_tracks(client, user_id, force)
+    running = sync._full_syncs.get(user_id)
+    if running is not None:
+        assert running.done.wait(5)
+
+
+def test_first_sync_stores_whole_library(sync):
+    client = FakeClient([saved_track(i) for i in range(120)])
+
+    items, complete = sync.sync_saved_tracks(client, 'user')
+
+    assert complete
+    assert [item['uri'] for item in items] == [f'spotify:track:t{i}' for i in range(120)]
+    library = sync.load('user')
+    assert library['total'] == 120
+    assert library['watermark'] == client.items[0]['added_at']
+    assert library['items'] == items
+    assert client.page_offsets == [0]
+    assert client.iterated_from == [50]
+
+
+def test_incremental_sync_stops_at_watermark(sync):
+    client = FakeClient([saved_track(i) for i in range(120)])
+    full_sync(sync, client)
+    client.page_offsets.clear()
+    client.iterated_from.clear()
+
+    new_items = [saved_track(200 + i, f'2024-02-01T00:00:0{3 - i}Z') for i in range(3)]
+    client.items = new_items + client.items
+    items, complete = sync.sync_saved_tracks(client, 'user')
+
+    assert complete
+    # The first page already reaches the watermark, nothing else is fetched
+    assert client.page_offsets == [0]
+    assert client.iterated_from == []
+    assert [item['uri'] for item in items[:4]] == [
+        'spotify:track:t200', 'spotify:track:t201', 'spotify:track:t202', 'spotify:track:t0'
+    ]
+    library = sync.load('user')
+    assert library['total'] == 123
+    assert library['watermark'] == '2024-02-01T00:00:03Z'
+
+
+def test_failed_full_sync_keeps_stored_library(sync):
+    client = FakeClient([saved_track(i) for i in range(120)])
+    full_sync(sync, client)
+    stored = sync.load('user')
+
+    failing = FakeClient([saved_track(i) for i in range(150)], fail_after=100)
+    full_sync(sync, failing, force=True)
+
+    assert sync.load('user') == stored
+    assert sync.current_tracks('user') == (stored['items'], True)
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+from ai_tools import SpotifyFunctionHandler
+from llm_client import LLMClient
+
+READ = 'search_item'
+WRITE = 'create_playlist'
+
+
+class RecordingHandler(SpotifyFunctionHandler):
+    """Runs no tools, records when each call starts and ends"""
+
+    def __init__(self, *args, delays=None):
+        self.delays = delays or {}
+        self.events = []
+        self.runs = Counter()
+        self._events_lock = threading.Lock()
+
+    def record(self, event: str, call_id: str) -> None:
+        with self._events_lock:
+            self.events.append((event, call_id))
+
+    def execute_function(self, tool_call) -> dict:
+        self.record('start', tool_call.id)
+        with self._events_lock:
+            self.runs[tool_call.id] += 1
+        time.sleep(self.delays.get(tool_call.id, 0.05))
+        self.record('end', tool_call.id)
+        return {'call': tool_call.id, 'arguments': json.loads(tool_call.function.arguments)}
+
+    def position(self, event: str, call_id: str) -> int:
+        return self.events.index((event, call_id))
+
+
+def tool_call(call_id: str, name: str, arguments: dict):
+    return LLMClient._format_tool_call({
+        'id': call_id, 'function': {'name': name, 'arguments': json.dumps(arguments)}
+    })
+
+
+def stream_chunk(index=None, call_id=None, name=None, arguments=None, content=None):
+    tool_calls = None if content else [SimpleNamespace(
+        index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments)
+    )]
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def tool_call_stream(calls, handler):
+    """Stream each call's arguments in two parts, the way the model emits them"""
+    for index, (call_id, name, arguments) in enumerate(calls):
+        text = json.dumps(arguments)
+        yield stream_chunk(index, call_id, name, '')
+        yield stream_chunk(index, None, None, text[:len(text) // 2])
+        time.sleep(0.02)
+        yield stream_chunk(index, None, None, text[len(text) // 2:])
+    handler.record('stream', 'end')
+
+
+@pytest.fixture
+def client():
+    client = LLMClient.__new__(LLMClient)
+    client.model = 'gpt-4o'
+    client.chat_history = {}
+    return client
+
+
+def run_query(client, monkeypatch, calls, handler):
+    """Run one query whose first round streams `calls`, returns the messages of the second round"""
+    monkeypatch.setattr(llm_client, 'SpotifyFunctionHandler', lambda *args: handler)
+    rounds = [tool_call_stream(calls, handler), iter([stream_chunk(content='Done')])]
+    requests = []
+
+    def openai_call(messages):
+        requests.append(list(messages))
+        return rounds.pop(0)
+
+    client._initial_openai_call = openai_call
+    assert b''.join(client.process_query('query', {}, 'token', 'session-id')) == b'Done'
+    return requests[1]
+
+
+def test_reads_start_while_streaming(client, monkeypatch):
+    handler = RecordingHandler()
+    calls = [('r1', READ, {'query': 'a', 'search_type': 'track'}),
+             ('r2', READ, {'query': 'b', 'search_type': 'track'})]
+    run_query(client, monkeypatch, calls, handler)
+
+    assert handler.position('start', 'r1') < handler.position('stream', 'end')
+    assert handler.position('start', 'r2') < handler.position('stream', 'end')
+
+
+def test_read_streamed_after_write_is_not_started_early(client, monkeypatch):
+    handler = RecordingHandler()
+    calls = [('r1', READ, {'query': 'a', 'search_type': 'track'}),
+             ('w1', WRITE, {'name': 'Mix'}),
+             ('r2', READ, {'query': 'b', 'search_type': 'track'})]
+    run_query(client, monkeypatch, calls, handler)
+
+    assert handler.position('start', 'r1') < handler.position('stream', 'end')
+    assert handler.position('start', 'w1') > handler.position('end', 'r1')
+    assert handler.position('start', 'r2') > handler.position('end', 'w1')
+
+
+def test_start_ready_tool_calls_stops_at_write(client):
+    handler = RecordingHandler()
+    tool_calls = [
+        {'id': 'r1', 'function': {'name': READ, 'arguments': '{"query": "a", "search_type": "track"}'}},
+        {'id': 'w1', 'function': {'name': WRITE, 'arguments': '{"name": "Mix"}'}},
+        {'id': 'r2', 'function': {'name': READ, 'arguments': '{"query": "b", "search_type": "track"}'}},
+    ]
+    started = {}
+    client._start_ready_tool_calls(tool_calls, started, handler)
+
+    assert list(started) == [0]
+    started[0].result()
+    assert handler.runs == {'r1': 1}
+
+
+def test_start_ready_tool_calls_waits_for_complete_arguments(client):
+    handler = RecordingHandler()
+    tool_calls = [{'id': 'r1', 'function': {'name': READ, 'arguments': '{"query": "a", "search_'}}]
+    started = {}
+    client._start_ready_tool_calls(tool_calls, started, handler)
+    assert started == {}
+
+    tool_calls[0]['function']['arguments'] += 'type": "track"}'
+    client._start_ready_tool_calls(tool_calls, started, handler)
+    assert list(started) == [0]
+    started[0].result()
+
+
+def test_results_come_back_in_tool_calls_order():
+    # Earlier calls finish last
+    handler = RecordingHandler(delays={'r1': 0.2, 'r2': 0.1, 'r3': 0.0, 'r4': 0.1, 'r5': 0.0})
+    tool_calls = [tool_call('r1', READ, {'query': 'a', 'search_type': 'track'}),
+                  tool_call('r2', READ, {'query': 'b', 'search_type': 'track'}),
+                  tool_call('r3', READ, {'query': 'c', 'search_type': 'track'}),
+                  tool_call('w1', WRITE, {'name': 'Mix'}),
+                  tool_call('r4', READ, {'query': 'd', 'search_type': 'track'}),
+                  tool_call('r5', READ, {'query': 'e', 'search_type': 'track'})]
+    results = handler.execute_functions(tool_calls)
+
+    assert [result['call'] for result in results] == ['r1', 'r2', 'r3', 'w1', 'r4', 'r5']
+    assert handler.position('start', 'w1') > max(handler.position('end', call_id) for call_id in ('r1', 'r2', 'r3'))
+
+
+def test_streamed_results_come_back_in_tool_calls_order(client, monkeypatch):
+    handler = RecordingHandler(delays={'r1': 0.2, 'r2': 0.0})
+    calls = [('r1', READ, {'query': 'a', 'search_type': 'track'}),
+             ('r2', READ, {'query': 'b', 'search_type': 'track'})]
+    messages = run_query(client, monkeypatch, calls, handler)
+
+    tool_messages = [message for message in messages if message['role'] == 'tool']
+    assert [message['tool_call_id'] for message in tool_messages] == ['r1', 'r2']
+    assert [json.loads(message['content'])['call'] for message in tool_messages] == ['r1', 'r2']
+
+
+def test_started_read_is_not_run_again():
+    handler = RecordingHandler()
+    tool_calls = [tool_call('r1', READ, {'query': 'a', 'search_type': 'track'}),
+                  tool_call('r2', READ, {'query': 'b', 'search_type': 'track'})]
+    started = {0: handler.submit(tool_calls[0])}
+    results = handler.execute_functions(tool_calls, started)
+
+    assert [result['call'] for result in results] == ['r1', 'r2']
+    assert handler.runs == {'r1': 1, 'r2': 1}
+
+
+def test_streamed_calls_each_run_once(client, monkeypatch):
+    handler = RecordingHandler()
+    calls = [('r1', READ, {'query': 'a', 'search_type': 'track'}),
+             ('r2', READ, {'query': 'b', 'search_type': 'track'}),
+             ('w1', WRITE, {'name': 'Mix'}),
+             ('r3', READ, {'query': 'c', 'search_type': 'track'})]
+    run_query(client, monkeypatch, calls, handler)
+
+    assert handler.runs == {'r1': 1, 'r2': 1, 'w1': 1, 'r3': 1}
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from tool_encoding import MORE_RESULTS_TOOL, ToolResultEncoder
+
+BUDGET = 300
+
+
+@pytest.fixture
+def encoder():
+    encoder = ToolResultEncoder(budgets={}, default_budget=BUDGET)
+    # Count with the byte estimate so the tests do not depend on the tokenizer download
+    encoder._encoding_loaded = True
+    return encoder
+
+
+def tracks(count: int) -> list:
+    return [{'name': f'Track {i}', 'uri': f'spotify:track:{i:022d}'} for i in range(count)]
+
+
+def shown_rows(text: str) -> list:
+    table = json.loads(text)
+    return [row[table['columns'].index('uri')] for row in table['rows']]
+
+
+def test_result_within_budget_has_no_pointer(encoder):
+    data = json.loads(encoder.encode('search_item', {}, tracks(3)))
+    assert 'truncated' not in data
+    assert data == {'columns': ['name', 'uri'], 'rows': [[f'Track {i}', f'spotify:track:{i:022d}'] for i in range(3)]}
+
+
+def test_truncated_result_points_at_the_rest(encoder):
+    result = tracks(100)
+    text = encoder.encode('search_item', {'query': 'a'}, result)
+    pointer = json.loads(text)['truncated']
+    shown = len(shown_rows(text))
+
+    assert encoder.count_tokens(text) <= BUDGET
+    assert 0 < shown < 100
+    assert pointer['shown'] == f'0-{shown - 1}'
+    assert pointer['total'] == 100
+    assert pointer['more'] == {
+        'tool': MORE_RESULTS_TOOL,
+        'arguments': {'tool_name': 'search_item', 'arguments': {'query': 'a'}, 'offset': shown}
+    }
+
+
+def test_get_more_results_pages_through_every_row_once(encoder):
+    result = tracks(100)
+    text = encoder.encode('search_item', {'query': 'a'}, result)
+    uris = shown_rows(text)
+    pointer = json.loads(text)['truncated']
+    pages = 1
+
+    while 'more' in pointer:
+        more = pointer['more']
+        text = encoder.encode(more['tool'], more['arguments'], result)
+        page = shown_rows(text)
+        pointer = json.loads(text)['truncated']
+
+        start = more['arguments']['offset']
+        assert encoder.count_tokens(text) <= BUDGET
+        assert pointer['shown'] == f'{start}-{start + len(page) - 1}'
+        assert pointer['total'] == 100
+        uris.extend(page)
+        pages += 1
+
+    assert pages > 2
+    assert uris == [track['uri'] for track in result]
+
+
+def test_paged_tool_pointer_asks_for_its_next_offset(encoder):
+    text = encoder.encode('get_saved_tracks', {'limit': 100, 'offset': 40}, tracks(100))
+    pointer = json.loads(text)['truncated']
+    shown = len(shown_rows(text))
+
+    assert 'total' not in pointer
+    assert pointer['more'] == {'tool': 'get_saved_tracks', 'arguments': {'limit': 100, 'offset': 40 + shown}}
@@ -0,0 +1,150 @@
+import os
+import pickle
+import threading
+import time
+
+import pytest
+
+from spotify_records import Artist, Track
+from user_cache import MemoryBackend, RedisBackend, SQLiteBackend, UserCache
+
+BUDGET = 2000
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend(BUDGET)
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'user_cache.db'), BUDGET)
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisBackend(max_bytes=BUDGET, client=fakeredis.FakeRedis())
+
+
+@pytest.fixture
+def cache(backend):
+    return UserCache(backend, default_timeout=60)
+
+
+def test_set_get_delete(cache):
+    assert cache.get('u1', 'profile') is None
+    assert cache.set('u1', 'profile', {'name': 'A', 'tracks': [1, 2]})
+    assert cache.get('u1', 'profile') == {'name': 'A', 'tracks': [1, 2]}
+    # Keys are per user
+    assert cache.get('u2', 'profile') is None
+    assert cache.delete('u1', 'profile')
+    assert cache.get('u1', 'profile') is None
+    assert not cache.delete('u1', 'profile')
+
+
+def test_ttl_expiry(cache):
+    cache.set('u1', 'short', 'value', timeout=0.1)
+    cache.set('u1', 'long', 'value')
+    assert cache.get('u1', 'short') == 'value'
+    time.sleep(0.2)
+    assert cache.get('u1', 'short') is None
+    assert cache.get('u1', 'long') == 'value'
+
+
+def test_add_only_stores_missing_keys(cache):
+    assert cache.add('u1', 'lock', 'first')
+    assert not cache.add('u1', 'lock', 'second')
+    assert cache.get('u1', 'lock') == 'first'
+    cache.delete('u1', 'lock')
+    assert cache.add('u1', 'lock', 'third')
+    assert cache.get('u1', 'lock') == 'third'
+
+
+def test_add_replaces_expired_key(cache):
+    assert cache.add('u1', 'lock', 'first', timeout=0.1)
+    time.sleep(0.2)
+    assert cache.add('u1', 'lock', 'second')
+    assert cache.get('u1', 'lock') == 'second'
+
+
+def test_add_has_one_winner_across_threads(cache):
+    start = threading.Barrier(16)
+    wins = []
+
+    def contend(n):
+        start.wait()
+        if cache.add('u1', 'refresh-lock', n):
+            wins.append(n)
+
+    threads = [threading.Thread(target=contend, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(wins) == 1
+    assert cache.get('u1', 'refresh-lock') == wins[0]
+
+
+# Redis evicts by the server's own maxmemory policy
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'], indirect=True)
+def test_byte_budget_evicts_least_recently_used(cache):
+    value = 'x' * 500
+    for key in ('a', 'b', 'c'):
+        cache.set('u1', key, value)
+        time.sleep(0.01)
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('u1', 'a') == value
+    time.sleep(0.01)
+    cache.set('u1', 'd', value)
+
+    assert cache.get('u1', 'b') is None
+    for key in ('a', 'c', 'd'):
+        assert cache.get('u1', key) == value
+    assert cache.backend.get_stats()['bytes'] <= BUDGET
+
+
+class Payload:
+    def __reduce__(self):
+        return os.getpid, ()
+
+
+def test_records_round_trip(cache):
+    track = Track(name='Song', artists=['A', 'B'], uri='spotify:track:t1')
+    value = {'tracks': [track], 'artists': (Artist(name='A'),), 'genres': {'pop'}}
+    assert cache.set('u1', 'bundle', value)
+    assert cache.get('u1', 'bundle') == value
+
+
+def test_values_with_other_globals_are_not_loaded(cache):
+    cache.backend.set(cache._key('u1', 'tampered'), pickle.dumps(Payload()), 60)
+    assert cache.get('u1', 'tampered') is None
+    assert cache.get_stats()['unresolved'] == 1
+
+
+def test_value_over_budget_is_not_stored(backend):
+    cache = UserCache(backend)
+    assert not cache.set('u1', 'huge', 'x' * (BUDGET * 2))
+    assert cache.get('u1', 'huge') is None
+    assert not cache.add('u1', 'huge', 'x' * (BUDGET * 2))
+    assert cache.get('u1', 'huge') is None
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'], indirect=True)
+def test_add_evicts_to_stay_within_budget(cache):
+    value = 'x' * 500
+    for key in ('a', 'b', 'c'):
+        assert cache.add('u1', key, value)
+        time.sleep(0.01)
+    assert cache.add('u1', 'd', value)
+
+    assert cache.get('u1', 'a') is None
+    for key in ('b', 'c', 'd'):
+        assert cache.get('u1', key) == value
+    assert cache.backend.get_stats()['bytes'] <= BUDGET
+
+
+def test_redis_backend_leaves_server_config_alone_by_default():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    configured = []
+    client.config_set = lambda name, value: configured.append((name, value))
+
+    RedisBackend(client=client).set('k', b'v', 0)
+    assert configured == []
+    RedisBackend(max_bytes=BUDGET, client=client, configure=True)
+    assert configured == [('maxmemory', BUDGET), ('maxmemory-policy', 'allkeys-lru')]
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Seconds a read-only tool result is reused within a chat session
+DEFAULT_TOOL_TTLS = {
+    'get_user_profile': 600,
+    'get_top_items': 600,
+    'get_taste_analytics': 600,
+    'get_followed_artists': 300,
+    'get_user_playlists': 300,
+    'get_saved_podcasts': 300,
+    'get_saved_audiobooks': 300,
+    'get_saved_tracks': 120,
+    'get_playlist_items': 120,
+    'get_recently_played_tracks': 60,
+    'search_item': 900,
+}
+# Overrides as "tool:seconds,tool:seconds", 0 disables caching for a tool
+TOOL_CACHE_TTLS = os.getenv('TOOL_CACHE_TTLS', '')
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', '256'))
+TOOL_CACHE_MAX_SESSIONS = int(os.getenv('TOOL_CACHE_MAX_SESSIONS', '1000'))
+
+# Write tool -> (read tool, argument both must share or None for every entry of the read tool)
+WRITE_INVALIDATIONS = {
+    'create_playlist': (('get_user_playlists', None),),
+    'add_songs_to_playlist': (('get_user_playlists', None), ('get_playlist_items', 'playlist_id')),
+    'remove_playlist_items': (('get_user_playlists', None), ('get_playlist_items', 'playlist_id')),
+    'update_playlist_details': (('get_user_playlists', None), ('get_playlist_items', 'playlist_id')),
+}
+
+
+def _parse_ttls(spec: str) -> Dict[str, int]:
+    ttls = {}
+    for entry in spec.split(','):
+        name, _, seconds = entry.strip().partition(':')
+        if not name:
+            continue
+        try:
+            ttls[name] = int(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring tool cache TTL with invalid value: {entry}")
+    return ttls
+
+
+class ToolResultCache:
+    """
+    Results of read-only tool calls within one chat session, keyed by tool name and
+    canonicalized arguments. Write tools drop the entries they can change, writes
+    without a known mapping drop everything. Results are shared and must not be mutated.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.ttls = ttls if ttls is not None else DEFAULT_TOOL_TTLS
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[Dict, Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stored': 0, 'invalidated': 0}
+
+    @staticmethod
+    def _key(name: str, args: Dict) -> Tuple[str, str]:
+        return name, json.dumps(args, sort_keys=True, separators=(',', ':'))
+
+    def cacheable(self, name: str) -> bool:
+        return self.ttls.get(name, 0) > 0
+
+    def get(self, name: str, args: Dict) -> Any:
+        """The cached result, or None when missing or expired"""
+        key = self._key(name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > time.time():
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, name: str, args: Dict, result: Any) -> None:
+        # Partial results (a library still being loaded) are fetched again next time
+        if result is None or not self.cacheable(name) or (isinstance(result, dict) and result.get('partial')):
+            return
+        with self._lock:
+            self._entries[self._key(name, args)] = (args, result, time.time() + self.ttls[name])
+            self._stats['stored'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_for_write(self, name: str, args: Dict) -> None:
+        """Drop the entries a call to write tool `name` with `args` may have changed"""
+        rules = WRITE_INVALIDATIONS.get(name)
+        with self._lock:
+            if rules is None:
+                dropped = list(self._entries)
+            else:
+                dropped = [
+                    key for key, (cached_args, _, _) in self._entries.items()
+                    for read_tool, argument in rules
+                    if key[0] == read_tool and (argument is None or cached_args.get(argument) == args.get(argument))
+                ]
+            for key in dropped:
+                self._entries.pop(key, None)
+            self._stats['invalidated'] += len(dropped)
+        if dropped:
+            logger.debug(f"{name} invalidated {len(dropped)} cached tool results")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
+
+
+class SessionToolCaches:
+    """ToolResultCache per chat session, least recently used sessions are dropped"""
+
+    def __init__(self, max_sessions: int = TOOL_CACHE_MAX_SESSIONS, ttls: Optional[Dict[str, int]] = None):
+        self.max_sessions = max_sessions
+        self.ttls = ttls if ttls is not None else {**DEFAULT_TOOL_TTLS, **_parse_ttls(TOOL_CACHE_TTLS)}
+        self._sessions: 'OrderedDict[str, ToolResultCache]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Totals of dropped sessions, so hit rates cover the whole process lifetime
+        self._retired = {'hits': 0, 'misses': 0, 'stored': 0, 'invalidated': 0}
+
+    def for_session(self, session_id: str) -> ToolResultCache:
+        with self._lock:
+            cache = self._sessions.get(session_id)
+            if cache is None:
+                cache = self._sessions[session_id] = ToolResultCache(self.ttls)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                _, retired = self._sessions.popitem(last=False)
+                for name, value in retired.get_stats().items():
+                    if name in self._retired:
+                        self._retired[name] += value
+            return cache
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            totals = dict(self._retired)
+        entries = 0
+        for cache in sessions:
+            stats = cache.get_stats()
+            entries += stats['entries']
+            for name in totals:
+                totals[name] += stats[name]
+        lookups = totals['hits'] + totals['misses']
+        return {
+            **totals,
+            'sessions': len(sessions),
+            'entries': entries,
+            'hit_rate': round(totals['hits'] / lookups, 3) if lookups else 0.0
+        }
+
+
+session_tool_caches = SessionToolCaches()
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import tiktoken
+
+from spotify_records import to_jsonable
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# Encoding for models tiktoken does not know yet
+FALLBACK_ENCODING = 'o200k_base'
+# Longest string sent to the model before it is cut, identifiers are never cut
+TOOL_TEXT_LIMIT = int(os.getenv('TOOL_TEXT_LIMIT', '160'))
+DEFAULT_TOOL_TOKEN_BUDGET = int(os.getenv('TOOL_TOKEN_BUDGET', '2000'))
+DEFAULT_TOOL_TOKEN_BUDGETS = {
+    'get_user_profile': 300,
+    'get_saved_podcasts': 1200,
+    'get_saved_audiobooks': 1200,
+    'get_user_playlists': 1500,
+    'get_followed_artists': 1500,
+    'search_item': 1500,
+    'get_top_items': 2000,
+    'get_recently_played_tracks': 2500,
+    'get_saved_tracks': 2500,
+    'get_playlist_items': 3000,
+}
+# Overrides as "tool:tokens,tool:tokens"
+TOOL_TOKEN_BUDGETS = os.getenv('TOOL_TOKEN_BUDGETS', '')
+
+# Tool that pages through the rows of a result the budget cut short
+MORE_RESULTS_TOOL = 'get_more_results'
+# Tools with their own offset argument, their pointer asks for the next page directly
+PAGED_TOOLS = frozenset({'get_saved_tracks', 'get_playlist_items'})
+_IDENTIFIER_FIELDS = frozenset({'id', 'uri', 'snapshot_id', 'playlist_id', 'url', 'href'})
+_ELLIPSIS = '…'
+
+
+def _parse_budgets(spec: str) -> Dict[str, int]:
+    budgets = {}
+    for entry in spec.split(','):
+        name, _, tokens = entry.strip().partition(':')
+        if not name:
+            continue
+        try:
+            budgets[name] = int(tokens)
+        except ValueError:
+            logger.warning(f"Ignoring tool token budget with invalid value: {entry}")
+    return budgets
+
+
+class ToolResultEncoder:
+    """
+    Serializes tool results for the model within a token budget per tool.
+    Lists of objects become {"columns": [...], "rows": [[...]]} tables so key names are sent once,
+    None fields are dropped and long text is cut. When the largest list does not fit the budget,
+    the rows that fit are sent with a "truncated" pointer naming the call that returns the rest.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, default_budget: int = DEFAULT_TOOL_TOKEN_BUDGET,
+                 text_limit: int = TOOL_TEXT_LIMIT, model: str = 'gpt-4o'):
+        self.budgets = budgets if budgets is not None else {**DEFAULT_TOOL_TOKEN_BUDGETS, **_parse_budgets(TOOL_TOKEN_BUDGETS)}
+        self.default_budget = default_budget
+        self.text_limit = text_limit
+        self.model = model
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _get_encoding(self):
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    logger.warning(f"No tokenizer known for {self.model}, counting with {FALLBACK_ENCODING}")
+                    self._encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+            except Exception as e:
+                # The vocabulary is downloaded on first use, estimate when that is not possible
+                logger.warning(f"Could not load the {self.model} tokenizer, estimating token counts: {str(e)}")
+        return self._encoding
+
+    @property
+    def exact(self) -> bool:
+        """Whether token counts come from the model's tokenizer rather than an estimate"""
+        return self._get_encoding() is not None
+
+    def count_tokens(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        # Roughly four bytes per token for JSON-heavy text
+        return (len(text.encode('utf-8')) + 3) // 4
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+    def _compact(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, dict):
+            return {k: self._compact(v, k) for k, v in value.items() if v is not None and v != ''}
+        if isinstance(value, list):
+            if len(value) > 1 and all(isinstance(item, dict) for item in value):
+                return self._table(value)
+            return [self._compact(item, key) for item in value]
+        if isinstance(value, str) and len(value) > self.text_limit and key not in _IDENTIFIER_FIELDS:
+            return value[:self.text_limit].rstrip() + _ELLIPSIS
+        return value
+
+    def _table(self, items: List[Dict]) -> Any:
+        columns = list(dict.fromkeys(k for item in items for k, v in item.items() if v is not None and v != ''))
+        if len(columns) == 1:
+            # [{"name": "A"}, {"name": "B"}] -> ["A", "B"], the enclosing key names the field
+            return [self._compact(item.get(columns[0]), columns[0]) for item in items]
+        return {
+            'columns': columns,
+            'rows': [[self._compact(item.get(column), column) for column in columns] for item in items]
+        }
+
+    @staticmethod
+    def _largest_list(value: Any, path: Tuple = ()) -> Tuple[Optional[Tuple], List]:
+        """Path and contents of the longest list of objects, searched through nested dicts"""
+        best_path, best = None, []
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            best_path, best = path, value
+        elif isinstance(value, dict):
+            for key, child in value.items():
+                child_path, child_list = ToolResultEncoder._largest_list(child, path + (key,))
+                if len(child_list) > len(best):
+                    best_path, best = child_path, child_list
+        return best_path, best
+
+    @staticmethod
+    def _replace(value: Any, path: Tuple, rows: List) -> Any:
+        if not path:
+            return rows
+        return {**value, path[0]: ToolResultEncoder._replace(value[path[0]], path[1:], rows)}
+
+    @staticmethod
+    def _pointer(name: str, args: Dict, start: int, shown: int, total: Optional[int], more: bool = True) -> Dict:
+        pointer = {'shown': f'{start}-{start + shown - 1}'}
+        if total is not None:
+            pointer['total'] = total
+        if more and name in PAGED_TOOLS:
+            pointer['more'] = {'tool': name, 'arguments': {**args, 'offset': args.get('offset', 0) + start + shown}}
+        elif more:
+            pointer['more'] = {
+                'tool': MORE_RESULTS_TOOL,
+                'arguments': {'tool_name': name, 'arguments': args, 'offset': start + shown}
+            }
+        return pointer
+
+    def _render(self, data: Any, path: Optional[Tuple], rows: List, pointer: Optional[Dict]) -> str:
+        compact = self._compact(self._replace(data, path, rows) if path is not None else data)
+        if pointer is not None:
+            if not isinstance(compact, dict):
+                compact = {'items': compact}
+            compact['truncated'] = pointer
+        return self._dumps(compact)
+
+    def encode(self, name: str, args: Dict, result: Any) -> str:
+        """Serialize the result of tool `name` called with `args`"""
+        start = 0
+        if name == MORE_RESULTS_TOOL:
+            name, args, start = args['tool_name'], args.get('arguments') or {}, args.get('offset', 0)
+
+        data = to_jsonable(result)
+        budget = self.budgets.get(name, self.default_budget)
+        path, rows = self._largest_list(data)
+        # Pages of natively paged tools count from their own offset, their total is unknown
+        total = None if name in PAGED_TOOLS else len(rows)
+        remaining = rows[start:]
+
+        # Later pages say which rows they hold
+        last_page = self._pointer(name, args, start, len(remaining), total, more=False) if start and remaining else None
+        text = self._render(data, path, remaining, last_page)
+        if len(remaining) < 2 or self.count_tokens(text) <= budget:
+            return text
+
+        # Largest number of rows that fits, the pointer included, at least one so paging moves on
+        low, high = 1, len(remaining) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = self._render(data, path, remaining[:middle], self._pointer(name, args, start, middle, total))
+            if self.count_tokens(candidate) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+
+        logger.info(f"{name} result cut to {low} of {len(remaining)} rows for a {budget} token budget")
+        return self._render(data, path, remaining[:low], self._pointer(name, args, start, low, total))
+
+
+_encoders: Dict[str, ToolResultEncoder] = {}
+_encoders_lock = threading.Lock()
+
+
+def encoder_for_model(model: str) -> ToolResultEncoder:
+    """The shared encoder counting tokens with the tokenizer of `model`"""
+    with _encoders_lock:
+        encoder = _encoders.get(model)
+        if encoder is None:
+            encoder = _encoders[model] = ToolResultEncoder(model=model)
+        return encoder
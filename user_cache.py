@@ -0,0 +1,424 @@
+import io
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+from catalog_cache import CatalogCache, RecordUnpickler, catalog_cache, loads_records
+from spotify_records import Record
+
+from logger_config import setup_logger
+logger = setup_logger(__name__)
+
+# memory, sqlite or redis. Values are pickled, a shared SQLite file or Redis server must only be
+# writable by this app's workers. Unpickling only resolves record classes, not arbitrary globals.
+USER_CACHE_BACKEND = os.getenv('USER_CACHE_BACKEND', 'memory')
+USER_CACHE_MAX_BYTES = int(os.getenv('USER_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+USER_CACHE_DEFAULT_TIMEOUT = int(os.getenv('USER_CACHE_DEFAULT_TIMEOUT', '3600'))
+USER_CACHE_SQLITE_PATH = os.getenv('USER_CACHE_SQLITE_PATH', 'user_cache.db')
+USER_CACHE_REDIS_URL = os.getenv('USER_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+# Set maxmemory to USER_CACHE_MAX_BYTES and maxmemory-policy to allkeys-lru on the Redis server.
+# Off by default: the settings apply to the whole server, only enable it for a server dedicated to this cache.
+USER_CACHE_REDIS_CONFIGURE = os.getenv('USER_CACHE_REDIS_CONFIGURE', 'false').lower() == 'true'
+# Store catalog records as references into the shared catalog: on, off or auto
+# (auto: with the memory backend, or when the catalog is persisted for other workers to resolve)
+USER_CACHE_CATALOG_REFS = os.getenv('USER_CACHE_CATALOG_REFS', 'auto')
+
+
+def _fits(key: str, value: bytes, max_bytes: int) -> bool:
+    """Whether a single value fits in the byte budget at all"""
+    if len(value) > max_bytes:
+        logger.warning(f"Not caching {key}: {len(value)} bytes is over the cache budget")
+        return False
+    return True
+
+
+class MemoryBackend:
+    """
+    In-process LRU store of serialized values, evicting least recently used entries
+    once the stored bytes exceed max_bytes
+    """
+
+    def __init__(self, max_bytes: int = USER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[bytes, float]]' = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _expired(self, key: str, now: float) -> bool:
+        value, expires_at = self._entries[key]
+        if expires_at and expires_at <= now:
+            self._bytes -= len(value)
+            del self._entries[key]
+            return True
+        return False
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries or self._expired(key, time.time()):
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def _insert(self, key: str, value: bytes, timeout: int, now: float) -> None:
+        """Caller must hold the lock"""
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[0])
+        self._entries[key] = (value, now + timeout if timeout else 0)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._evictions += 1
+
+    def set(self, key: str, value: bytes, timeout: int) -> bool:
+        if not _fits(key, value, self.max_bytes):
+            return False
+        with self._lock:
+            self._insert(key, value, timeout, time.time())
+        return True
+
+    def add(self, key: str, value: bytes, timeout: int) -> bool:
+        if not _fits(key, value, self.max_bytes):
+            return False
+        # Check and insert under one lock, add() is used as a lock between threads
+        with self._lock:
+            now = time.time()
+            if key in self._entries and not self._expired(key, now):
+                return False
+            self._insert(key, value, timeout, now)
+        return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= len(entry[0])
+            return entry is not None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions
+            }
+
+
+class SQLiteBackend:
+    """
+    On-disk LRU store that every worker on the host can share
+    """
+
+    def __init__(self, path: str = USER_CACHE_SQLITE_PATH, max_bytes: int = USER_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._evictions = 0
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB,
+                size INTEGER,
+                expires_at REAL,
+                last_access REAL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (last_access)')
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND (expires_at = 0 OR expires_at > ?)',
+            (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE cache_entries SET last_access = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes, timeout: int) -> bool:
+        if not _fits(key, value, self.max_bytes):
+            return False
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now + timeout if timeout else 0, now)
+            )
+            self._evict(conn, now)
+        return True
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute('DELETE FROM cache_entries WHERE expires_at != 0 AND expires_at <= ?', (now,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute('SELECT key, size FROM cache_entries ORDER BY last_access LIMIT 1').fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (row[0],))
+            total -= row[1]
+            self._evictions += 1
+
+    def add(self, key: str, value: bytes, timeout: int) -> bool:
+        if not _fits(key, value, self.max_bytes):
+            return False
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ? AND expires_at != 0 AND expires_at <= ?', (key, now))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO cache_entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now + timeout if timeout else 0, now)
+            )
+            added = cursor.rowcount == 1
+            if added:
+                self._evict(conn, now)
+        return added
+
+    def delete(self, key: str) -> bool:
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def get_stats(self) -> Dict:
+        entries, size = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        return {
+            'backend': 'sqlite',
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'evictions': self._evictions
+        }
+
+
+class RedisBackend:
+    """
+    Store shared by every worker through a Redis server. The byte budget and LRU
+    eviction are the server's (maxmemory with allkeys-lru). They are only changed on connect
+    with configure=True (USER_CACHE_REDIS_CONFIGURE) because they apply to the whole server.
+    """
+
+    def __init__(self, url: str = USER_CACHE_REDIS_URL, max_bytes: int = USER_CACHE_MAX_BYTES,
+                 configure: bool = USER_CACHE_REDIS_CONFIGURE, client: Optional[redis.Redis] = None):
+        self.max_bytes = max_bytes
+        self.client = client if client is not None else redis.Redis.from_url(url, socket_timeout=5)
+        if configure:
+            self.configure_server()
+
+    def configure_server(self) -> None:
+        """Apply max_bytes as the server's memory budget with LRU eviction"""
+        try:
+            self.client.config_set('maxmemory', self.max_bytes)
+            self.client.config_set('maxmemory-policy', 'allkeys-lru')
+        except redis.RedisError as e:
+            logger.warning(f"Could not configure cache server memory budget, relying on its own settings: {e}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, timeout: int) -> bool:
+        if not _fits(key, value, self.max_bytes):
+            return False
+        return bool(self.client.set(key, value, px=int(timeout * 1000) if timeout else None))
+
+    def add(self, key: str, value: bytes, timeout: int) -> bool:
+        if not _fits(key, value, self.max_bytes):
+            return False
+        return bool(self.client.set(key, value, nx=True, px=int(timeout * 1000) if timeout else None))
+
+    def delete(self, key: str) -> bool:
+        return self.client.delete(key) == 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': 'redis',
+            'max_bytes': self.max_bytes,
+            'bytes': self.client.info('memory').get('used_memory'),
+            'entries': self.client.dbsize()
+        }
+
+
+class UserCacheNamespace:
+    """
+    One user's view of the cache, with the get/set/add/delete interface of Flask-Caching
+    """
+
+    def __init__(self, user_cache: 'UserCache', user_id: str):
+        self.user_cache = user_cache
+        self.user_id = user_id
+        self.prefix = f'user:{user_id}:'
+
+    def get(self, key: str) -> Any:
+        return self.user_cache.get(self.user_id, key)
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        return self.user_cache.set(self.user_id, key, value, timeout)
+
+    def add(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        return self.user_cache.add(self.user_id, key, value, timeout)
+
+    def delete(self, key: str) -> bool:
+        return self.user_cache.delete(self.user_id, key)
+
+
+class _CatalogPickler(pickle.Pickler):
+    """Pickles track, album and artist records as their catalog key"""
+
+    def __init__(self, file, catalog: CatalogCache):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.catalog = catalog
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        return self.catalog.reference(obj) if isinstance(obj, Record) else None
+
+
+class _CatalogUnpickler(RecordUnpickler):
+    def __init__(self, file, catalog: CatalogCache):
+        super().__init__(file)
+        self.catalog = catalog
+
+    def persistent_load(self, key: str) -> Record:
+        try:
+            return self.catalog.resolve(key)
+        except KeyError:
+            raise pickle.UnpicklingError(f"{key} is no longer in the catalog") from None
+
+
+class UserCache:
+    """
+    Cache keyed by Spotify user ID. Values are pickled so the backend can account for
+    the size of every entry and enforce its byte budget. With a catalog, track, album and
+    artist metadata is stored once in the catalog and entries only hold references to it.
+    """
+
+    def __init__(self, backend, default_timeout: int = USER_CACHE_DEFAULT_TIMEOUT,
+                 catalog: Optional[CatalogCache] = None):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.catalog = catalog
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'bytes_written': 0, 'unresolved': 0}
+
+    def _dumps(self, value: Any) -> bytes:
+        if self.catalog is None:
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        buffer = io.BytesIO()
+        _CatalogPickler(buffer, self.catalog).dump(value)
+        return buffer.getvalue()
+
+    def _loads(self, data: bytes) -> Any:
+        if self.catalog is None:
+            return loads_records(data)
+        return _CatalogUnpickler(io.BytesIO(data), self.catalog).load()
+
+    @staticmethod
+    def _key(user_id: str, key: str) -> str:
+        return f'user:{user_id}:{key}'
+
+    def namespace(self, user_id: str) -> UserCacheNamespace:
+        return UserCacheNamespace(self, user_id)
+
+    def get(self, user_id: str, key: str) -> Any:
+        try:
+            data = self.backend.get(self._key(user_id, key))
+        except (OSError, redis.RedisError, sqlite3.Error) as e:
+            logger.error(f"Cache read failed for {key}: {str(e)}")
+            data = None
+        value = None
+        if data is not None:
+            try:
+                value = self._loads(data)
+            except pickle.UnpicklingError as e:
+                # Referenced metadata expired from the catalog or the value is not ours, rebuild the entry
+                logger.info(f"Dropping cached {key}: {str(e)}")
+                data = None
+                with self._stats_lock:
+                    self._stats['unresolved'] += 1
+        with self._stats_lock:
+            self._stats['hits' if data is not None else 'misses'] += 1
+        return value
+
+    def _write(self, method: str, user_id: str, key: str, value: Any, timeout: Optional[int]) -> bool:
+        data = self._dumps(value)
+        try:
+            stored = getattr(self.backend, method)(
+                self._key(user_id, key), data, self.default_timeout if timeout is None else timeout
+            )
+        except (OSError, redis.RedisError, sqlite3.Error) as e:
+            logger.error(f"Cache write failed for {key}: {str(e)}")
+            return False
+        if stored:
+            with self._stats_lock:
+                self._stats['sets'] += 1
+                self._stats['bytes_written'] += len(data)
+        return stored
+
+    def set(self, user_id: str, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        return self._write('set', user_id, key, value, timeout)
+
+    def add(self, user_id: str, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        return self._write('add', user_id, key, value, timeout)
+
+    def delete(self, user_id: str, key: str) -> bool:
+        try:
+            return self.backend.delete(self._key(user_id, key))
+        except (OSError, redis.RedisError, sqlite3.Error) as e:
+            logger.error(f"Cache delete failed for {key}: {str(e)}")
+            return False
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        try:
+            stats.update(self.backend.get_stats())
+        except (OSError, redis.RedisError, sqlite3.Error) as e:
+            stats['backend_error'] = str(e)
+        return stats
+
+
+def create_backend(name: str = USER_CACHE_BACKEND):
+    """Build the cache backend selected by USER_CACHE_BACKEND"""
+    if name == 'sqlite':
+        return SQLiteBackend()
+    if name == 'redis':
+        return RedisBackend()
+    return MemoryBackend()
+
+
+def catalog_for(backend, mode: str = USER_CACHE_CATALOG_REFS) -> Optional[CatalogCache]:
+    """
+    The catalog to reference from the backend's entries, None to store records inline.
+    Entries in a backend other workers read can only reference a persisted catalog.
+    """
+    if mode == 'on' or (mode == 'auto' and (isinstance(backend, MemoryBackend) or catalog_cache.db_path)):
+        return catalog_cache
+    return None
+
+
+_backend = create_backend()
+user_cache = UserCache(_backend, catalog=catalog_for(_backend))
@@ -0,0 +1,22 @@
+import os
+import re
+import threading
+from typing import Dict
+
+
+def user_file_path(data_dir: str, user_id: str, suffix: str) -> str:
+    """Path of a per-user file in data_dir, with the user id made safe to use as a file name"""
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', user_id)
+    return os.path.join(data_dir, f'{safe_id}{suffix}')
+
+
+class UserLocks:
+    """One lock per user, created on first use"""
+
+    def __init__(self):
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, user_id: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(user_id, threading.Lock())